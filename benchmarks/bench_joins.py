@@ -0,0 +1,137 @@
+"""Benchmark builder laporan yang memakai join index_by/group_by: buku besar, neraca lajur, neraca saldo setelah penutup.
+
+Fungsi asli dari coba.py yang diukur; pembacaan datanya (loader Supabase dan tahap laporan sebelumnya)
+diganti data sintetis di dalam skrip ini, jadi waktu yang tercatat hanya waktu join dan perhitungan
+builder itu sendiri. Ukuran dinaikkan bertahap sampai 5k akun / 500k entries; ns/baris yang tetap
+datar berarti join tumbuh linear.
+
+Jalankan dari root repo:  python benchmarks/bench_joins.py [jumlah_akun] [jumlah_entries]
+"""
+import inspect
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+# coba.py membuat client Supabase saat import; koneksi tidak dipakai di benchmark ini
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark.local.key")
+os.environ.setdefault("BALANCE_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="lelestari-bench-"), "balances.sqlite3"))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+# Builder mencatat log per akun; log dimatikan agar tidak ikut terukur
+logging.disable(logging.CRITICAL)
+
+import coba
+from fake_supabase import FakeSupabase
+
+ACCOUNT_TYPES = ('Aktiva Lancar', 'Aktiva Tetap', 'Kewajiban', 'Modal', 'Pendapatan', 'Beban')
+PERIOD = "2026-10"
+
+# Memo request dan cache periode dilewati agar setiap pengukuran menjalankan body builder
+ledger_builder = inspect.unwrap(coba.get_general_ledger_entries_grouped_by_account)
+worksheet_builder = inspect.unwrap(coba.get_worksheet_data)
+post_closing_builder = inspect.unwrap(coba.get_post_closing_trial_balance)
+
+
+def build_data(accounts, entries):
+    """Chart of Account, saldo awal, jurnal umum, neraca saldo, dan jurnal penyesuaian sintetis"""
+    rng = random.Random(accounts * 31 + entries)
+    chart = []
+    for i in range(accounts):
+        account_type = ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)]
+        name = f"Akumulasi Penyusutan {i}" if account_type == 'Aktiva Tetap' and i % 4 == 1 else f"Akun {i}"
+        chart.append({'account_code': f"{1 + i % 6}-{i:05d}", 'account_name': name, 'account_type': account_type})
+    codes = [account['account_code'] for account in chart]
+
+    opening_balances = [
+        {'account_code': code, 'position': 'debit', 'amount': rng.randint(1, 10_000) * 1000}
+        for code in codes if rng.random() < 0.6
+    ]
+    journals = []
+    for journal_id in range(entries // 2):
+        amount = rng.randint(1, 1000) * 1000
+        debit_code, credit_code = rng.sample(codes, 2)
+        journals.append({
+            'id': journal_id,
+            'transaction_date': f"{PERIOD}-{rng.randint(1, 28):02d}",
+            'description': 'Transaksi',
+            'journal_entries': [
+                {'account_code': debit_code, 'position': 'debit', 'amount': amount},
+                {'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+            ]
+        })
+
+    trial_balance = [
+        {**account, 'debit': rng.randint(0, 1000) * 1000, 'credit': rng.randint(0, 1000) * 1000}
+        for account in chart
+    ]
+    adjusted_trial_balance = [
+        {**account, 'debit_after': row['debit'], 'credit_after': row['credit']}
+        for account, row in zip(chart, trial_balance)
+    ]
+    adjusting_journals = [{'entries': [
+        {'account_code': rng.choice(codes), 'position': rng.choice(('debit', 'kredit')), 'amount': rng.randint(1, 1000) * 1000}
+        for _ in range(entries)
+    ]}]
+    return {
+        'chart': chart,
+        'opening_balances': opening_balances,
+        'journals': journals,
+        'trial_balance': trial_balance,
+        'adjusted_trial_balance': adjusted_trial_balance,
+        'adjusting_journals': adjusting_journals,
+    }
+
+
+def install(data):
+    """Pasang data sintetis sebagai sumber data builder (Supabase palsu untuk COA, loader lain diganti langsung)"""
+    db = FakeSupabase()
+    db.tables['chart_of_accounts'] = data['chart']
+    coba.supabase = db
+    coba.invalidate_chart_of_accounts_cache()
+
+    coba.get_opening_balances_with_account_info = lambda: data['opening_balances']
+    coba.get_journal_entries_with_details = lambda start_date=None, end_date=None: data['journals']
+    coba.calculate_trial_balance = lambda period=None: data['trial_balance']
+    coba.get_adjusted_trial_balance = lambda period=None: data['adjusted_trial_balance']
+    coba.get_adjusting_journals_with_entries = lambda period=None: data['adjusting_journals']
+    coba.get_modal_from_cash_flow = lambda period: 0
+
+
+def timed(builder, *args):
+    with coba.app.test_request_context("/"):
+        start = time.perf_counter()
+        result = builder(*args)
+        return time.perf_counter() - start, result
+
+
+def main():
+    max_accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_entries = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+
+    print(f"{'akun':>7} {'entries':>9} {'buku besar (ms)':>16} {'ns/baris':>9} {'neraca lajur (ms)':>18} {'ns/baris':>9} {'penutup (ms)':>13}")
+    for scale in (8, 4, 2, 1):
+        accounts, entries = max_accounts // scale, max_entries // scale
+        install(build_data(accounts, entries))
+        # COA dimuat sekali di luar pengukuran, seperti cache proses di produksi
+        coba.get_chart_of_accounts_cache()
+
+        ledger_time, ledger = timed(ledger_builder, f"{PERIOD}-01", f"{PERIOD}-31")
+        worksheet_time, worksheet = timed(worksheet_builder, PERIOD)
+        coba.get_worksheet_data = lambda period=None: worksheet
+        post_closing_time, post_closing = timed(post_closing_builder, PERIOD)
+        assert ledger and worksheet and post_closing
+
+        rows = accounts + entries
+        print(
+            f"{accounts:>7} {entries:>9} {ledger_time * 1000:16.1f} {ledger_time / rows * 1e9:9.0f} "
+            f"{worksheet_time * 1000:18.1f} {worksheet_time / rows * 1e9:9.0f} {post_closing_time * 1000:13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark render layout: render_template_string (kompilasi tiap request) vs template terkompilasi.
+
+Jalankan dari root repo:  python benchmarks/bench_templates.py [jumlah_baris] [jumlah_render]
+"""
+import os
+import sys
+import time
+
+# coba.py membuat client Supabase saat import; koneksi tidak dipakai di benchmark ini
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark.local.key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, render_template_string
+
+import coba
+
+
+def build_report_content(rows):
+    """Konten sebesar laporan jurnal umum dengan `rows` baris entry"""
+    body = "".join(
+        f"""
+        <tr>
+            <td style="padding: 10px; border: 1px solid #dee2e6; text-align: center;">{i % 28 + 1:02d}/10/26</td>
+            <td style="padding: 10px; border: 1px solid #dee2e6;">Kas di Bank BCA</td>
+            <td style="padding: 10px; border: 1px solid #dee2e6; text-align: center;"><strong>1-1104</strong></td>
+            <td style="padding: 10px; border: 1px solid #dee2e6; text-align: right;">{coba.format_currency(i * 1000)}</td>
+            <td style="padding: 10px; border: 1px solid #dee2e6; text-align: right;"></td>
+        </tr>
+        """
+        for i in range(rows)
+    )
+    return f"<table><tbody>{body}</tbody></table>"
+
+
+def bench(label, render, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1000:8.3f} ms/render")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    content = build_report_content(rows)
+    context = dict(content=content, user_email="admin@lelestari.id", user_name="Admin", user_id="1", user_role="admin")
+
+    print(f"Konten laporan: {rows} baris, {len(content) / 1024:.0f} KB, {repeat} render")
+    with coba.app.test_request_context("/jurnal_umum"):
+        before = bench("render_template_string(dashboard_html)", lambda: render_template_string(coba.dashboard_html, **context), repeat)
+        after = bench("render_template(dashboard_template)", lambda: render_template(coba.dashboard_template, **context), repeat)
+        bench("render_template_string(base_html)", lambda: render_template_string(coba.base_html, content=content), repeat)
+        bench("render_template(base_template)", lambda: render_template(coba.base_template, content=content), repeat)
+    print(f"Speedup dashboard: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
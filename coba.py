@@ -1,15 +1,30 @@
-from flask import Flask, render_template_string, request, redirect, url_for, session, jsonify, send_file
+from flask import Flask, Response, stream_with_context, render_template, request, redirect, url_for, session, jsonify, send_file, g, has_request_context
 from functools import wraps
+import click
 import random
 from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 import json
+import math
+import re
 import base64
-from io import BytesIO
+from io import BytesIO, StringIO
+import csv
+import numpy as np
 import traceback
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import sqlite3
+import tempfile
+import queue
+import uuid
+import hashlib
+from collections import OrderedDict
+import time
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
@@ -48,9 +63,6 @@ def send_email(recipient, subject, body):
             logger.error("❌ SendGrid credentials missing!")
             return False
         
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-        
         message = Mail(
             from_email=EMAIL_SENDER,
             to_emails=recipient,
@@ -58,7 +70,7 @@ def send_email(recipient, subject, body):
             plain_text_content=body
         )
         
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
+        sg = get_sendgrid_client(SENDGRID_API_KEY)
         response = sg.send(message)
         
         if response.status_code in [200, 202]:
@@ -77,6 +89,99 @@ def send_email(recipient, subject, body):
         logger.error(traceback.format_exc())
         return False
 
+_sendgrid_clients = {}
+
+def get_sendgrid_client(api_key):
+    """SendGridAPIClient dipakai ulang per API key, bukan dibuat setiap kirim email"""
+    client = _sendgrid_clients.get(api_key)
+    if client is None:
+        client = _sendgrid_clients[api_key] = SendGridAPIClient(api_key)
+    return client
+
+# ============================================================
+# 📬 ANTRIAN EMAIL (BACKGROUND DISPATCHER)
+# ============================================================
+# Route cukup memanggil queue_email lalu langsung merespons; thread worker mengirim
+# email dengan retry + backoff. Status pengiriman disimpan di email_delivery_status.
+EMAIL_QUEUE_SIZE = int(os.environ.get("EMAIL_QUEUE_SIZE", 100))
+EMAIL_MAX_RETRIES = int(os.environ.get("EMAIL_MAX_RETRIES", 3))
+EMAIL_RETRY_BACKOFF = float(os.environ.get("EMAIL_RETRY_BACKOFF", 2.0))
+EMAIL_STATUS_HISTORY = int(os.environ.get("EMAIL_STATUS_HISTORY", 500))
+
+_email_queue = queue.Queue(maxsize=EMAIL_QUEUE_SIZE)
+_email_status_lock = threading.Lock()
+_email_worker = None
+_email_sender = None
+email_delivery_status = OrderedDict()
+
+def start_email_dispatcher(sender=None):
+    """Jalankan thread pengirim email (sender default: send_email, bisa diganti stub untuk pengujian)"""
+    global _email_worker, _email_sender
+    if sender is not None:
+        _email_sender = sender
+    # Thread dibuat saat pertama dipakai agar berjalan di dalam worker gunicorn (setelah fork)
+    if _email_worker is None or not _email_worker.is_alive():
+        _email_worker = threading.Thread(target=run_email_dispatcher, name="email-dispatcher", daemon=True)
+        _email_worker.start()
+
+def update_email_status(job_id, **fields):
+    """Perbarui status pengiriman email (riwayat dibatasi EMAIL_STATUS_HISTORY)"""
+    with _email_status_lock:
+        status = email_delivery_status.setdefault(job_id, {'job_id': job_id})
+        status.update(fields, updated_at=datetime.utcnow().isoformat())
+        email_delivery_status.move_to_end(job_id)
+        while len(email_delivery_status) > EMAIL_STATUS_HISTORY:
+            email_delivery_status.popitem(last=False)
+
+def get_email_status(job_id):
+    """Ambil salinan status pengiriman email, None jika tidak dikenal"""
+    with _email_status_lock:
+        status = email_delivery_status.get(job_id)
+        return dict(status) if status else None
+
+def queue_email(recipient, subject, body):
+    """Masukkan email ke antrian pengiriman, kembalikan job_id untuk cek status"""
+    job_id = uuid.uuid4().hex
+    update_email_status(job_id, recipient=recipient, subject=subject, status='queued', attempts=0)
+    
+    try:
+        _email_queue.put_nowait((job_id, recipient, subject, body))
+    except queue.Full:
+        update_email_status(job_id, status='dropped', last_error='Antrian email penuh')
+        logger.error(f"❌ Email queue full, dropping email to {recipient}")
+        return job_id
+    
+    start_email_dispatcher()
+    logger.info(f"📬 Email queued for {recipient} (job {job_id})")
+    return job_id
+
+def run_email_dispatcher():
+    """Loop thread pengirim: ambil email dari antrian dan kirim dengan retry + exponential backoff"""
+    while True:
+        job_id, recipient, subject, body = _email_queue.get()
+        try:
+            sender = _email_sender or send_email
+            for attempt in range(1, EMAIL_MAX_RETRIES + 2):
+                update_email_status(job_id, status='sending', attempts=attempt)
+                try:
+                    sent = sender(recipient, subject, body)
+                    error = None if sent else 'Pengirim mengembalikan status gagal'
+                except Exception as e:
+                    sent, error = False, str(e)
+                
+                if sent:
+                    update_email_status(job_id, status='sent', last_error=None)
+                    break
+                
+                update_email_status(job_id, status='retrying', last_error=error)
+                if attempt <= EMAIL_MAX_RETRIES:
+                    time.sleep(EMAIL_RETRY_BACKOFF * 2 ** (attempt - 1))
+            else:
+                update_email_status(job_id, status='failed')
+                logger.error(f"❌ Email to {recipient} failed after {EMAIL_MAX_RETRIES + 1} attempts")
+        finally:
+            _email_queue.task_done()
+
 def generate_invoice(prefix="INV"):
     """Generate nomor invoice"""
     ts = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -112,6 +217,29 @@ def format_ledger_display(account_type, balance):
         logger.error(f"❌ Error in format_ledger_display: {e}")
         return balance if balance else 0
 
+def _key_getter(key):
+    """key berupa nama field dict atau fungsi baris -> kunci"""
+    return key if callable(key) else (lambda row: row[key])
+
+def index_by(rows, key):
+    """Index baris berdasarkan kunci: {kunci: baris pertama dengan kunci tersebut}
+    
+    Pengganti next(...)/loop break per lookup; membangun index O(n), lookup O(1).
+    """
+    get_key = _key_getter(key)
+    index = {}
+    for row in rows:
+        index.setdefault(get_key(row), row)
+    return index
+
+def group_by(rows, key, value=None):
+    """Kelompokkan baris berdasarkan kunci: {kunci: [baris, ...]} dengan urutan asli dipertahankan"""
+    get_key = _key_getter(key)
+    groups = {}
+    for row in rows:
+        groups.setdefault(get_key(row), []).append(value(row) if value else row)
+    return groups
+
 # ============================================================
 # 🔹 DECORATORS
 # ============================================================
@@ -153,6 +281,498 @@ def super_admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+_report_memo_lock = threading.Lock()
+
+def request_memoized(f):
+    """Decorator untuk fungsi laporan: hasil disimpan di flask.g per (fungsi, argumen) agar tiap tahap hanya dihitung sekali per request
+    
+    Hasil yang sama dipakai bersama oleh semua pemanggil dalam request, tanpa disalin: pemanggil tidak boleh
+    mengubahnya (salin dulu baris yang perlu dikoreksi). Thread fetch_parallel yang meminta kunci yang sama
+    menunggu satu perhitungan, bukan menghitung ulang.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not has_request_context():
+            return f(*args, **kwargs)
+        
+        key = (decorated_function, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return f(*args, **kwargs)
+        
+        memo = g.setdefault('report_memo', {})
+        if key not in memo:
+            with _report_memo_lock:
+                key_lock = g.setdefault('report_memo_locks', {}).setdefault(key, threading.Lock())
+            with key_lock:
+                if key not in memo:
+                    memo[key] = f(*args, **kwargs)
+                    return memo[key]
+        
+        with _report_memo_lock:
+            g.report_memo_hits = g.get('report_memo_hits', 0) + 1
+        return memo[key]
+    return decorated_function
+
+def prime_request_memo(f, args, value):
+    """Isi memo request_memoized dengan hasil yang sudah dihitung di tempat lain (mis. satu kali baca untuk banyak periode)"""
+    if has_request_context():
+        g.setdefault('report_memo', {})[(f, tuple(args), ())] = value
+
+@app.teardown_request
+def log_report_memo_hits(exc):
+    """Log jumlah perhitungan laporan yang dihemat oleh request_memoized"""
+    hits = g.get('report_memo_hits', 0)
+    if hits:
+        logger.info(f"♻️ Report memo {request.path}: {hits} hits saved, {len(g.get('report_memo', {}))} stages computed")
+
+# ============================================================
+# 🔀 FAN-OUT PEMBACAAN PARALEL
+# ============================================================
+# Pembacaan Supabase yang tidak saling bergantung dijalankan bersamaan di thread pool terbatas,
+# sehingga latensi laporan mengikuti query paling lambat, bukan jumlah semua query.
+# Tiap panggilan berjalan di salinan contextvars pemanggil: flask.g, session, dan memo request tetap terlihat.
+# Setiap fan-out memakai executor sendiri (maksimal FETCH_MAX_WORKERS thread), jadi panggilan yang macet
+# tidak menahan slot pool untuk request lain; saat timeout, pemanggil tidak menunggu thread itu selesai.
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 4))
+FETCH_TIMEOUT = int(os.environ.get("FETCH_TIMEOUT", 30))
+_fetch_local = threading.local()
+
+def _run_fetch(func, args, started, index):
+    """Jalankan satu panggilan di worker; fan-out bersarang di dalamnya dijalankan berurutan"""
+    started[index] = time.monotonic()
+    _fetch_local.in_worker = True
+    try:
+        return func(*args)
+    finally:
+        _fetch_local.in_worker = False
+
+def fetch_parallel(*calls, timeout=None):
+    """Jalankan beberapa pembacaan independen sekaligus dan kembalikan hasilnya sesuai urutan
+    
+    fetch_parallel((get_chart_of_accounts,), (get_journal_entries_with_details, start, end))
+    Setiap panggilan dibatasi `timeout` detik (default FETCH_TIMEOUT) sejak panggilan itu mulai berjalan
+    (waktu antri tidak dihitung); jika lewat, TimeoutError dinaikkan. Exception dari panggilan diteruskan
+    ke pemanggil.
+    """
+    timeout = FETCH_TIMEOUT if timeout is None else timeout
+    
+    # Di dalam worker fetch, fan-out bersarang dijalankan berurutan agar jumlah thread tetap terbatas
+    if FETCH_MAX_WORKERS <= 1 or len(calls) <= 1 or getattr(_fetch_local, 'in_worker', False):
+        return [func(*args) for func, *args in calls]
+    
+    fan_out_started = time.monotonic()
+    started = [None] * len(calls)
+    executor = ThreadPoolExecutor(max_workers=min(len(calls), FETCH_MAX_WORKERS), thread_name_prefix="fetch")
+    try:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run_fetch, func, args, started, index)
+            for index, (func, *args) in enumerate(calls)
+        ]
+        
+        results = []
+        for index, ((func, *args), future) in enumerate(zip(calls, futures)):
+            while True:
+                # Panggilan yang masih antri menunggu panggilan sebelumnya, yang masing-masing juga dibatasi timeout
+                deadline = (started[index] or time.monotonic()) + timeout
+                try:
+                    results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+                    break
+                except FutureTimeoutError:
+                    # Sejak Python 3.11 sama dengan TimeoutError: error dari panggilan itu sendiri diteruskan
+                    if future.done():
+                        raise
+                    if started[index] is not None and time.monotonic() >= started[index] + timeout:
+                        logger.error(f"⏱️ Fetch {func.__name__} exceeded {timeout}s timeout")
+                        raise TimeoutError(f"Pengambilan data {func.__name__} melebihi {timeout} detik")
+    finally:
+        # Jangan tunggu panggilan yang macet; panggilan yang belum mulai dibatalkan
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    logger.info(f"🔀 Fetched {len(calls)} sources in parallel in {time.monotonic() - fan_out_started:.2f}s")
+    return results
+
+# ============================================================
+# 📚 PEMBACAAN BERHALAMAN (.range) UNTUK DATA BESAR
+# ============================================================
+# PostgREST memotong select tanpa batas di max-rows server (default Supabase 1000), jadi data besar
+# terpotong diam-diam. Loader massal membaca per halaman .range() dan menghasilkan baris sebagai
+# generator. Halaman berikutnya dimulai dari jumlah baris yang benar-benar diterima dan pembacaan
+# baru berhenti pada halaman kosong, jadi max-rows server yang lebih kecil dari FETCH_PAGE_SIZE
+# tidak memotong hasil.
+FETCH_PAGE_SIZE = int(os.environ.get("FETCH_PAGE_SIZE", 1000))
+FETCH_PARALLEL_PAGES = int(os.environ.get("FETCH_PARALLEL_PAGES", 1))
+
+def order_by(query, *columns, desc=False):
+    """Urutkan query dengan beberapa kolom dalam satu parameter order=a.desc,b.desc
+    
+    postgrest-py mengirim .order() berulang sebagai parameter order terpisah dan PostgREST hanya
+    memakai salah satunya, jadi kolom pemecah seri (id) tidak selalu diterapkan.
+    """
+    return query.order(",".join(f"{column}.desc" if desc else column for column in columns))
+
+def fetch_all_rows(build_query, page_size=None, parallel_pages=None):
+    """Generator semua baris query, dibaca per halaman .range()
+    
+    build_query: fungsi tanpa argumen yang membuat query baru (select + filter + order yang stabil/unik,
+    misalnya order_by(query, kolom, "id")). parallel_pages > 1 membaca beberapa halaman berikutnya sekaligus
+    lewat fetch_parallel; urutan baris tetap sama.
+    """
+    page_size = page_size or FETCH_PAGE_SIZE
+    parallel_pages = max(parallel_pages or FETCH_PARALLEL_PAGES, 1)
+    
+    def fetch_page(offset, size):
+        # postgrest-py 0.11: akhir .range() eksklusif (.range(0, 1000) mengirim Range: 0-999)
+        return build_query().range(offset, offset + size).execute().data or []
+    
+    offset = 0
+    while True:
+        offsets = [offset + i * page_size for i in range(parallel_pages)]
+        if parallel_pages > 1:
+            pages = fetch_parallel(*[(fetch_page, page_offset, page_size) for page_offset in offsets])
+        else:
+            pages = [fetch_page(offset, page_size)]
+        
+        for page_offset, rows in zip(offsets, pages):
+            # Halaman sebelumnya tidak penuh (dibatasi max-rows): sisa halaman paralel dibaca ulang
+            if page_offset != offset:
+                break
+            if not rows:
+                return
+            yield from rows
+            offset += len(rows)
+            # Ikuti batas server agar offset halaman paralel berikutnya tepat
+            page_size = min(page_size, len(rows))
+
+# ============================================================
+# 🗄️ CACHE HASIL PERHITUNGAN PER PERIODE
+# ============================================================
+# Neraca saldo, NSSP, dan neraca lajur disimpan per periode (YYYY-MM) di SQLite lokal
+# yang dipakai bersama oleh semua worker di satu host. Setiap baris ditandai versi ledger
+# periodenya; API tulis menaikkan versi itu (lihat VERSI LEDGER di bawah), jadi baris cache
+# di host lain otomatis tidak terpakai lagi.
+BALANCE_CACHE_PATH = os.environ.get("BALANCE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "lelestari_balances.sqlite3"))
+BALANCE_CACHE_TTL = int(os.environ.get("BALANCE_CACHE_TTL", 86400))
+_balance_cache_ready = False
+
+def get_balance_cache_db():
+    """Buka koneksi SQLite cache saldo (tabel dibuat saat pertama kali dipakai)"""
+    global _balance_cache_ready
+    conn = sqlite3.connect(BALANCE_CACHE_PATH, timeout=5)
+    if not _balance_cache_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS computed_balances (
+                kind TEXT NOT NULL,
+                period TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                computed_at REAL NOT NULL,
+                ledger_version TEXT,
+                PRIMARY KEY (kind, period)
+            )
+        """)
+        try:
+            # File cache lama dibuat sebelum kolom ledger_version ada
+            conn.execute("ALTER TABLE computed_balances ADD COLUMN ledger_version TEXT")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ledger_versions (
+                period TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        _balance_cache_ready = True
+    return conn
+
+def period_of(date_str):
+    """Ambil periode YYYY-MM dari tanggal YYYY-MM-DD"""
+    return str(date_str)[:7] if date_str else None
+
+def current_period():
+    """Periode bulan berjalan (YYYY-MM)"""
+    return datetime.now().strftime("%Y-%m")
+
+def period_date_range(period):
+    """Tanggal awal dan akhir bulan untuk periode YYYY-MM"""
+    import calendar
+    year, month = map(int, period.split('-'))
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+
+def periods_between(start_period, end_period):
+    """Daftar periode YYYY-MM dari start_period sampai end_period (inklusif)"""
+    year, month = map(int, start_period.split('-'))
+    end_year, end_month = map(int, end_period.split('-'))
+    periods = []
+    while (year, month) <= (end_year, end_month):
+        periods.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+def read_period_cache(kind, period, version=None):
+    """Baca hasil perhitungan dari cache, None jika tidak ada, kedaluwarsa, atau versi ledgernya sudah berubah"""
+    try:
+        version = version or period_cache_version(period)
+        if version is None:
+            return None
+        conn = get_balance_cache_db()
+        try:
+            row = conn.execute(
+                "SELECT payload, computed_at, ledger_version FROM computed_balances WHERE kind = ? AND period = ?",
+                (kind, period)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row and row[2] == version and time.time() - row[1] < BALANCE_CACHE_TTL:
+            return json.loads(row[0])
+    except Exception as e:
+        logger.warning(f"⚠️ Error reading balance cache {kind} {period}: {e}")
+    return None
+
+def write_period_cache(kind, period, payload, version=None):
+    """Simpan hasil perhitungan ke cache
+    
+    version: versi ledger periode yang diambil SEBELUM data dibaca, agar hasil yang dihitung saat ada
+    penulisan bersamaan tidak ditandai dengan versi yang lebih baru.
+    """
+    try:
+        version = version or period_cache_version(period)
+        if version is None:
+            return
+        conn = get_balance_cache_db()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO computed_balances (kind, period, payload, computed_at, ledger_version) VALUES (?, ?, ?, ?, ?)",
+                (kind, period, json.dumps(payload, default=str), time.time(), version)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Error writing balance cache {kind} {period}: {e}")
+
+def invalidate_period_cache(periods=None):
+    """Hapus cache untuk periode tertentu, atau semua periode jika periods=None"""
+    try:
+        conn = get_balance_cache_db()
+        try:
+            if periods is None:
+                conn.execute("DELETE FROM computed_balances")
+            else:
+                periods = [period for period in set(periods) if period]
+                conn.executemany("DELETE FROM computed_balances WHERE period = ?", [(period,) for period in periods])
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"🗄️ Balance cache invalidated: {'ALL' if periods is None else sorted(periods)}")
+    except Exception as e:
+        logger.warning(f"⚠️ Error invalidating balance cache: {e}")
+    
+    bump_ledger_version(periods)
+
+# ============================================================
+# 🔖 VERSI LEDGER (BERSAMA ANTAR INSTANCE)
+# ============================================================
+# Versi ledger naik setiap kali data yang memengaruhi laporan ditulis. Periode "*" dipakai
+# untuk perubahan yang berlaku ke semua periode (saldo awal, chart of accounts).
+# Versi disimpan di tabel Supabase ledger_versions (lihat supabase/migrations), jadi semua
+# instance melihat invalidasi yang sama: cache saldo dan ETag laporan dihitung dari versi ini.
+# Jika tabel/RPC belum terpasang, versi disimpan di SQLite lokal; mode ini hanya benar untuk
+# deployment satu host dan dicatat sebagai warning.
+# Versi dari Supabase disimpan per proses selama LEDGER_VERSIONS_CACHE_TTL detik, jadi cek ETag dan
+# cache saldo tidak membaca Supabase di setiap request. Penulisan di proses ini langsung menghapusnya;
+# penulisan di instance lain terlihat paling lambat setelah TTL.
+LEDGER_VERSION_ALL = "*"
+SHARED_LEDGER_VERSIONS = os.environ.get("SHARED_LEDGER_VERSIONS", "1") == "1"
+SHARED_LEDGER_VERSIONS_RETRY = int(os.environ.get("SHARED_LEDGER_VERSIONS_RETRY", 600))
+LEDGER_VERSIONS_CACHE_TTL = int(os.environ.get("LEDGER_VERSIONS_CACHE_TTL", 5))
+_shared_ledger_versions_retry_at = 0.0
+_ledger_versions_lock = threading.Lock()
+_ledger_versions_cache = None  # ({period: (version, updated_at)}, waktu ambil)
+_ledger_versions_generation = 0
+
+def invalidate_ledger_versions_cache():
+    """Hapus versi ledger Supabase yang disimpan di proses ini"""
+    global _ledger_versions_cache, _ledger_versions_generation
+    with _ledger_versions_lock:
+        _ledger_versions_cache = None
+        # Pembacaan yang dimulai sebelum invalidasi tidak boleh mengisi cache dengan versi lama
+        _ledger_versions_generation += 1
+
+def shared_ledger_versions_enabled():
+    """Cek apakah versi ledger di Supabase boleh dipakai saat ini"""
+    return SHARED_LEDGER_VERSIONS and time.monotonic() >= _shared_ledger_versions_retry_at
+
+def disable_shared_ledger_versions(error):
+    """Pakai versi ledger SQLite lokal sementara setelah tabel/RPC Supabase gagal"""
+    global _shared_ledger_versions_retry_at
+    _shared_ledger_versions_retry_at = time.monotonic() + SHARED_LEDGER_VERSIONS_RETRY
+    logger.warning(f"⚠️ Shared ledger versions unavailable, using local SQLite (single host only) for {SHARED_LEDGER_VERSIONS_RETRY}s: {error}")
+
+def bump_local_ledger_version(periods):
+    """Naikkan versi ledger di SQLite lokal (fallback satu host)"""
+    try:
+        conn = get_balance_cache_db()
+        try:
+            # BEGIN IMMEDIATE agar worker lain tidak membaca nomor versi yang sama
+            conn.execute("BEGIN IMMEDIATE")
+            next_version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM ledger_versions").fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO ledger_versions (period, version, updated_at) VALUES (?, ?, ?)",
+                [(period, next_version, time.time()) for period in periods]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"🔖 Local ledger version {next_version}: {sorted(periods)}")
+    except Exception as e:
+        logger.warning(f"⚠️ Error bumping ledger version: {e}")
+
+def bump_ledger_version(periods=None):
+    """Naikkan versi ledger untuk periode tertentu, atau versi global jika periods=None"""
+    periods = [LEDGER_VERSION_ALL] if periods is None else [period for period in set(periods) if period]
+    if not periods:
+        return
+    
+    # Versi yang sudah dibaca di proses dan request ini tidak berlaku lagi
+    invalidate_ledger_versions_cache()
+    if has_request_context():
+        g.get('report_memo', {}).pop((get_ledger_versions, (), ()), None)
+    
+    if shared_ledger_versions_enabled():
+        try:
+            result = supabase.rpc("bump_ledger_version", {"p_periods": sorted(periods)}).execute()
+            logger.info(f"🔖 Ledger version {result.data}: {sorted(periods)}")
+            if isinstance(result.data, int):
+                advance_ledger_snapshot_version(result.data)
+            return
+        except Exception as e:
+            disable_shared_ledger_versions(e)
+    
+    bump_local_ledger_version(periods)
+
+@request_memoized
+def get_ledger_versions():
+    """Semua versi ledger: (sumber, {period: (version, updated_at)}), sumber None jika tidak terbaca
+    
+    Sumber ('supabase' atau 'local') ikut disimpan di versi cache agar nomor dari dua sumber tidak tertukar.
+    Versi Supabase diambil dari cache proses jika umurnya belum lewat LEDGER_VERSIONS_CACHE_TTL.
+    """
+    global _ledger_versions_cache
+    if shared_ledger_versions_enabled():
+        cached = _ledger_versions_cache
+        if cached and time.monotonic() - cached[1] < LEDGER_VERSIONS_CACHE_TTL:
+            return 'supabase', cached[0]
+        
+        generation = _ledger_versions_generation
+        try:
+            rows = fetch_all_rows(lambda: order_by(supabase.table("ledger_versions").select("period, version, updated_at"), "period"))
+            versions = {row['period']: (row['version'], row['updated_at']) for row in rows}
+            with _ledger_versions_lock:
+                if generation == _ledger_versions_generation:
+                    _ledger_versions_cache = (versions, time.monotonic())
+            return 'supabase', versions
+        except Exception as e:
+            disable_shared_ledger_versions(e)
+    
+    try:
+        conn = get_balance_cache_db()
+        try:
+            rows = conn.execute("SELECT period, version, updated_at FROM ledger_versions").fetchall()
+        finally:
+            conn.close()
+        return 'local', {period: (version, updated_at) for period, version, updated_at in rows}
+    except Exception as e:
+        logger.warning(f"⚠️ Error reading ledger versions: {e}")
+        return None, {}
+
+def period_cache_version(period):
+    """Versi ledger yang menandai baris cache saldo satu periode ("sumber:versi"), None jika tidak diketahui"""
+    source, versions = get_ledger_versions()
+    if source is None:
+        return None
+    version = max(versions.get(period, (0, None))[0], versions.get(LEDGER_VERSION_ALL, (0, None))[0])
+    return f"{source}:{version}"
+
+def get_ledger_version(period):
+    """Versi ledger ("sumber:versi") dan waktu perubahan terakhir yang berlaku untuk laporan periode ini
+    
+    Laporan bersifat kumulatif, jadi perubahan di periode sebelumnya dan perubahan global ikut dihitung.
+    """
+    source, versions = get_ledger_versions()
+    if source is None:
+        return (None, None)
+    applicable = [value for key, value in versions.items() if key <= period or key == LEDGER_VERSION_ALL]
+    version = max((version for version, _ in applicable), default=0)
+    updated_at = max((updated_at for _, updated_at in applicable if updated_at), default=None)
+    return (f"{source}:{version}", updated_at)
+
+def ledger_conditional(f):
+    """Decorator untuk halaman laporan ?period=: kirim ETag/Last-Modified dan jawab 304 jika ledger belum berubah
+    
+    Cek 304 tidak membaca Supabase: versi ledger diambil dari cache proses (lihat LEDGER_VERSIONS_CACHE_TTL)
+    dan role dari session login.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        period = request.args.get('period', current_period())
+        version, updated_at = get_ledger_version(period)
+        if version is None:
+            return f(*args, **kwargs)
+        
+        # Halaman memuat identitas user dan daftar periode berjalan, jadi ikut masuk ke ETag.
+        # Bucket waktu TTL menjaga halaman tidak lebih lama dari cache saldo (perubahan di luar aplikasi)
+        # dan dari label role yang diubah admin setelah user login.
+        etag_source = "|".join(str(part) for part in (
+            version,
+            session.get('user_email'),
+            session.get('user_name'),
+            session.get('user_role'),
+            request.full_path,
+            current_period(),
+            int(time.time() // BALANCE_CACHE_TTL)
+        ))
+        etag = hashlib.sha1(etag_source.encode()).hexdigest()
+        last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc) if updated_at else None
+        
+        not_modified = request.if_none_match.contains(etag) if request.if_none_match else (
+            bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+        )
+        if not_modified:
+            logger.info(f"🔖 Not modified: {request.path} {period} v{version}")
+            response = Response(status=304)
+        else:
+            response = app.make_response(f(*args, **kwargs))
+        
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+def period_cached(f):
+    """Decorator untuk fungsi f(period): hasil disimpan di cache saldo per periode"""
+    @wraps(f)
+    def decorated_function(period=None):
+        period = period or current_period()
+        
+        version = period_cache_version(period)
+        cached = read_period_cache(f.__name__, period, version)
+        if cached is not None:
+            logger.info(f"🗄️ Balance cache hit: {f.__name__} {period}")
+            return cached
+        
+        result = f(period)
+        # Hasil kosong bisa berarti error sementara, jangan disimpan
+        if result:
+            write_period_cache(f.__name__, period, result, version)
+        return result
+    return decorated_function
+
 # ============================================================
 # 🏠 3. HALAMAN SEBELUM LOGIN
 # ============================================================
@@ -599,23 +1219,9 @@ def register():
                 🌿 Tim Lelestari 🍃
                 """
                 
-                # Coba kirim email dengan timeout
-                email_sent = send_email(email, "🌿 Kode OTP Lelestari", email_body)
-                
-                if email_sent:
-                    logger.info(f"✅ OTP berhasil dikirim ke {email}")
-                    return redirect('/verify')
-                else:
-                    message = '''
-                    <div class="message error">
-                        ❌ Gagal kirim OTP! 
-                        <br><small>Kemungkinan masalah: 
-                        <br>- Konfigurasi email server
-                        <br>- App Password Gmail belum dibuat
-                        <br>- Environment variables belum diset</small>
-                    </div>
-                    '''
-                    logger.error(f"❌ Gagal kirim OTP ke {email}")
+                # Kirim lewat antrian email agar worker tidak menunggu SendGrid; status dicek di /verify
+                session['register_otp_job'] = queue_email(email, "🌿 Kode OTP Lelestari", email_body)
+                return redirect('/verify')
                     
         except Exception as e:
             message = f'<div class="message error">⚠ Error sistem: {str(e)}</div>'
@@ -643,7 +1249,7 @@ def register():
     <p><a href="/login">Sudah punya akun? Masuk</a></p>
     <a href="/"><button class="btn-secondary">🏠 Kembali ke Dashboard</button></a>
     """
-    return render_template_string(base_html, content=html)
+    return render_template(base_template, content=html)
 
 @app.route("/verify", methods=["GET", "POST"])
 def verify_otp():
@@ -695,12 +1301,13 @@ def verify_otp():
                 🌿 Tim Lelestari 🍃
                 """
                 
-                send_email(email, "🌿 Selamat Datang di Lelestari!", welcome_email)
+                queue_email(email, "🌿 Selamat Datang di Lelestari!", welcome_email)
                 
                 session.pop('register_name', None)
                 session.pop('register_email', None)
                 session.pop('register_password', None)
                 session.pop('register_otp', None)
+                session.pop('register_otp_job', None)
                 
                 message = '<div class="message success">✅ Akun berhasil dibuat sebagai Admin!</div>'
                 html = f"""
@@ -713,7 +1320,7 @@ def verify_otp():
                 <p>Silakan masuk untuk mulai menggunakan sistem!</p>
                 <a href="/login"><button class="btn-success">🔐 Masuk Sekarang</button></a>
                 """
-                return render_template_string(base_html, content=html)
+                return render_template(base_template, content=html)
                 
             except Exception as e:
                 message = f'<div class="message error">❌ Gagal menyimpan ke database: {str(e)}</div>'
@@ -722,6 +1329,21 @@ def verify_otp():
             message = '<div class="message error">❌ OTP salah! Coba lagi.</div>'
             logger.warning(f"❌ OTP salah untuk {email}")
     
+    # Status pengiriman OTP dari antrian email
+    otp_status = get_email_status(session.get('register_otp_job'))
+    if otp_status and otp_status['status'] in ['failed', 'dropped']:
+        message += '''
+        <div class="message error">
+            ❌ Gagal kirim OTP! 
+            <br><small>Kemungkinan masalah: 
+            <br>- Konfigurasi email server
+            <br>- App Password Gmail belum dibuat
+            <br>- Environment variables belum diset</small>
+        </div>
+        '''
+    elif otp_status and otp_status['status'] != 'sent':
+        message += '<div class="message info">⏳ OTP sedang dikirim, muat ulang halaman ini jika belum diterima.</div>'
+    
     html = f"""
     <h2>🔒 Verifikasi OTP</h2>
     <p>Halo <strong>{name}</strong>!</p>
@@ -737,7 +1359,7 @@ def verify_otp():
     </form>
     <a href="/register"><button class="btn-secondary">↩ Kembali</button></a>
     """
-    return render_template_string(base_html, content=html)
+    return render_template(base_template, content=html)
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
@@ -759,6 +1381,7 @@ def login():
                 session['user_name'] = result.data[0]['name']
                 session['user_id'] = result.data[0]['id']
                 session['user_role'] = result.data[0].get('role', 'pembeli')
+                cache_user_role(email, result.data[0].get('role'))
                 logger.info(f"✅ Login berhasil: {result.data[0]['name']} ({email}) sebagai {session['user_role']}")
                 return redirect('/dashboard')
             else:
@@ -780,7 +1403,7 @@ def login():
     <p><a href="/register">Belum punya akun? Daftar</a></p>
     <a href="/"><button class="btn-secondary">🏠 Kembali ke Dashboard</button></a>
     """
-    return render_template_string(base_html, content=html)
+    return render_template(base_template, content=html)
 
 @app.route("/logout")
 def logout():
@@ -829,6 +1452,34 @@ def test_email():
 # 🔹 FUNGSI MANAJEMEN ADMIN & AUTH
 # ============================================================
 
+# Cache role user per proses: email -> (baris users, waktu ambil). TTL agar worker lain ikut konvergen.
+# Cache ini hanya untuk tampilan (label role di layout); keputusan akses super admin selalu membaca
+# tabel users, karena invalidate_user_role hanya menghapus cache di worker yang mengubah role.
+USER_ROLE_CACHE_TTL = int(os.environ.get("USER_ROLE_CACHE_TTL", 300))
+_user_role_cache = {}
+
+def get_user_role_record(user_email, fresh=False):
+    """Ambil baris role user (atau None jika tidak terdaftar), dari cache jika belum kedaluwarsa
+    
+    fresh=True melewati cache dan selalu membaca tabel users (hasilnya tetap disimpan ke cache).
+    """
+    cached = _user_role_cache.get(user_email)
+    if not fresh and cached and time.monotonic() - cached[1] < USER_ROLE_CACHE_TTL:
+        return cached[0]
+    
+    result = supabase.table("users").select("role").eq("email", user_email).execute()
+    record = result.data[0] if result.data else None
+    _user_role_cache[user_email] = (record, time.monotonic())
+    return record
+
+def cache_user_role(user_email, role):
+    """Simpan role user ke cache (dipakai saat login)"""
+    _user_role_cache[user_email] = ({'role': role}, time.monotonic())
+
+def invalidate_user_role(user_email):
+    """Hapus role user dari cache setelah role diubah"""
+    _user_role_cache.pop(user_email, None)
+
 def is_super_admin():
     """Cek apakah user saat ini adalah super admin"""
     user_email = session.get('user_email')
@@ -836,8 +1487,9 @@ def is_super_admin():
         return False
     
     try:
-        result = supabase.table("users").select("role").eq("email", user_email).execute()
-        if result.data and result.data[0].get('role') == 'super_admin':
+        # Tanpa cache: admin yang diturunkan di worker lain langsung kehilangan akses
+        record = get_user_role_record(user_email, fresh=True)
+        if record and record.get('role') == 'super_admin':
             return True
     except Exception as e:
         logger.error(f"❌ Error checking super admin: {e}")
@@ -860,9 +1512,9 @@ def get_user_role():
         return 'guest'
     
     try:
-        result = supabase.table("users").select("role").eq("email", user_email).execute()
-        if result.data:
-            role = result.data[0].get('role', 'pembeli')
+        record = get_user_role_record(user_email)
+        if record:
+            role = record.get('role', 'pembeli')
             # SEMUA USER YANG LOGIN JADI ADMIN, KECUALI SUPER ADMIN TETAP
             if role == 'pembeli':
                 return 'admin'  # Ubah pembeli jadi admin
@@ -1047,7 +1699,7 @@ def dashboard():
     </div>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔹 TEMPLATE HTML DASHBOARD
@@ -1691,6 +2343,45 @@ dashboard_html = """
 </html>
 """
 
+# Layout dikompilasi sekali saat startup dan dipakai ulang di semua request
+base_template = app.jinja_env.from_string(base_html)
+dashboard_template = app.jinja_env.from_string(dashboard_html)
+
+STREAM_CONTENT_MARKER = "<!--stream-content-->"
+
+def stream_dashboard_page(*content_parts, **context):
+    """Kirim halaman dashboard secara streaming: layout atas langsung dikirim, lalu konten per bagian"""
+    page = render_template(dashboard_template, content=STREAM_CONTENT_MARKER, **context)
+    layout_head, layout_tail = page.split(STREAM_CONTENT_MARKER, 1)
+    
+    def generate():
+        yield layout_head
+        try:
+            for parts in content_parts:
+                yield from parts
+        except TimeoutError as e:
+            # Header sudah terkirim sehingga errorhandler tidak bisa dipakai: tampilkan pesan di halaman
+            logger.error(f"⏱️ Streaming {request.path} stopped: {e}")
+            yield f"<div class='message error'>❌ {FETCH_TIMEOUT_MESSAGE}</div>"
+        yield layout_tail
+    
+    return Response(stream_with_context(generate()), mimetype="text/html")
+
+FETCH_TIMEOUT_MESSAGE = "Pengambilan data melebihi batas waktu, silakan coba lagi"
+
+@app.errorhandler(TimeoutError)
+def handle_fetch_timeout(e):
+    """Fan-out fetch_parallel yang melebihi FETCH_TIMEOUT: 504, bukan laporan kosong"""
+    logger.error(f"⏱️ {request.path} failed: {e}")
+    if request.path.startswith('/api/'):
+        return jsonify({"success": False, "message": FETCH_TIMEOUT_MESSAGE}), 504
+    
+    content = f"<div class='message error'>❌ {FETCH_TIMEOUT_MESSAGE}</div>"
+    return render_template(
+        dashboard_template, content=content, user_email=session.get('user_email'), user_name=session.get('user_name', 'Admin'),
+        user_id=session.get('user_id', 'Unknown'), user_role=get_user_role()
+    ), 504
+
 # ============================================================
 # 📊 6. CHART OF ACCOUNT
 # ============================================================
@@ -2061,39 +2752,155 @@ def chart_of_account():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📖 FUNGSI DATA CHART OF ACCOUNT & REFERENSI
 # ============================================================
+# Cache chart_of_accounts per proses; TTL agar worker gunicorn lain ikut konvergen setelah perubahan akun
+COA_CACHE_TTL = int(os.environ.get("COA_CACHE_TTL", 300))
+_coa_cache_lock = threading.Lock()
+_coa_cache = {'loaded_at': 0.0, 'version': 0, 'accounts': [], 'by_code': {}, 'by_name': {}, 'by_type': {}}
+
+def get_chart_of_accounts_cache():
+    """Ambil index chart_of_accounts (by_code, by_name, by_type) dari cache, muat ulang jika kedaluwarsa"""
+    global _coa_cache
+    
+    cache = _coa_cache
+    if cache['loaded_at'] and time.monotonic() - cache['loaded_at'] < COA_CACHE_TTL:
+        return cache
+    
+    with _coa_cache_lock:
+        cache = _coa_cache
+        if cache['loaded_at'] and time.monotonic() - cache['loaded_at'] < COA_CACHE_TTL:
+            return cache
+        
+        try:
+            accounts = list(fetch_all_rows(lambda: supabase.table("chart_of_accounts").select("*").order("account_code")))
+        except Exception as e:
+            logger.error(f"❌ Error loading chart of accounts cache: {e}")
+            return cache
+        
+        by_type = group_by(accounts, lambda account: account.get('account_type'))
+        
+        _coa_cache = {
+            'loaded_at': time.monotonic(),
+            'version': cache['version'] + 1,
+            'accounts': accounts,
+            'by_code': {account['account_code']: account for account in accounts},
+            'by_name': {account['account_name']: account for account in accounts},
+            'by_type': by_type
+        }
+        logger.info(f"🗂️ Chart of accounts cache loaded: {len(accounts)} accounts (version {_coa_cache['version']})")
+        return _coa_cache
+
+def invalidate_chart_of_accounts_cache():
+    """Tandai cache chart_of_accounts kedaluwarsa agar dimuat ulang pada akses berikutnya"""
+    with _coa_cache_lock:
+        _coa_cache['loaded_at'] = 0.0
+    logger.info("🗂️ Chart of accounts cache invalidated")
+
 def get_account_name(account_code):
     """Dapatkan nama akun berdasarkan kode"""
-    try:
-        result = supabase.table("chart_of_accounts").select("account_name").eq("account_code", account_code).execute()
-        if result.data:
-            return result.data[0].get('account_name', account_code)
-        return account_code
-    except Exception as e:
-        logger.error(f"❌ Error getting account name: {e}")
-        return account_code
+    account = get_chart_of_accounts_cache()['by_code'].get(account_code)
+    if account:
+        return account.get('account_name', account_code)
+    return account_code
 
 def get_chart_of_accounts():
-    """Ambil data Chart of Account dari database"""
-    try:
-        result = supabase.table("chart_of_accounts").select("*").order("account_code").execute()
-        return result.data if result.data else []
-    except Exception as e:
-        logger.error(f"❌ Error getting chart of accounts: {e}")
-        return []
+    """Ambil data Chart of Account (dari cache)"""
+    return [dict(account) for account in get_chart_of_accounts_cache()['accounts']]
     
 def get_account_by_code(account_code):
-    """Ambil data akun berdasarkan kode"""
-    try:
-        result = supabase.table("chart_of_accounts").select("*").eq("account_code", account_code).execute()
-        return result.data[0] if result.data else None
-    except Exception as e:
-        logger.error(f"❌ Error getting account by code: {e}")
-        return None
+    """Ambil data akun berdasarkan kode (dari cache)"""
+    account = get_chart_of_accounts_cache()['by_code'].get(account_code)
+    return dict(account) if account else None
+
+# Klasifikasi akun untuk laporan (bagian laporan, saldo normal, kas, akun kontra, dll) dihitung sekali
+# per versi cache chart_of_accounts, sehingga builder laporan cukup lookup O(1) per akun
+DEBIT_NORMAL_ACCOUNT_TYPES = ('Aktiva Lancar', 'Aktiva Tetap', 'Beban')
+_account_classification_lock = threading.Lock()
+_account_classification_index = {'version': None, 'by_key': {}}
+
+def classify_account(account_code, account_name, account_type):
+    """Hitung klasifikasi satu akun berdasarkan kode, nama, dan tipe akun"""
+    name = account_name.lower()
+    code = account_code.lower()
+    mentions_hpp = 'hpp' in name or 'harga pokok' in name
+    
+    return {
+        'section': correct_worksheet_allocation(account_type, account_name),
+        'normal_side': 'debit' if account_type in DEBIT_NORMAL_ACCOUNT_TYPES else 'kredit',
+        'is_cash': 'kas' in name and account_type == 'Aktiva Lancar',
+        'touches_cash': 'kas' in name or 'kas' in code,
+        'is_contra_asset': (
+            'akumulasi penyusutan' in name or
+            'accumulated depreciation' in name or
+            'penyusutan' in name and 'akumulasi' in name
+        ),
+        'is_accumulated_depreciation': 'akumulasi' in name and 'penyusutan' in name,
+        'is_depreciation_related': any(keyword in name for keyword in ['akumulasi', 'penyusutan', 'depreciation']),
+        # Kelompok laba rugi dari neraca lajur (jurnal penutup)
+        'is_revenue': account_type == 'Pendapatan' or 'penjualan' in name or 'pendapatan' in name,
+        'is_cogs': account_type == 'Harga Pokok Penjualan' or mentions_hpp or account_code.startswith('5-1'),
+        'is_expense': (
+            account_type == 'Beban' or 'beban' in name or 'biaya' in name or
+            account_code.startswith('5-') or account_code.startswith('6-')
+        ) and not mentions_hpp,
+        # Kelompok laba rugi dari neraca saldo setelah penyesuaian (fallback)
+        'is_revenue_basic': account_type == 'Pendapatan' or 'penjualan' in name,
+        'is_cogs_basic': account_type == 'Harga Pokok Penjualan' or 'hpp' in name,
+        'is_expense_basic': account_type == 'Beban' or 'beban' in name,
+        'is_equity': account_type == 'Modal' or 'modal' in name,
+        'mentions_modal': 'modal' in name,
+        'is_modal_usaha': 'modal' in name and 'usaha' in name,
+        'is_prive': 'prive' in name or 'prive' in code
+    }
+
+def get_account_classification_index():
+    """Index klasifikasi semua akun chart_of_accounts, dibangun ulang saat versi cache COA berubah"""
+    global _account_classification_index
+    
+    coa = get_chart_of_accounts_cache()
+    index = _account_classification_index
+    if index['version'] == coa['version']:
+        return index
+    
+    with _account_classification_lock:
+        index = _account_classification_index
+        if index['version'] == coa['version']:
+            return index
+        
+        by_key = {}
+        for account in coa['accounts']:
+            key = (account['account_code'], account.get('account_name', account['account_code']), account.get('account_type'))
+            by_key[key] = classify_account(*key)
+        
+        _account_classification_index = {'version': coa['version'], 'by_key': by_key}
+        logger.info(f"🏷️ Account classification index built: {len(by_key)} accounts (COA version {coa['version']})")
+        return _account_classification_index
+
+def get_account_classification(account_code, account_name=None, account_type=None):
+    """Klasifikasi akun dari index; tanpa nama, nama dan tipe diambil dari chart_of_accounts
+    
+    Kombinasi kode/nama/tipe di luar COA (mis. akun sintetis laporan) dihitung langsung tanpa disimpan,
+    jadi index tetap sebesar COA dan tidak diubah di luar lock.
+    """
+    index = get_account_classification_index()
+    if account_name is None:
+        account = get_chart_of_accounts_cache()['by_code'].get(account_code)
+        account_name = account.get('account_name', account_code) if account else account_code
+        account_type = account.get('account_type') if account else None
+    
+    key = (account_code, account_name, account_type)
+    classification = index['by_key'].get(key)
+    if classification is None:
+        classification = classify_account(*key)
+    return classification
+
+def classification_of(item):
+    """Klasifikasi akun untuk baris laporan yang memiliki account_code, account_name, account_type"""
+    return get_account_classification(item['account_code'], item['account_name'], item['account_type'])
 
 def add_account_to_chart(account_data):
     """Tambah akun baru ke Chart of Account"""
@@ -2105,6 +2912,8 @@ def add_account_to_chart(account_data):
         
         result = supabase.table("chart_of_accounts").insert(account_data).execute()
         if result.data:
+            invalidate_chart_of_accounts_cache()
+            invalidate_period_cache()
             logger.info(f"✅ Account added: {account_data['account_code']} - {account_data['account_name']}")
             return {"success": True, "message": "Akun berhasil ditambahkan"}
         else:
@@ -2118,6 +2927,8 @@ def delete_account_from_chart(account_code):
     try:
         result = supabase.table("chart_of_accounts").delete().eq("account_code", account_code).execute()
         if result.data:
+            invalidate_chart_of_accounts_cache()
+            invalidate_period_cache()
             logger.info(f"✅ Account deleted: {account_code}")
             return {"success": True, "message": "Akun berhasil dihapus"}
         else:
@@ -2170,6 +2981,7 @@ def initialize_chart_of_accounts():
         
         # Insert data ke database
         result = supabase.table("chart_of_accounts").insert(default_accounts).execute()
+        invalidate_chart_of_accounts_cache()
         logger.info(f"✅ Chart of Accounts initialized with {len(default_accounts)} accounts")
         
     except Exception as e:
@@ -2504,7 +3316,7 @@ def neraca_saldo_awal():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔹 FUNGSI NERACA SALDO AWAL
@@ -2513,8 +3325,9 @@ def neraca_saldo_awal():
 def get_opening_balances():
     """Ambil data neraca saldo awal"""
     try:
-        result = supabase.table("opening_balances").select("*, chart_of_accounts(account_name, account_type)").order("created_at").execute()
-        return result.data if result.data else []
+        return list(fetch_all_rows(
+            lambda: order_by(supabase.table("opening_balances").select("*, chart_of_accounts(account_name, account_type)"), "created_at", "id")
+        ))
     except Exception as e:
         logger.error(f"❌ Error getting opening balances: {e}")
         return []
@@ -2556,6 +3369,7 @@ def add_opening_balance(account_code, position, amount, description=""):
             action = "added"
         
         if result.data:
+            invalidate_period_cache()
             logger.info(f"✅ Opening balance {action} for account {account_code}: {position} {amount}")
             return {"success": True, "message": f"Saldo awal berhasil {'diupdate' if existing else 'ditambahkan'}"}
         else:
@@ -2570,6 +3384,7 @@ def delete_opening_balance(balance_id):
     try:
         result = supabase.table("opening_balances").delete().eq("id", balance_id).execute()
         if result.data:
+            invalidate_period_cache()
             logger.info(f"✅ Opening balance {balance_id} deleted")
             return {"success": True, "message": "Saldo awal berhasil dihapus"}
         else:
@@ -2578,26 +3393,28 @@ def delete_opening_balance(balance_id):
         logger.error(f"❌ Error deleting opening balance: {e}")
         return {"success": False, "message": str(e)}
 
+@request_memoized
 def get_opening_balances_with_account_info():
     """Ambil data neraca saldo awal dengan informasi akun lengkap"""
     try:
-        result = supabase.table("opening_balances").select("*, chart_of_accounts(account_name, account_type, category)").execute()
+        rows = fetch_all_rows(
+            lambda: supabase.table("opening_balances").select("*, chart_of_accounts(account_name, account_type, category)").order("id")
+        )
         
         balances = []
-        if result.data:
-            for balance in result.data:
-                account_info = balance.get('chart_of_accounts', {})
-                balances.append({
-                    'id': balance['id'],
-                    'account_code': balance['account_code'],
-                    'account_name': account_info.get('account_name', 'Unknown Account'),
-                    'account_type': account_info.get('account_type', 'Unknown'),
-                    'position': balance['position'],
-                    'amount': balance['amount'],
-                    'description': balance.get('description', ''),
-                    'created_at': balance.get('created_at', ''),
-                    'created_by': balance.get('created_by', 'Admin')
-                })
+        for balance in rows:
+            account_info = balance.get('chart_of_accounts', {})
+            balances.append({
+                'id': balance['id'],
+                'account_code': balance['account_code'],
+                'account_name': account_info.get('account_name', 'Unknown Account'),
+                'account_type': account_info.get('account_type', 'Unknown'),
+                'position': balance['position'],
+                'amount': balance['amount'],
+                'description': balance.get('description', ''),
+                'created_at': balance.get('created_at', ''),
+                'created_by': balance.get('created_by', 'Admin')
+            })
         
         return balances
     except Exception as e:
@@ -2928,107 +3745,200 @@ def input_transaksi():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 💰 FUNGSI TRANSAKSI JURNAL
 # ============================================================
 
-def get_journal_entries_with_details(start_date=None, end_date=None, limit=None):
-    """Ambil data jurnal umum dengan detail entries - DIPERBAIKI FILTER TANGGAL"""
-    try:
-        logger.info(f"🔍 Fetching journal entries with details - Date: {start_date} to {end_date}")
+# Jumlah journal_id per query IN (...) agar URL PostgREST tidak terlalu panjang
+JOURNAL_ENTRY_BATCH_SIZE = int(os.environ.get("JOURNAL_ENTRY_BATCH_SIZE", 200))
+
+def get_journal_entries_by_journal_ids(journal_ids):
+    """Ambil journal_entries untuk banyak journal sekaligus, dikelompokkan per journal_id"""
+    entries_by_journal = {}
+    journal_ids = list(dict.fromkeys(journal_ids))
+    
+    for i in range(0, len(journal_ids), JOURNAL_ENTRY_BATCH_SIZE):
+        chunk = journal_ids[i:i + JOURNAL_ENTRY_BATCH_SIZE]
+        entries = fetch_all_rows(
+            lambda: supabase.table("journal_entries").select("*").in_("journal_id", chunk).order("id")
+        )
         
-        # Query untuk general_journals
+        for journal_id, entries in group_by(entries, 'journal_id').items():
+            entries_by_journal.setdefault(journal_id, []).extend(entries)
+    
+    logger.info(f"📦 Batched journal entries: {len(journal_ids)} journals in {(len(journal_ids) + JOURNAL_ENTRY_BATCH_SIZE - 1) // JOURNAL_ENTRY_BATCH_SIZE} queries")
+    return entries_by_journal
+
+def encode_journal_cursor(journal):
+    """Buat cursor halaman jurnal dari (transaction_date, id) sebuah journal"""
+    raw = f"{journal.get('transaction_date', '')}|{journal['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_journal_cursor(cursor):
+    """Baca cursor halaman jurnal menjadi tuple (transaction_date, id), None jika tidak valid
+    
+    Nilai cursor masuk ke filter or_() PostgREST, jadi hanya tanggal ISO dan id angka yang diterima.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        transaction_date, journal_id = raw.split("|", 1)
+        if not journal_id.isdigit():
+            raise ValueError("id jurnal bukan angka")
+        transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+        return (transaction_date, int(journal_id))
+    except Exception as e:
+        logger.warning(f"⚠️ Invalid journal cursor {cursor!r}: {e}")
+        return None
+
+def fetch_journals_with_details(start_date=None, end_date=None, limit=None, after=None, before=None):
+    """Ambil data jurnal umum dengan detail entries - DIPERBAIKI FILTER TANGGAL
+    
+    after/before: cursor (transaction_date, id) untuk pagination keyset, hasil tetap urut dari tanggal terkecil.
+    Error query diteruskan ke pemanggil (export dan agregasi tidak boleh menganggapnya data kosong).
+    """
+    logger.info(f"🔍 Fetching journal entries with details - Date: {start_date} to {end_date}")
+    
+    # ✅ PERBAIKAN: Filter tanggal yang lebih robust
+    apply_date_filter = False
+    if start_date and end_date and start_date != "" and end_date != "":
+        # Pastikan format tanggal benar
+        try:
+            # Validasi format tanggal
+            datetime.strptime(start_date, '%Y-%m-%d')
+            datetime.strptime(end_date, '%Y-%m-%d')
+            
+            # Terapkan filter dengan logging
+            logger.info(f"✅ Applying date filter: {start_date} to {end_date}")
+            apply_date_filter = True
+        except ValueError as e:
+            logger.error(f"❌ Invalid date format: {e}")
+            # Jangan terapkan filter jika format salah
+    else:
+        logger.info("ℹ️ No date filter applied")
+    
+    # Urutkan dari tanggal terkecil (terlama ke terbaru); halaman sebelumnya dibaca terbalik lalu dibalik lagi
+    descending = bool(before) and not after
+    
+    def build_query():
+        """Query general_journals dengan filter tanggal, cursor keyset, dan urutan (transaction_date, id)"""
         query = supabase.table("general_journals").select("*")
+        if apply_date_filter:
+            query = query.gte('transaction_date', start_date).lte('transaction_date', end_date)
         
-        # ✅ PERBAIKAN: Filter tanggal yang lebih robust
-        if start_date and end_date and start_date != "" and end_date != "":
-            # Pastikan format tanggal benar
-            try:
-                # Validasi format tanggal
-                datetime.strptime(start_date, '%Y-%m-%d')
-                datetime.strptime(end_date, '%Y-%m-%d')
-                
-                # Terapkan filter dengan logging
-                logger.info(f"✅ Applying date filter: {start_date} to {end_date}")
-                query = query.gte('transaction_date', start_date).lte('transaction_date', end_date)
-            except ValueError as e:
-                logger.error(f"❌ Invalid date format: {e}")
-                # Jangan terapkan filter jika format salah
-        else:
-            logger.info("ℹ️ No date filter applied")
-            
-        # Urutkan dari tanggal terkecil (terlama ke terbaru)
-        query = query.order("transaction_date", desc=False)
-        
-        if limit:
-            query = query.limit(limit)
-            
-        journals_result = query.execute()
-        journals = journals_result.data if journals_result.data else []
-        
-        logger.info(f"📊 Found {len(journals)} journals after date filtering")
-        
-        # ✅ DEBUG: Log transaction dates untuk verifikasi
-        for journal in journals[:5]:  # Log 5 pertama saja
-            logger.info(f"📅 Journal {journal.get('transaction_number')} - Date: {journal.get('transaction_date')}")
-        
-        # Untuk setiap journal, ambil detail entries
-        journals_with_entries = []
+        # Pagination keyset pada (transaction_date, id): hanya baris setelah/sebelum cursor yang dibaca
+        if after:
+            query = query.or_(f"transaction_date.gt.{after[0]},and(transaction_date.eq.{after[0]},id.gt.{after[1]})")
+        elif before:
+            query = query.or_(f"transaction_date.lt.{before[0]},and(transaction_date.eq.{before[0]},id.lt.{before[1]})")
         
-        for journal in journals:
-            # Ambil journal entries untuk journal ini
-            entries_result = supabase.table("journal_entries")\
-                .select("*")\
-                .eq("journal_id", journal['id'])\
-                .execute()
-            
-            journal_entries = entries_result.data if entries_result.data else []
-            
-            # Format data journal dengan entries
-            journal_data = {
-                'id': journal['id'],
-                'transaction_number': journal.get('transaction_number', ''),
-                'transaction_date': journal.get('transaction_date', ''),
-                'description': journal.get('description', 'Transaksi'),
-                'total_amount': journal.get('total_amount', 0),
-                'created_by': journal.get('created_by', 'System'),
-                'created_at': journal.get('created_at', ''),
-                'journal_entries': journal_entries
-            }
-            
-            journals_with_entries.append(journal_data)
+        return order_by(query, "transaction_date", "id", desc=descending)
+    
+    # Satu halaman keyset cukup satu query; tanpa limit dibaca per halaman .range() agar tidak terpotong
+    if limit:
+        journals = build_query().limit(limit).execute().data or []
+    else:
+        journals = list(fetch_all_rows(build_query))
+    if descending:
+        journals.reverse()
+    
+    logger.info(f"📊 Found {len(journals)} journals after date filtering")
+    
+    # ✅ DEBUG: Log transaction dates untuk verifikasi
+    for journal in journals[:5]:  # Log 5 pertama saja
+        logger.info(f"📅 Journal {journal.get('transaction_number')} - Date: {journal.get('transaction_date')}")
+    
+    # Ambil semua entries untuk journal-journal ini sekaligus (batch), bukan satu query per journal
+    entries_by_journal = get_journal_entries_by_journal_ids([journal['id'] for journal in journals])
+    
+    journals_with_entries = []
+    
+    for journal in journals:
+        journal_entries = entries_by_journal.get(journal['id'], [])
         
-        logger.info(f"✅ Journal entries with details fetched: {len(journals_with_entries)} journals")
-        return journals_with_entries
+        # Format data journal dengan entries
+        journal_data = {
+            'id': journal['id'],
+            'transaction_number': journal.get('transaction_number', ''),
+            'transaction_date': journal.get('transaction_date', ''),
+            'description': journal.get('description', 'Transaksi'),
+            'total_amount': journal.get('total_amount', 0),
+            'created_by': journal.get('created_by', 'System'),
+            'created_at': journal.get('created_at', ''),
+            'journal_entries': journal_entries
+        }
         
+        journals_with_entries.append(journal_data)
+    
+    logger.info(f"✅ Journal entries with details fetched: {len(journals_with_entries)} journals")
+    return journals_with_entries
+
+@request_memoized
+def get_journal_entries_with_details(start_date=None, end_date=None, limit=None, after=None, before=None):
+    """Jurnal umum + entries untuk halaman: seperti fetch_journals_with_details, list kosong jika gagal"""
+    try:
+        return fetch_journals_with_details(start_date, end_date, limit=limit, after=after, before=before)
     except Exception as e:
         logger.error(f"❌ Error getting journal entries with details: {e}")
         logger.error(traceback.format_exc())
         return []
 
-def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None):
-    """Ambil data buku besar yang dikelompokkan per akun dengan saldo running - DIPERBAIKI FILTER"""
+# Jumlah journal per halaman saat membaca jurnal secara bertahap (export, dll.)
+JOURNAL_READ_PAGE_SIZE = int(os.environ.get("JOURNAL_READ_PAGE_SIZE", 500))
+
+def iter_journals_with_details(start_date=None, end_date=None, page_size=None):
+    """Baca jurnal umum + entries halaman demi halaman (keyset), memori tetap berapa pun panjang riwayatnya
+    
+    Error query diteruskan (tidak menjadi halaman kosong) agar pemanggil tidak memakai data terpotong.
+    """
+    page_size = page_size or JOURNAL_READ_PAGE_SIZE
+    after = None
+    while True:
+        # Tanpa request_memoized: halaman tidak perlu disimpan di memo request
+        page = fetch_journals_with_details(start_date, end_date, limit=page_size, after=after)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1]['transaction_date'], page[-1]['id'])
+
+@request_memoized
+def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None, carry_forward=False):
+    """Ambil data buku besar yang dikelompokkan per akun dengan saldo running - DIPERBAIKI FILTER
+    
+    carry_forward=True: saldo awal = neraca saldo awal + mutasi sebelum start_date (dari snapshot saldo harian)
+    """
     try:
-        logger.info(f"🔍 Fetching grouped ledger data - Date: {start_date} to {end_date}")
+        logger.info(f"🔍 Fetching grouped ledger data - Date: {start_date} to {end_date}, carry_forward={carry_forward}")
         
-        # Ambil semua akun dari Chart of Account
-        all_accounts = get_chart_of_accounts()
+        # Chart of Account, neraca saldo awal, dan jurnal tidak saling bergantung: diambil paralel
+        all_accounts, opening_balances, journals = fetch_parallel(
+            (get_chart_of_accounts,),
+            (get_opening_balances_with_account_info,),
+            (get_journal_entries_with_details, start_date, end_date)
+        )
         if not all_accounts:
             logger.error("❌ No accounts found in Chart of Accounts")
             return []
         
-        # Ambil neraca saldo awal
-        opening_balances = get_opening_balances_with_account_info()
         logger.info(f"📊 Found {len(opening_balances)} opening balances")
-        
-        # ✅ PERBAIKAN: Gunakan fungsi yang sudah diperbaiki untuk ambil jurnal
-        journals = get_journal_entries_with_details(start_date, end_date)
         logger.info(f"📊 Journals after date filtering: {len(journals)}")
         
+        # Mutasi sebelum start_date per akun (debit, kredit) dari snapshot saldo harian
+        prior_totals = get_ledger_totals_before(start_date) if carry_forward and start_date else {}
+        if prior_totals:
+            # Akun di luar Chart of Account yang hanya punya mutasi sebelum start_date
+            known_codes = {account['account_code'] for account in all_accounts}
+            all_accounts = all_accounts + [
+                {'account_code': code, 'account_name': get_account_name(code), 'account_type': 'Unknown'}
+                for code in sorted(prior_totals) if code not in known_codes
+            ]
+        
         # Kelompokkan data per akun
         account_data = {}
+        opening_by_account = index_by(opening_balances, 'account_code')
         
         for account in all_accounts:
             account_code = account['account_code']
@@ -3036,7 +3946,7 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
             account_type = account['account_type']
             
             # Cari saldo awal untuk akun ini
-            opening_balance = next((bal for bal in opening_balances if bal['account_code'] == account_code), None)
+            opening_balance = opening_by_account.get(account_code)
             
             # PERBAIKAN: Inisialisasi initial_balance dengan benar berdasarkan tipe akun
             initial_balance = 0
@@ -3054,6 +3964,15 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
                     else:
                         initial_balance = -opening_balance['amount']
             
+            # Tambahkan mutasi sebelum start_date ke saldo awal
+            prior_debit, prior_credit = prior_totals.get(account_code, (0, 0))
+            has_prior_activity = bool(prior_debit or prior_credit)
+            if has_prior_activity:
+                if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']:
+                    initial_balance += prior_debit - prior_credit
+                else:
+                    initial_balance += prior_credit - prior_debit
+            
             account_data[account_code] = {
                 'account_code': account_code,
                 'account_name': account_name,
@@ -3069,7 +3988,19 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
             }
             
             # Tambahkan entry saldo awal jika ada
-            if opening_balance:
+            if has_prior_activity:
+                # Saldo awal gabungan ditampilkan sebagai saldo bersih di sisi debit/kredit
+                net_debit = initial_balance if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban'] else -initial_balance
+                account_data[account_code]['entries'].append({
+                    'date': 'SALDO AWAL',
+                    'description': f'SALDO AWAL PER {start_date}',
+                    'debit': net_debit if net_debit > 0 else 0,
+                    'credit': -net_debit if net_debit < 0 else 0,
+                    'is_opening_balance': True,
+                    'sort_order': 0,
+                    'running_balance': initial_balance
+                })
+            elif opening_balance:
                 account_data[account_code]['entries'].append({
                     'date': 'SALDO AWAL',
                     'description': 'NERACA SALDO AWAL',
@@ -3080,51 +4011,52 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
                     'running_balance': initial_balance
                 })
         
-        # Proses setiap transaksi jurnal
-        for journal in journals:
-            transaction_date = journal.get('transaction_date', '')
-            description = journal.get('description', 'Transaksi')
-            
-            for entry in journal.get('journal_entries', []):
-                account_code = entry['account_code']
-                
-                if account_code not in account_data:
-                    # Jika akun tidak ada di Chart of Account, buat entry baru
-                    account_data[account_code] = {
-                        'account_code': account_code,
-                        'account_name': get_account_name(account_code),
-                        'account_type': 'Unknown',
-                        'entries': [],
-                        'total_debit': 0,
-                        'total_credit': 0,
-                        'final_balance': 0,
-                        'initial_balance': 0,
-                        'has_opening_balance': False,
-                        'opening_balance_amount': 0,
-                        'opening_balance_position': None
-                    }
-                
-                debit = entry['amount'] if entry['position'] == 'debit' else 0
-                credit = entry['amount'] if entry['position'] == 'kredit' else 0
-                
-                # Tambahkan entry dengan sort_order untuk transaksi biasa
-                account_data[account_code]['entries'].append({
-                    'date': transaction_date,
-                    'description': description,
-                    'debit': debit,
-                    'credit': credit,
-                    'is_opening_balance': False,
-                    'sort_order': 1
-                })
-                
-                # Update total
-                account_data[account_code]['total_debit'] += debit
-                account_data[account_code]['total_credit'] += credit
-        
-        # Hitung saldo akhir dan saldo running untuk setiap akun - PERBAIKAN TOTAL
-        for account_code, data in account_data.items():
-            # Tentukan tipe akun untuk menghitung saldo yang benar
-            account_type = data['account_type']
+        # Proses transaksi jurnal dalam bentuk kolom: total dan saldo running per akun dihitung vektor
+        columns = build_ledger_columns(journals, keep_rows=True)
+        account_codes = columns['account_codes']
+        
+        for account_code in account_codes:
+            if account_code not in account_data:
+                # Jika akun tidak ada di Chart of Account, buat entry baru
+                account_data[account_code] = {
+                    'account_code': account_code,
+                    'account_name': get_account_name(account_code),
+                    'account_type': 'Unknown',
+                    'entries': [],
+                    'total_debit': 0,
+                    'total_credit': 0,
+                    'final_balance': 0,
+                    'initial_balance': 0,
+                    'has_opening_balance': False,
+                    'opening_balance_amount': 0,
+                    'opening_balance_position': None
+                }
+        
+        # Update total
+        for account_code, (total_debit, total_credit) in ledger_account_totals(columns).items():
+            account_data[account_code]['total_debit'] += total_debit
+            account_data[account_code]['total_credit'] += total_credit
+        
+        # Entries transaksi ditambahkan setelah saldo awal, urut tanggal per akun, beserta saldo running
+        debit_normal = [account_data[code]['account_type'] in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban'] for code in account_codes]
+        order, running = ledger_running_balances(columns, debit_normal)
+        for position, running_delta in zip(order.tolist(), running.tolist()):
+            journal, entry = columns['rows'][position]
+            data = account_data[entry['account_code']]
+            data['entries'].append({
+                'date': journal.get('transaction_date', ''),
+                'description': journal.get('description', 'Transaksi'),
+                'debit': entry['amount'] if entry['position'] == 'debit' else 0,
+                'credit': entry['amount'] if entry['position'] == 'kredit' else 0,
+                'is_opening_balance': False,
+                'sort_order': 1,
+                'running_balance': data['initial_balance'] + running_delta
+            })
+        
+        # Hitung saldo akhir untuk setiap akun - PERBAIKAN TOTAL
+        for account_code, data in account_data.items():
+            # Tentukan tipe akun untuk menghitung saldo yang benar
+            account_type = data['account_type']
             
             # PERBAIKAN: Gunakan initial_balance yang sudah disimpan
             initial_balance = data['initial_balance']
@@ -3136,28 +4068,6 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
             else:  # Kewajiban, Modal, Pendapatan
                 # Akun kredit normal: Saldo = Saldo Awal + Total Credit - Total Debit
                 data['final_balance'] = initial_balance + data['total_credit'] - data['total_debit']
-                        
-            # URUTKAN ENTRIES: Saldo awal dulu (sort_order=0), lalu transaksi (sort_order=1)
-            data['entries'].sort(key=lambda x: (x.get('sort_order', 1), x['date']))
-            
-            # Hitung saldo running untuk setiap entry - PERBAIKAN PERHITUNGAN RUNNING BALANCE
-            running_balance = initial_balance  # Mulai dari saldo awal
-            
-            for i, entry in enumerate(data['entries']):
-                if entry.get('is_opening_balance'):
-                    # Untuk saldo awal, langsung set running balance (seharusnya sudah benar)
-                    entry['running_balance'] = running_balance
-                else:
-                    # Untuk transaksi biasa, update running balance berdasarkan tipe akun
-                    if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']:
-                        # Akun debit: Debit menambah saldo, Kredit mengurangi saldo
-                        running_balance += entry['debit'] - entry['credit']
-                    else:
-                        # Akun kredit: Kredit menambah saldo, Debit mengurangi saldo
-                        running_balance += entry['credit'] - entry['debit']
-                    
-                    # Simpan saldo running
-                    entry['running_balance'] = running_balance
         
         # Konversi ke list dan filter hanya akun yang memiliki transaksi atau saldo awal
         result = []
@@ -3171,6 +4081,8 @@ def get_general_ledger_entries_grouped_by_account(start_date=None, end_date=None
         logger.info(f"✅ Grouped ledger data: {len(result)} accounts with transactions/opening balances")
         return result
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error getting grouped ledger entries: {e}")
         logger.error(traceback.format_exc())
@@ -3214,9 +4126,31 @@ def get_journal_summary(start_date=None, end_date=None):
         logger.error(f"❌ Error getting journal summary: {e}")
         return {'total_transactions': 0, 'total_amount': 0, 'account_summary': []}
 
+def get_journal_header_totals(start_date=None, end_date=None):
+    """Ringkasan ringan untuk header jurnal umum: jumlah transaksi (count di server) dan total nilai (snapshot saldo harian)"""
+    try:
+        query = supabase.table("general_journals").select("id", count="exact")
+        if start_date and end_date:
+            query = query.gte('transaction_date', start_date).lte('transaction_date', end_date)
+        result = query.limit(1).execute()
+        
+        return {
+            'total_transactions': result.count or 0,
+            'total_amount': get_ledger_debit_total(start_date, end_date)
+        }
+    except Exception as e:
+        logger.error(f"❌ Error getting journal header totals: {e}")
+        return {'total_transactions': 0, 'total_amount': 0}
+
 def delete_journal_transaction(transaction_id):
     """Hapus transaksi jurnal dan semua entries terkait"""
     try:
+        # Catat tanggal dan entries transaksi untuk invalidasi cache periode dan snapshot saldo harian
+        journal_result = supabase.table("general_journals").select("transaction_date").eq("id", transaction_id).execute()
+        transaction_date = journal_result.data[0].get('transaction_date') if journal_result.data else None
+        affected_periods = [period_of(transaction_date)]
+        old_entries = supabase.table("journal_entries").select("account_code, position, amount").eq("journal_id", transaction_id).execute().data or []
+        
         # Hapus journal entries terlebih dahulu
         delete_entries = supabase.table("journal_entries").delete().eq("journal_id", transaction_id).execute()
         
@@ -3224,6 +4158,8 @@ def delete_journal_transaction(transaction_id):
         delete_journal = supabase.table("general_journals").delete().eq("id", transaction_id).execute()
         
         if delete_journal.data:
+            invalidate_period_cache(affected_periods)
+            apply_ledger_snapshot_delta(transaction_id, transaction_date, old_entries, sign=-1)
             logger.info(f"✅ Journal transaction {transaction_id} deleted successfully")
             return {"success": True, "message": "Transaksi berhasil dihapus"}
         else:
@@ -3234,10 +4170,887 @@ def delete_journal_transaction(transaction_id):
         logger.error(f"❌ Error deleting journal transaction: {e}")
         return {"success": False, "message": f"Terjadi kesalahan: {str(e)}"}
 
+# ============================================================
+# 💧 KATEGORI ARUS KAS JURNAL
+# ============================================================
+# Kategori arus kas dan perubahan kas (cash_delta) dihitung sekali saat jurnal disimpan dan ikut
+# disimpan di general_journals, sehingga laporan arus kas cukup menjumlahkan per kategori.
+# Jurnal lama tanpa kategori diklasifikasikan saat dibaca, atau diisi dengan `flask backfill-cash-flow`.
+CASH_FLOW_RECEIPT = 'penerimaan_pelanggan'
+CASH_FLOW_SUPPLIER = 'pembayaran_pemasok'
+CASH_FLOW_EXPENSE = 'pembayaran_beban_operasional'
+CASH_FLOW_OTHER = 'lainnya'
+CASH_FLOW_COLUMNS = ('cash_flow_category', 'cash_delta')
+
+CASH_FLOW_KEYWORDS = {
+    CASH_FLOW_RECEIPT: [
+        'penjualan', 'jual', 'sales', 'pendapatan', 'pelunasan', 'piutang',
+        'penerimaan', 'terima', 'diterima', 'pembayaran pelanggan'
+    ],
+    CASH_FLOW_SUPPLIER: [
+        'pembelian', 'beli', 'bahan', 'pemasok', 'persediaan', 'perlengkapan',
+        'pelunasan', 'utang', 'pembayaran', 'bayar', 'dibayar',
+        'bibit', 'pakan', 'peralatan'
+    ],
+    CASH_FLOW_EXPENSE: [
+        'beban', 'gaji', 'listrik', 'air', 'obat', 'perawatan', 'operasional',
+        'biaya', 'pengeluaran', 'administrasi', 'transport', 'pemeliharaan'
+    ]
+}
+
+# Satu regex per kategori (alternasi semua keyword), dikompilasi sekali saat modul dimuat
+CASH_FLOW_PATTERNS = {
+    category: re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+    for category, keywords in CASH_FLOW_KEYWORDS.items()
+}
+
+# False setelah insert gagal karena kolom arus kas belum ada (migration belum dijalankan)
+_cash_flow_columns_available = True
+
+def classify_cash_flow(description, entries):
+    """Tentukan (kategori_arus_kas, cash_delta) satu jurnal
+    
+    cash_delta = debit - kredit akun kas. Satu jurnal hanya masuk satu kategori: kas masuk dicocokkan
+    dengan keyword penerimaan, kas keluar dengan keyword beban operasional lalu pemasok.
+    """
+    cash_delta = 0
+    for entry in entries:
+        if get_account_classification(entry['account_code'])['touches_cash']:
+            if entry['position'] == 'debit':
+                cash_delta += entry['amount']
+            elif entry['position'] == 'kredit':
+                cash_delta -= entry['amount']
+    
+    text = (description or '').lower()
+    if cash_delta > 0 and CASH_FLOW_PATTERNS[CASH_FLOW_RECEIPT].search(text):
+        category = CASH_FLOW_RECEIPT
+    elif cash_delta < 0 and CASH_FLOW_PATTERNS[CASH_FLOW_EXPENSE].search(text):
+        category = CASH_FLOW_EXPENSE
+    elif cash_delta < 0 and CASH_FLOW_PATTERNS[CASH_FLOW_SUPPLIER].search(text):
+        category = CASH_FLOW_SUPPLIER
+    else:
+        category = CASH_FLOW_OTHER
+    return category, cash_delta
+
+def is_missing_column_error(error):
+    """Cek apakah error insert/select berarti kolom belum ada di tabel"""
+    code = getattr(error, 'code', None)
+    message = str(error)
+    return code in ('PGRST204', '42703') or 'PGRST204' in message or ("column" in message and "does not exist" in message)
+
+def without_cash_flow_columns(row):
+    """Salin baris header jurnal tanpa kolom arus kas"""
+    return {key: value for key, value in row.items() if key not in CASH_FLOW_COLUMNS}
+
+def insert_journal_headers(table, rows):
+    """Insert header jurnal (dict atau list); ulangi tanpa kolom arus kas jika kolomnya belum ada"""
+    global _cash_flow_columns_available
+    
+    if _cash_flow_columns_available:
+        try:
+            return supabase.table(table).insert(rows).execute()
+        except Exception as e:
+            if not is_missing_column_error(e):
+                raise
+            _cash_flow_columns_available = False
+            logger.warning(f"⚠️ Cash flow columns missing on {table}, saving journals without them: {e}")
+    
+    if isinstance(rows, list):
+        return supabase.table(table).insert([without_cash_flow_columns(row) for row in rows]).execute()
+    return supabase.table(table).insert(without_cash_flow_columns(rows)).execute()
+
+def journal_cash_flow(journal):
+    """Kategori dan cash_delta tersimpan di jurnal, atau diklasifikasikan sekarang untuk jurnal lama"""
+    if journal.get('cash_flow_category') and journal.get('cash_delta') is not None:
+        return journal['cash_flow_category'], journal['cash_delta']
+    return classify_cash_flow(journal.get('description'), journal.get('journal_entries', []))
+
+def get_cash_flow_totals(start_date, end_date):
+    """Total arus kas per kategori untuk rentang tanggal: {kategori: jumlah kas (positif)}
+    
+    Hanya header jurnal yang dibaca; entries diambil untuk jurnal lama yang belum punya kategori.
+    """
+    journals = list(fetch_all_rows(
+        lambda: supabase.table("general_journals").select("*")
+            .gte("transaction_date", start_date).lte("transaction_date", end_date).order("id")
+    ))
+    
+    legacy_ids = {journal['id'] for journal in journals if not journal.get('cash_flow_category') or journal.get('cash_delta') is None}
+    entries_by_journal = get_journal_entries_by_journal_ids(list(legacy_ids)) if legacy_ids else {}
+    
+    totals = {category: 0 for category in (CASH_FLOW_RECEIPT, CASH_FLOW_SUPPLIER, CASH_FLOW_EXPENSE, CASH_FLOW_OTHER)}
+    for journal in journals:
+        if journal['id'] in legacy_ids:
+            journal = {**journal, 'journal_entries': entries_by_journal.get(journal['id'], [])}
+        category, cash_delta = journal_cash_flow(journal)
+        totals[category] = totals.get(category, 0) + abs(cash_delta)
+    
+    logger.info(f"💧 Cash flow totals {start_date}..{end_date}: {len(journals)} journals, {len(legacy_ids)} classified on read")
+    return totals
+
+@app.cli.command("backfill-cash-flow")
+@click.option("--batch-size", default=500, show_default=True, help="Jumlah jurnal per batch")
+def backfill_cash_flow_command(batch_size):
+    """Isi cash_flow_category dan cash_delta untuk jurnal lama yang belum punya kategori"""
+    updated = 0
+    while True:
+        result = supabase.table("general_journals").select("*").is_("cash_flow_category", "null").limit(batch_size).execute()
+        journals = result.data or []
+        if not journals:
+            break
+        
+        entries_by_journal = get_journal_entries_by_journal_ids([journal['id'] for journal in journals])
+        
+        # Satu upsert per batch (baris lengkap, konflik pada id), bukan satu UPDATE per jurnal
+        rows = []
+        for journal in journals:
+            category, cash_delta = classify_cash_flow(journal.get('description'), entries_by_journal.get(journal['id'], []))
+            rows.append({**journal, "cash_flow_category": category, "cash_delta": cash_delta})
+        supabase.table("general_journals").upsert(rows, on_conflict="id").execute()
+        
+        updated += len(journals)
+        click.echo(f"💧 {updated} journals classified")
+    
+    if updated:
+        invalidate_period_cache()
+    click.echo(f"✅ Cash flow backfill done: {updated} journals")
+
+# ============================================================
+# 🔹 POSTING JURNAL ATOMIK (SUPABASE RPC)
+# ============================================================
+# Fungsi SQL post_journal / post_adjusting_journal (lihat supabase/migrations) menyimpan header
+# dan entries dalam satu transaksi database. Jika fungsi belum terpasang, posting kembali ke
+# insert header + insert entries + rollback manual, dan RPC dicoba lagi setelah POSTING_RPC_RETRY detik.
+POSTING_RPC = os.environ.get("POSTING_RPC", "1") == "1"
+POSTING_RPC_RETRY = int(os.environ.get("POSTING_RPC_RETRY", 600))
+_posting_rpc_retry_at = 0.0
+
+def posting_rpc_enabled():
+    """Cek apakah jalur RPC posting jurnal boleh dipakai saat ini"""
+    return POSTING_RPC and time.monotonic() >= _posting_rpc_retry_at
+
+def is_missing_rpc_error(error):
+    """Cek apakah error RPC berarti fungsinya belum ada di database (bukan error data)"""
+    code = getattr(error, 'code', None)
+    message = str(error)
+    return code in ('PGRST202', '42883') or 'PGRST202' in message or 'Could not find the function' in message
+
+def insert_journal_with_entries(rpc_name, header_table, entries_table, foreign_key, header, entries):
+    """Simpan header + entries jurnal; kembalikan baris header tersimpan, atau None jika gagal
+    
+    Lewat RPC semuanya atomik dalam satu round trip. Error data dari RPC diteruskan ke pemanggil
+    (tidak dicoba ulang lewat jalur lama supaya tidak tersimpan dua kali).
+    """
+    global _posting_rpc_retry_at
+    
+    if posting_rpc_enabled():
+        try:
+            result = supabase.rpc(rpc_name, {"p_header": header, "p_entries": entries}).execute()
+            return result.data or None
+        except Exception as e:
+            if not is_missing_rpc_error(e):
+                raise
+            _posting_rpc_retry_at = time.monotonic() + POSTING_RPC_RETRY
+            logger.warning(f"⚠️ {rpc_name} RPC not available, using sequential inserts for {POSTING_RPC_RETRY}s: {e}")
+    
+    header_result = insert_journal_headers(header_table, header)
+    saved_header = header_result.data[0] if header_result.data else None
+    if not saved_header:
+        return None
+    
+    try:
+        entries_result = supabase.table(entries_table).insert([
+            {**entry, foreign_key: saved_header['id']} for entry in entries
+        ]).execute()
+    except Exception:
+        # Rollback: hapus header jika insert entries gagal (APIError), lalu teruskan error-nya
+        supabase.table(header_table).delete().eq("id", saved_header['id']).execute()
+        raise
+    
+    if not entries_result.data:
+        # Rollback: hapus header jika gagal simpan entries
+        supabase.table(header_table).delete().eq("id", saved_header['id']).execute()
+        return None
+    
+    return saved_header
+
+def validate_journal_payload(data, known_accounts=None):
+    """Validasi satu transaksi jurnal (dari form, API, atau import)
+    
+    Mengembalikan (journal, None) jika valid dengan amount sudah berupa angka,
+    atau (None, pesan_error). known_accounts: set kode akun yang boleh dipakai (opsional).
+    """
+    if not isinstance(data, dict):
+        return None, "Format transaksi tidak valid"
+    
+    transaction_date = data.get('transaction_date')
+    description = data.get('description')
+    entries = data.get('entries') or []
+    
+    if not transaction_date or not description or not entries:
+        return None, "Data transaksi tidak lengkap"
+    
+    try:
+        datetime.strptime(str(transaction_date), '%Y-%m-%d')
+    except ValueError:
+        return None, f"Format tanggal harus YYYY-MM-DD: {transaction_date}"
+    
+    if not isinstance(entries, list):
+        return None, "Format entries tidak valid"
+    
+    clean_entries = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None, "Format entry tidak valid"
+        account_code = entry.get('account_code')
+        position = entry.get('position')
+        if not account_code:
+            return None, "Kode akun wajib diisi"
+        if known_accounts is not None and account_code not in known_accounts:
+            return None, f"Akun {account_code} tidak ada di Chart of Account"
+        if position not in ['debit', 'kredit']:
+            return None, "Posisi harus 'debit' atau 'kredit'"
+        try:
+            amount = float(entry.get('amount'))
+        except (TypeError, ValueError):
+            return None, "Nominal harus berupa angka"
+        # float() menerima "nan"/"inf", yang lolos cek balance
+        if not math.isfinite(amount):
+            return None, "Nominal harus berupa angka"
+        if amount <= 0:
+            return None, "Nominal harus lebih dari 0"
+        clean_entries.append({**entry, 'amount': int(amount) if amount.is_integer() else amount})
+    
+    # Validasi balance
+    total_debit = sum(entry['amount'] for entry in clean_entries if entry['position'] == 'debit')
+    total_credit = sum(entry['amount'] for entry in clean_entries if entry['position'] == 'kredit')
+    
+    if round(total_debit, 2) != round(total_credit, 2):
+        return None, "Total debit dan kredit tidak balance"
+    
+    return {
+        'transaction_number': data.get('transaction_number'),
+        'transaction_date': str(transaction_date),
+        'description': description,
+        'total_amount': data.get('total_amount') or total_debit,
+        'entries': clean_entries
+    }, None
+
+# Jumlah transaksi per insert batch saat import jurnal
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+IMPORT_MAX_JOURNALS = int(os.environ.get("IMPORT_MAX_JOURNALS", 20000))
+
+def insert_journal_batch(headers, entries_by_number):
+    """Simpan satu batch jurnal import: (ids_by_number, pesan_error, orphaned_ids)
+    
+    Lewat RPC post_journal_batch (lihat supabase/migrations) seluruh batch atomik. Tanpa RPC, header dan
+    entries di-insert massal lalu dihapus lagi jika gagal; id header yang tidak berhasil dihapus dikembalikan
+    di orphaned_ids agar bisa dibersihkan manual.
+    """
+    global _posting_rpc_retry_at
+    
+    if posting_rpc_enabled():
+        try:
+            result = supabase.rpc("post_journal_batch", {"p_journals": [
+                {"header": header, "entries": entries_by_number[header['transaction_number']]} for header in headers
+            ]}).execute()
+            ids_by_number = {header['transaction_number']: header['id'] for header in result.data or []}
+            if len(ids_by_number) != len(headers):
+                return None, "Gagal menyimpan header transaksi", []
+            return ids_by_number, None, []
+        except Exception as e:
+            if not is_missing_rpc_error(e):
+                return None, str(e), []
+            _posting_rpc_retry_at = time.monotonic() + POSTING_RPC_RETRY
+            logger.warning(f"⚠️ post_journal_batch RPC not available, using batch inserts for {POSTING_RPC_RETRY}s: {e}")
+    
+    header_ids = []
+    try:
+        headers_result = insert_journal_headers("general_journals", headers)
+        ids_by_number = {header['transaction_number']: header['id'] for header in headers_result.data or []}
+        header_ids = list(ids_by_number.values())
+        
+        if len(ids_by_number) != len(headers):
+            raise ValueError("Gagal menyimpan header transaksi")
+        
+        journal_entries = [
+            {**entry, "journal_id": ids_by_number[header['transaction_number']]}
+            for header in headers
+            for entry in entries_by_number[header['transaction_number']]
+        ]
+        entries_result = supabase.table("journal_entries").insert(journal_entries).execute()
+        if len(entries_result.data or []) != len(journal_entries):
+            raise ValueError("Gagal menyimpan detail transaksi")
+        return ids_by_number, None, []
+        
+    except Exception as e:
+        # Rollback batch ini: hapus entries dan header yang sempat tersimpan
+        orphaned_ids = []
+        if header_ids:
+            try:
+                supabase.table("journal_entries").delete().in_("journal_id", header_ids).execute()
+                supabase.table("general_journals").delete().in_("id", header_ids).execute()
+            except Exception as rollback_error:
+                orphaned_ids = header_ids
+                logger.error(f"❌ Error rolling back journal batch, headers left behind {header_ids}: {rollback_error}")
+        return None, str(e), orphaned_ids
+
+def import_journal_transactions(journals, created_by):
+    """Validasi dan simpan banyak transaksi jurnal sekaligus per batch
+    
+    Mengembalikan (hasil per baris, orphaned_ids). Hasil per baris: {'row', 'success', 'transaction_number' | 'message'};
+    orphaned_ids: id header dari batch gagal yang tidak berhasil di-rollback.
+    """
+    started = time.time()
+    # Jika chart of accounts gagal dimuat, kode akun tidak divalidasi (sama seperti simpan transaksi biasa)
+    known_accounts = set(get_chart_of_accounts_cache()['by_code']) or None
+    results = [None] * len(journals)
+    valid = []
+    
+    # Tahap 1: validasi semua baris dalam satu putaran
+    import_prefix = generate_invoice("JNL")
+    seen_numbers = set()
+    for row, data in enumerate(journals):
+        journal, error = validate_journal_payload(data, known_accounts)
+        if not error:
+            journal['transaction_number'] = journal['transaction_number'] or f"{import_prefix}-{row + 1:05d}"
+            if journal['transaction_number'] in seen_numbers:
+                error = f"Nomor transaksi {journal['transaction_number']} duplikat dalam file import"
+        if error:
+            results[row] = {'row': row + 1, 'success': False, 'message': error}
+            continue
+        seen_numbers.add(journal['transaction_number'])
+        journal['cash_flow_category'], journal['cash_delta'] = classify_cash_flow(journal['description'], journal['entries'])
+        valid.append((row, journal))
+    
+    # Tahap 2: simpan header dan entries per batch
+    saved_journals = []
+    orphaned_ids = []
+    for i in range(0, len(valid), IMPORT_BATCH_SIZE):
+        batch = valid[i:i + IMPORT_BATCH_SIZE]
+        created_at = datetime.utcnow().isoformat()
+        headers = [
+            {
+                "transaction_number": journal['transaction_number'],
+                "transaction_date": journal['transaction_date'],
+                "description": journal['description'],
+                "total_amount": journal['total_amount'],
+                "cash_flow_category": journal['cash_flow_category'],
+                "cash_delta": journal['cash_delta'],
+                "created_by": created_by,
+                "created_at": created_at
+            }
+            for row, journal in batch
+        ]
+        entries_by_number = {
+            journal['transaction_number']: [
+                {
+                    "account_code": entry['account_code'],
+                    "position": entry['position'],
+                    "amount": entry['amount'],
+                    "note": entry.get('note', ''),
+                    "created_at": created_at
+                }
+                for entry in journal['entries']
+            ]
+            for row, journal in batch
+        }
+        
+        ids_by_number, error, batch_orphaned_ids = insert_journal_batch(headers, entries_by_number)
+        if error:
+            logger.error(f"❌ Error importing journal batch {i // IMPORT_BATCH_SIZE + 1}: {error}")
+            orphaned_ids.extend(batch_orphaned_ids)
+            for row, journal in batch:
+                results[row] = {'row': row + 1, 'success': False, 'message': f"Terjadi kesalahan sistem: {error}"}
+            continue
+        
+        for row, journal in batch:
+            results[row] = {'row': row + 1, 'success': True, 'transaction_number': journal['transaction_number']}
+            saved_journals.append((ids_by_number[journal['transaction_number']], journal['transaction_date'], journal['entries']))
+    
+    # Tahap 3: invalidasi cache periode sekali per periode, snapshot saldo harian dalam satu transaksi SQLite
+    if saved_journals:
+        invalidate_period_cache({period_of(transaction_date) for _, transaction_date, _ in saved_journals})
+        apply_ledger_snapshot_deltas(saved_journals)
+    
+    imported = sum(1 for result in results if result['success'])
+    elapsed = max(time.time() - started, 0.001)
+    logger.info(f"📥 Imported {imported}/{len(journals)} journals in {elapsed:.2f}s ({imported / elapsed:.0f} journals/s)")
+    return results, orphaned_ids
+
+def parse_journal_import_csv(text):
+    """Baca CSV import jurnal: satu baris per entry, dikelompokkan per kolom journal_ref
+    
+    Kolom: journal_ref, transaction_date, description, account_code, position, amount, note (opsional),
+    transaction_number (opsional). Header transaksi diambil dari baris pertama tiap journal_ref.
+    """
+    journals = OrderedDict()
+    for line in csv.DictReader(StringIO(text.lstrip("\ufeff"))):
+        line = {key.strip(): (value or '').strip() for key, value in line.items() if key}
+        journal_ref = line.get('journal_ref') or line.get('transaction_number')
+        journal = journals.setdefault(journal_ref, {
+            'transaction_number': line.get('transaction_number') or None,
+            'transaction_date': line.get('transaction_date'),
+            'description': line.get('description'),
+            'entries': []
+        })
+        journal['entries'].append({
+            'account_code': line.get('account_code'),
+            'position': line.get('position', '').lower(),
+            'amount': line.get('amount'),
+            'note': line.get('note', '')
+        })
+    return list(journals.values())
+
+# ============================================================
+# 🧮 MESIN LEDGER KOLOMNAR (NUMPY)
+# ============================================================
+# Entries jurnal diubah menjadi kolom array: index akun, ordinal tanggal, dan nominal bertanda
+# (debit positif, kredit negatif). Total per akun/bulan/hari memakai np.bincount dan saldo
+# running memakai np.cumsum, menggantikan loop Python per entry di fungsi laporan.
+
+def build_ledger_columns(journals, keep_rows=False):
+    """Ubah jurnal umum (dengan journal_entries) menjadi kolom NumPy
+    
+    keep_rows=True menyimpan referensi (journal, entry) per baris untuk membangun tampilan.
+    """
+    account_positions = {}
+    date_ordinals = {}
+    account_index, date_ordinal, amounts, rows = [], [], [], []
+    
+    for journal in journals:
+        transaction_date = journal.get('transaction_date', '')
+        ordinal = date_ordinals.get(transaction_date)
+        if ordinal is None:
+            try:
+                ordinal = datetime.strptime(transaction_date, '%Y-%m-%d').toordinal()
+            except (TypeError, ValueError):
+                ordinal = 0
+            date_ordinals[transaction_date] = ordinal
+        
+        for entry in journal.get('journal_entries', []):
+            account_index.append(account_positions.setdefault(entry['account_code'], len(account_positions)))
+            date_ordinal.append(ordinal)
+            if entry['position'] == 'debit':
+                amounts.append(entry['amount'])
+            elif entry['position'] == 'kredit':
+                amounts.append(-entry['amount'])
+            else:
+                amounts.append(0)
+            if keep_rows:
+                rows.append((journal, entry))
+    
+    # Nominal bulat tetap int64 agar hasil sama persis dengan penjumlahan Python
+    amount_dtype = np.int64 if all(isinstance(amount, int) for amount in amounts) else np.float64
+    return {
+        'account_codes': list(account_positions),
+        'account_index': np.array(account_index, dtype=np.intp),
+        'date_ordinal': np.array(date_ordinal, dtype=np.int64),
+        'date_labels': {ordinal: transaction_date for transaction_date, ordinal in date_ordinals.items()},
+        'amount': np.array(amounts, dtype=amount_dtype),
+        'rows': rows
+    }
+
+def _grouped_sum(group_index, values, group_count):
+    """Jumlahkan values per grup dengan np.bincount, tipe hasil mengikuti values"""
+    totals = np.bincount(group_index, weights=values, minlength=group_count)
+    return np.rint(totals).astype(np.int64) if values.dtype.kind == 'i' else totals
+
+def ledger_grouped_totals(columns, group_index):
+    """Total debit dan kredit per pasangan (grup, akun) yang benar-benar punya entry
+    
+    Hanya pasangan yang muncul yang dihitung (np.unique + satu bincount atas index gabungan), jadi
+    memori mengikuti jumlah pasangan aktif, bukan grup x akun. Kembalian: (grup, index akun, debit, kredit)
+    sebagai array sejajar, terurut menurut grup lalu index akun.
+    """
+    account_count = len(columns['account_codes'])
+    combined = group_index.astype(np.int64) * account_count + columns['account_index']
+    pairs, pair_index = np.unique(combined, return_inverse=True)
+    amount = columns['amount']
+    debit = _grouped_sum(pair_index, np.where(amount > 0, amount, 0), len(pairs))
+    credit = _grouped_sum(pair_index, np.where(amount < 0, -amount, 0), len(pairs))
+    return pairs // account_count, pairs % account_count, debit, credit
+
+def ledger_account_totals(columns):
+    """Total debit/kredit per akun: {account_code: (debit, credit)}"""
+    if not columns['account_codes']:
+        return {}
+    _, accounts, debit, credit = ledger_grouped_totals(columns, np.zeros(len(columns['amount']), dtype=np.intp))
+    account_codes = columns['account_codes']
+    return {account_codes[index]: totals for index, totals in zip(accounts.tolist(), zip(debit.tolist(), credit.tolist()))}
+
+def _ledger_totals_by_label(columns, label_of_ordinal):
+    """Total debit/kredit per (label tanggal, akun): {label: {account_code: (debit, credit)}}"""
+    if not columns['account_codes']:
+        return {}
+    unique_ordinals, inverse = np.unique(columns['date_ordinal'], return_inverse=True)
+    labels = []
+    label_positions = {}
+    ordinal_groups = []
+    for ordinal in unique_ordinals.tolist():
+        label = label_of_ordinal(columns['date_labels'][ordinal])
+        ordinal_groups.append(label_positions.setdefault(label, len(labels)))
+        if len(labels) < len(label_positions):
+            labels.append(label)
+    
+    group_index = np.array(ordinal_groups, dtype=np.intp)[inverse]
+    groups, accounts, debit, credit = ledger_grouped_totals(columns, group_index)
+    
+    result = {label: {} for label in labels}
+    account_codes = columns['account_codes']
+    active = (debit != 0) | (credit != 0)
+    for group, account, total_debit, total_credit in zip(
+        groups[active].tolist(), accounts[active].tolist(), debit[active].tolist(), credit[active].tolist()
+    ):
+        result[labels[group]][account_codes[account]] = (total_debit, total_credit)
+    return result
+
+def ledger_totals_by_period(columns):
+    """Total debit/kredit per bulan per akun: {YYYY-MM: {account_code: (debit, credit)}}"""
+    return _ledger_totals_by_label(columns, period_of)
+
+def ledger_totals_by_date(columns):
+    """Total debit/kredit per hari per akun: {YYYY-MM-DD: {account_code: (debit, credit)}}"""
+    return _ledger_totals_by_label(columns, lambda transaction_date: transaction_date)
+
+def ledger_running_balances(columns, debit_normal):
+    """Saldo running per akun (tanpa saldo awal) dengan np.cumsum
+    
+    debit_normal: list bool per akun (urutan account_codes). Mengembalikan (order, running):
+    order = index baris urut per akun lalu tanggal (stabil), running = saldo kumulatif baris tersebut.
+    """
+    amount = columns['amount']
+    if not len(amount):
+        return np.array([], dtype=np.intp), amount
+    
+    account_index = columns['account_index']
+    sign = np.where(np.asarray(debit_normal, dtype=bool)[account_index], 1, -1)
+    order = np.lexsort((columns['date_ordinal'], account_index))
+    
+    sorted_delta = (amount * sign)[order]
+    sorted_account = account_index[order]
+    
+    # cumsum per segmen akun (bukan kumulatif global dikurangi offset) agar nominal desimal
+    # menghasilkan angka yang sama persis dengan penjumlahan berurutan
+    bounds = np.flatnonzero(sorted_account[1:] != sorted_account[:-1]) + 1
+    running = np.concatenate([np.cumsum(segment) for segment in np.split(sorted_delta, bounds)])
+    return order, running
+
+def column_totals(rows, keys):
+    """Jumlah beberapa kolom numerik dari list dict: {key: total}
+    
+    Tiap kolom langsung dibangun sebagai satu array NumPy (int64 jika semua nilainya int) lalu dijumlahkan.
+    """
+    totals = {}
+    for key in keys:
+        column = np.array([row[key] for row in rows])
+        totals[key] = column.sum().item() if column.size else 0
+    return totals
+
+# ============================================================
+# 📈 SNAPSHOT SALDO HARIAN BUKU BESAR
+# ============================================================
+# Total debit/kredit per akun per hari disimpan di SQLite cache saldo dan diperbarui
+# secara inkremental saat transaksi disimpan/dihapus. Dibangun ulang penuh setelah
+# LEDGER_SNAPSHOT_TTL agar perubahan dari luar aplikasi tetap ikut, dan saat versi ledger
+# bersama (Supabase) naik oleh instance lain.
+#
+# Rebuild membaca seluruh jurnal tanpa mengunci SQLite, jadi delta yang masuk selama scan
+# dicatat di ledger_snapshot_deltas. Sebelum scan, rebuild mencatat watermark (seq delta
+# terakhir); saat hasil scan ditulis, delta setelah watermark diputar ulang berdasarkan
+# journal_id: simpan yang belum terbaca scan ditambahkan, hapus yang sudah terbaca dikurangi.
+LEDGER_SNAPSHOT_TTL = int(os.environ.get("LEDGER_SNAPSHOT_TTL", 3600))
+
+def get_ledger_snapshot_db():
+    """Buka koneksi SQLite cache saldo dengan tabel snapshot saldo harian"""
+    conn = get_balance_cache_db()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_daily_totals (
+            account_code TEXT NOT NULL,
+            entry_date TEXT NOT NULL,
+            debit REAL NOT NULL DEFAULT 0,
+            credit REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_code, entry_date)
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS ledger_snapshot_meta (key TEXT PRIMARY KEY, value REAL)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_snapshot_deltas (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            journal_id TEXT NOT NULL,
+            sign INTEGER NOT NULL,
+            entry_date TEXT NOT NULL,
+            totals TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_snapshot_rebuilds (
+            id TEXT PRIMARY KEY,
+            watermark INTEGER NOT NULL,
+            started_at REAL NOT NULL
+        )
+    """)
+    return conn
+
+def entry_daily_totals(entries, sign=1):
+    """Total (account_code, debit, credit) per entry untuk snapshot saldo harian"""
+    return [
+        (
+            entry['account_code'],
+            sign * entry['amount'] if entry['position'] == 'debit' else 0,
+            sign * entry['amount'] if entry['position'] == 'kredit' else 0
+        )
+        for entry in entries
+    ]
+
+def add_ledger_daily_totals(conn, entry_date, totals):
+    """Tambahkan [(account_code, debit, credit)] ke ledger_daily_totals pada satu tanggal"""
+    conn.executemany("""
+        INSERT INTO ledger_daily_totals (account_code, entry_date, debit, credit) VALUES (?, ?, ?, ?)
+        ON CONFLICT (account_code, entry_date)
+        DO UPDATE SET debit = debit + excluded.debit, credit = credit + excluded.credit
+    """, [(account_code, entry_date, debit, credit) for account_code, debit, credit in totals])
+
+def shared_ledger_version_total():
+    """Versi ledger bersama tertinggi (semua periode) langsung dari Supabase, None jika memakai versi lokal"""
+    source, versions = get_ledger_versions.__wrapped__()
+    if source != 'supabase':
+        return None
+    return max((version for version, _ in versions.values()), default=0)
+
+def rebuild_ledger_snapshot():
+    """Bangun ulang snapshot saldo harian dari seluruh jurnal umum
+    
+    Error membaca jurnal diteruskan; snapshot lama tetap dipakai dan tidak diganti hasil kosong.
+    """
+    rebuild_id = uuid.uuid4().hex
+    ledger_version = shared_ledger_version_total()
+    
+    conn = get_ledger_snapshot_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Rebuild yang tidak pernah selesai (proses mati) tidak menahan log delta
+        conn.execute("DELETE FROM ledger_snapshot_rebuilds WHERE started_at < ?", (time.time() - LEDGER_SNAPSHOT_TTL,))
+        watermark = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM ledger_snapshot_deltas").fetchone()[0]
+        conn.execute(
+            "INSERT INTO ledger_snapshot_rebuilds (id, watermark, started_at) VALUES (?, ?, ?)",
+            (rebuild_id, watermark, time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    
+    scanned_ids = set()
+    
+    def scanned_journals():
+        for journal in iter_journals_with_details():
+            scanned_ids.add(str(journal['id']))
+            yield journal
+    
+    try:
+        daily_totals = ledger_totals_by_date(build_ledger_columns(scanned_journals()))
+    except Exception:
+        conn = get_ledger_snapshot_db()
+        try:
+            with conn:
+                conn.execute("DELETE FROM ledger_snapshot_rebuilds WHERE id = ?", (rebuild_id,))
+        finally:
+            conn.close()
+        raise
+    
+    conn = get_ledger_snapshot_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM ledger_daily_totals")
+        conn.executemany(
+            "INSERT INTO ledger_daily_totals (account_code, entry_date, debit, credit) VALUES (?, ?, ?, ?)",
+            [
+                (code, entry_date, debit, credit)
+                for entry_date, account_totals in daily_totals.items()
+                for code, (debit, credit) in account_totals.items()
+            ]
+        )
+        
+        # Putar ulang delta yang masuk selama scan; journal yang sudah tercermin di hasil scan dilewati
+        present = set(scanned_ids)
+        replayed = 0
+        for journal_id, sign, entry_date, totals in conn.execute(
+            "SELECT journal_id, sign, entry_date, totals FROM ledger_snapshot_deltas WHERE seq > ? ORDER BY seq", (watermark,)
+        ).fetchall():
+            if (sign > 0) == (journal_id in present):
+                continue
+            add_ledger_daily_totals(conn, entry_date, json.loads(totals))
+            if sign > 0:
+                present.add(journal_id)
+            else:
+                present.discard(journal_id)
+            replayed += 1
+        
+        # Log delta hanya disimpan selama masih ada rebuild lain yang membutuhkannya
+        conn.execute("DELETE FROM ledger_snapshot_rebuilds WHERE id = ?", (rebuild_id,))
+        oldest_watermark = conn.execute("SELECT MIN(watermark) FROM ledger_snapshot_rebuilds").fetchone()[0]
+        if oldest_watermark is None:
+            conn.execute("DELETE FROM ledger_snapshot_deltas")
+        else:
+            conn.execute("DELETE FROM ledger_snapshot_deltas WHERE seq <= ?", (oldest_watermark,))
+        
+        conn.execute("INSERT OR REPLACE INTO ledger_snapshot_meta (key, value) VALUES ('built_at', ?)", (time.time(),))
+        if ledger_version is None:
+            conn.execute("DELETE FROM ledger_snapshot_meta WHERE key = 'ledger_version'")
+        else:
+            conn.execute("INSERT OR REPLACE INTO ledger_snapshot_meta (key, value) VALUES ('ledger_version', ?)", (ledger_version,))
+        conn.commit()
+    finally:
+        conn.close()
+    
+    logger.info(f"📈 Ledger snapshot rebuilt: {len(scanned_ids)} journals, {replayed} deltas replayed after watermark {watermark}")
+
+def ledger_snapshot_stale():
+    """Cek apakah snapshot saldo harian belum ada, kedaluwarsa, atau tertinggal versi ledger bersama"""
+    conn = get_ledger_snapshot_db()
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM ledger_snapshot_meta").fetchall())
+    finally:
+        conn.close()
+    
+    built_at = meta.get('built_at')
+    if not built_at or time.time() - built_at >= LEDGER_SNAPSHOT_TTL:
+        return True
+    if 'ledger_version' in meta:
+        source, versions = get_ledger_versions()
+        if source == 'supabase':
+            # Versi naik tanpa lewat host ini: ada penulisan dari instance lain yang deltanya tidak diterapkan di sini
+            return max((version for version, _ in versions.values()), default=0) != meta['ledger_version']
+    return False
+
+def ensure_ledger_snapshot():
+    """Pastikan snapshot saldo harian ada, belum kedaluwarsa, dan tidak tertinggal versi ledger bersama"""
+    if ledger_snapshot_stale():
+        rebuild_ledger_snapshot()
+
+def advance_ledger_snapshot_version(version):
+    """Catat versi ledger bersama yang dibuat host ini di snapshot
+    
+    Hanya maju jika versi sebelumnya tepat version - 1 (tidak ada penulisan dari instance lain di antaranya);
+    jika tidak, snapshot dianggap tertinggal dan dibangun ulang oleh ensure_ledger_snapshot.
+    """
+    try:
+        conn = get_ledger_snapshot_db()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE ledger_snapshot_meta SET value = ? WHERE key = 'ledger_version' AND value = ?",
+                    (version, version - 1)
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Error advancing ledger snapshot version: {e}")
+
+def apply_ledger_snapshot_deltas(journals, sign=1):
+    """Perbarui snapshot saldo harian secara inkremental (sign=1 simpan, sign=-1 hapus)
+    
+    journals: [(journal_id, transaction_date, entries)]. Selama rebuild berjalan, delta juga dicatat
+    di log agar bisa diputar ulang di atas hasil scan.
+    """
+    try:
+        conn = get_ledger_snapshot_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            built = conn.execute("SELECT 1 FROM ledger_snapshot_meta WHERE key = 'built_at'").fetchone()
+            rebuilding = conn.execute("SELECT 1 FROM ledger_snapshot_rebuilds LIMIT 1").fetchone()
+            # Jika snapshot belum pernah dibangun dan tidak sedang dibangun, biarkan rebuild berikutnya yang mengisi
+            if not built and not rebuilding:
+                conn.rollback()
+                return
+            
+            for journal_id, transaction_date, entries in journals:
+                totals = entry_daily_totals(entries, sign)
+                if built:
+                    add_ledger_daily_totals(conn, transaction_date, totals)
+                if rebuilding:
+                    conn.execute(
+                        "INSERT INTO ledger_snapshot_deltas (journal_id, sign, entry_date, totals) VALUES (?, ?, ?, ?)",
+                        (str(journal_id), sign, transaction_date, json.dumps(totals))
+                    )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Error updating ledger snapshot: {e}")
+
+def apply_ledger_snapshot_delta(journal_id, transaction_date, entries, sign=1):
+    """Perbarui snapshot saldo harian untuk satu jurnal (sign=1 simpan, sign=-1 hapus)"""
+    apply_ledger_snapshot_deltas([(journal_id, transaction_date, entries)], sign)
+
+def get_ledger_totals_before(date_str):
+    """Total debit dan kredit per akun untuk semua transaksi sebelum date_str: {account_code: (debit, credit)}"""
+    try:
+        ensure_ledger_snapshot()
+        conn = get_ledger_snapshot_db()
+        try:
+            rows = conn.execute("""
+                SELECT account_code, SUM(debit), SUM(credit)
+                FROM ledger_daily_totals
+                WHERE entry_date < ?
+                GROUP BY account_code
+            """, (date_str,)).fetchall()
+        finally:
+            conn.close()
+        return {code: (debit, credit) for code, debit, credit in rows}
+    except Exception as e:
+        logger.error(f"❌ Error reading ledger snapshot: {e}")
+        logger.error(traceback.format_exc())
+        return {}
+
+def get_ledger_debit_total(start_date=None, end_date=None):
+    """Total debit seluruh jurnal umum dalam rentang tanggal, tanpa pernah membangun ulang snapshot
+    
+    Dipakai di header halaman (GET), jadi urutannya: agregasi server trial_balance_totals, snapshot saldo
+    harian yang masih segar, lalu jumlah total_amount jurnal umum dalam rentang.
+    """
+    if trial_balance_rpc_enabled():
+        try:
+            return sum(debit for debit, _ in get_account_totals_rpc(start_date, end_date).values())
+        except Exception as e:
+            disable_trial_balance_rpc(e)
+    
+    try:
+        if not ledger_snapshot_stale():
+            conn = get_ledger_snapshot_db()
+            try:
+                if start_date and end_date:
+                    row = conn.execute(
+                        "SELECT SUM(debit) FROM ledger_daily_totals WHERE entry_date >= ? AND entry_date <= ?",
+                        (start_date, end_date)
+                    ).fetchone()
+                else:
+                    row = conn.execute("SELECT SUM(debit) FROM ledger_daily_totals").fetchone()
+            finally:
+                conn.close()
+            return row[0] or 0
+    except Exception as e:
+        logger.warning(f"⚠️ Error reading ledger snapshot total: {e}")
+    
+    try:
+        def build_query():
+            query = order_by(supabase.table("general_journals").select("id, total_amount"), "id")
+            if start_date and end_date:
+                query = query.gte('transaction_date', start_date).lte('transaction_date', end_date)
+            return query
+        return sum(journal.get('total_amount') or 0 for journal in fetch_all_rows(build_query))
+    except Exception as e:
+        logger.error(f"❌ Error reading journal debit total: {e}")
+        return 0
+
 # ============================================================
 # 📋 9. JURNAL UMUM
 # ============================================================
 
+# Jumlah transaksi per halaman jurnal umum (pilihan yang bisa dipakai lewat ?page_size=)
+JOURNAL_PAGE_SIZE = int(os.environ.get("JOURNAL_PAGE_SIZE", 50))
+JOURNAL_PAGE_SIZE_OPTIONS = (25, 50, 100, 200)
+
 @app.route("/jurnal_umum")
 @admin_required
 def jurnal_umum():
@@ -3260,21 +5073,12 @@ def jurnal_umum():
         end_date = None
         logger.info("ℹ️ Empty dates detected, showing all data")
     
-    # Ambil data jurnal umum - URUTKAN DARI TANGGAL TERKECIL
-    journals = get_journal_entries_with_details(start_date, end_date, limit=100)
-    
-    # ✅ DEBUG: Tampilkan info filter di UI
-    filter_info = ""
-    if start_date and end_date:
-        filter_info = f"<div class='message info'>🔍 Menampilkan data dari {start_date} hingga {end_date}</div>"
-    else:
-        filter_info = "<div class='message info'>🔍 Menampilkan semua data (tanpa filter tanggal)</div>"
-
-    # Ambil data jurnal umum - URUTKAN DARI TANGGAL TERKECIL
-    journals = get_journal_entries_with_details(start_date, end_date, limit=100)
-    
-    # Hitung summary
-    summary = get_journal_summary(start_date, end_date)
+    # Ukuran halaman dan cursor keyset (transaction_date, id)
+    page_size = request.args.get('page_size', type=int)
+    if page_size not in JOURNAL_PAGE_SIZE_OPTIONS:
+        page_size = JOURNAL_PAGE_SIZE
+    after = decode_journal_cursor(request.args.get('after'))
+    before = decode_journal_cursor(request.args.get('before')) if not after else None
     
     # Fungsi untuk format tanggal DD/MM/YY
     def format_date_ddmmyy(date_str):
@@ -3287,10 +5091,23 @@ def jurnal_umum():
         except:
             return date_str
     
-    # Generate HTML untuk tabel jurnal
-    journals_html = ""
-    if journals:
-        journals_html = """
+    # HTML tabel jurnal dibuat saat streaming, satu bagian per transaksi
+    def journal_sections(journals):
+        if not journals:
+            yield """
+            <div style="text-align: center; padding: 40px; color: #666;">
+                <div style="font-size: 48px; margin-bottom: 20px;">📋</div>
+                <h3>Belum Ada Data Jurnal</h3>
+                <p>Belum ada transaksi yang dicatat dalam jurnal umum</p>
+                <div style="margin-top: 20px;">
+                    <a href="/input_transaksi"><button style="margin: 5px;">📝 Input Transaksi Baru</button></a>
+                    <button onclick="location.reload()" style="margin: 5px;">🔄 Refresh Halaman</button></a>
+                </div>
+            </div>
+            """
+            return
+    
+        yield """
         <table style="width: 100%; border-collapse: collapse; font-size: 14px; margin-top: 20px;">
             <thead>
                 <tr style="background: #008DD8; color: white;">
@@ -3311,22 +5128,24 @@ def jurnal_umum():
         # Loop melalui semua transaksi dan gabung dalam satu tabel - URUTKAN DARI TANGGAL TERKECIL
         for journal in journals:
             journal_entries = journal.get('journal_entries', [])
-            
+        
+            journal_rows_html = ""
+        
             # Format tanggal ke DD/MM/YY
             formatted_date = format_date_ddmmyy(journal['transaction_date'])
-            
+        
             # Tambahkan baris untuk setiap entry dalam transaksi
             for i, entry in enumerate(journal_entries):
                 # Ambil nama akun dari chart_of_accounts
                 account_name = get_account_name(entry['account_code'])
-                
+        
                 debit_amount = entry['amount'] if entry['position'] == 'debit' else 0
                 credit_amount = entry['amount'] if entry['position'] == 'kredit' else 0
-                
+        
                 # Update total
                 total_debit += debit_amount
                 total_credit += credit_amount
-                
+        
                 # Tentukan style untuk kredit (MENJOROK KE DALAM dengan padding-left)
                 if credit_amount > 0:
                     credit_style = "padding: 10px; border: 1px solid #dee2e6; text-align: right; color: #28a745; font-weight: bold; padding-left: 30px;"
@@ -3335,9 +5154,9 @@ def jurnal_umum():
                 else:
                     credit_style = "padding: 10px; border: 1px solid #dee2e6; text-align: right;"
                     account_style = "padding: 10px; border: 1px solid #dee2e6;"
-                
+        
                 debit_style = "padding: 10px; border: 1px solid #dee2e6; text-align: right; color: #dc3545; font-weight: bold;" if debit_amount > 0 else "padding: 10px; border: 1px solid #dee2e6; text-align: right;"
-                
+        
                 # Tombol hapus hanya untuk entry pertama dari setiap transaksi (untuk menghindari duplikasi)
                 delete_button = ""
                 if i == 0:  # Hanya tampilkan tombol hapus di baris pertama setiap transaksi
@@ -3352,8 +5171,8 @@ def jurnal_umum():
                     """
                 else:
                     delete_button = "<td style='padding: 10px; border: 1px solid #dee2e6;'></td>"
-                
-                journals_html += f"""
+        
+                journal_rows_html += f"""
                 <tr>
                     <td style="padding: 10px; border: 1px solid #dee2e6; text-align: center;">{formatted_date}</td>
                     <td style="{account_style}">
@@ -3372,10 +5191,12 @@ def jurnal_umum():
                 </tr>
                 """
         
+            yield journal_rows_html
+        
         # Tambahkan baris TOTAL di akhir
-        journals_html += f"""
+        yield f"""
             <tr style="background: #e9ecef; font-weight: bold; border-top: 2px solid #008DD8;">
-                <td colspan="3" style="padding: 12px; border: 1px solid #dee2e6; text-align: center;">TOTAL</td>
+                <td colspan="3" style="padding: 12px; border: 1px solid #dee2e6; text-align: center;">TOTAL HALAMAN INI</td>
                 <td style="padding: 12px; border: 1px solid #dee2e6; text-align: right; color: #dc3545;">
                     {format_currency(total_debit)}
                 </td>
@@ -3386,7 +5207,7 @@ def jurnal_umum():
             </tr>
         """
         
-        journals_html += """
+        yield """
             </tbody>
         </table>
         """
@@ -3395,51 +5216,21 @@ def jurnal_umum():
         balance_status = "✅ BALANCE" if total_debit == total_credit else "❌ TIDAK BALANCE"
         balance_color = "#28a745" if total_debit == total_credit else "#dc3545"
         
-        journals_html += f"""
+        yield f"""
         <div style="margin-top: 20px; padding: 15px; background: {balance_color}; color: white; border-radius: 8px; text-align: center; font-weight: bold;">
             {balance_status} | Total Debit: {format_currency(total_debit)} = Total Kredit: {format_currency(total_credit)}
         </div>
         """
-        
-    else:
-        journals_html = """
-        <div style="text-align: center; padding: 40px; color: #666;">
-            <div style="font-size: 48px; margin-bottom: 20px;">📋</div>
-            <h3>Belum Ada Data Jurnal</h3>
-            <p>Belum ada transaksi yang dicatat dalam jurnal umum</p>
-            <div style="margin-top: 20px;">
-                <a href="/input_transaksi"><button style="margin: 5px;">📝 Input Transaksi Baru</button></a>
-                <button onclick="location.reload()" style="margin: 5px;">🔄 Refresh Halaman</button></a>
-            </div>
-        </div>
-        """
     
-    # Summary HTML
-    summary_html = ""
-    if summary['total_transactions'] > 0:
-        summary_html = f"""
-        <div class="stats-grid">
-            <div class="stat-card">
-                <h3>TOTAL TRANSAKSI</h3>
-                <div class="stat-value">{summary['total_transactions']}</div>
-                <div class="stat-note">Jumlah transaksi</div>
-            </div>
-            
-            <div class="stat-card">
-                <h3>TOTAL NILAI</h3>
-                <div class="stat-value">{format_currency(summary['total_amount'])}</div>
-                <div class="stat-note">Total nilai transaksi</div>
-            </div>
-            
-            <div class="stat-card">
-                <h3>TOTAL ENTRIES</h3>
-                <div class="stat-value">{sum(len(journal.get('journal_entries', [])) for journal in journals)}</div>
-                <div class="stat-note">Jumlah entries</div>
-            </div>
-        </div>
-        """
+    page_size_options = "".join(
+        f'<option value="{size}" {"selected" if size == page_size else ""}>{size}</option>'
+        for size in JOURNAL_PAGE_SIZE_OPTIONS
+    )
     
-    content = f"""
+    # Export CSV memakai filter tanggal yang sama (tanpa pagination)
+    export_url = url_for('export_jurnal_umum', start_date=start_date or '', end_date=end_date or '')
+    
+    content_head = f"""
     <div class="welcome-section">
         <h2>📋 Jurnal Umum</h2>
         <div class="welcome-message">
@@ -3450,7 +5241,7 @@ def jurnal_umum():
     <!-- Filter Section -->
     <div class="quick-actions">
         <h3>🔍 Filter Jurnal</h3>
-        <form method="GET" style="display: grid; grid-template-columns: 1fr 1fr auto; gap: 15px; align-items: end;">
+        <form method="GET" style="display: grid; grid-template-columns: 1fr 1fr auto auto; gap: 15px; align-items: end;">
             <div>
                 <label style="display: block; margin-bottom: 5px; font-weight: 600;">Tanggal Mulai</label>
                 <input type="date" name="start_date" value="{start_date if start_date else ''}" 
@@ -3461,92 +5252,172 @@ def jurnal_umum():
                 <input type="date" name="end_date" value="{end_date if end_date else ''}" 
                        style="width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
             </div>
+            <div>
+                <label style="display: block; margin-bottom: 5px; font-weight: 600;">Per Halaman</label>
+                <select name="page_size" style="padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
+                    {page_size_options}
+                </select>
+            </div>
             <div>
                 <button type="submit" style="background: #008DD8; color: white; border: none; padding: 10px 20px; border-radius: 5px; cursor: pointer;">
                     🔍 Terapkan Filter
                 </button>
                 {'<a href="/jurnal_umum" style="display: block; margin-top: 5px; text-align: center; font-size: 12px;">Hapus Filter</a>' if start_date or end_date else ''}
+                <a href="{export_url}" style="display: block; margin-top: 5px; text-align: center; font-size: 12px;">⬇️ Export CSV</a>
             </div>
         </form>
     </div>
 
-    {summary_html}
-
-    <div class="quick-actions">
-        <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 20px;">
-            <h3 style="margin: 0;">📝 Semua Transaksi Jurnal</h3>
-            <a href="/input_transaksi">
-                <button style="background: #28a745; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer;">
-                    ➕ Input Transaksi Baru
-                </button>
-            </a>
-        </div>
+    """
+    
+    # Data jurnal dibaca di dalam stream: layout dan form filter sudah terkirim sebelum query Supabase
+    def journal_content():
+        # Ambil data jurnal umum satu halaman (+1 baris untuk tahu masih ada halaman lain) - URUTKAN DARI TANGGAL TERKECIL
+        journals = get_journal_entries_with_details(start_date, end_date, limit=page_size + 1, after=after, before=before)
         
-        <div style="max-height: 800px; overflow-y: auto;">
-            {journals_html}
+        if before:
+            has_prev = len(journals) > page_size
+            has_next = True
+            journals = journals[-page_size:]
+        else:
+            has_prev = after is not None
+            has_next = len(journals) > page_size
+            journals = journals[:page_size]
+        
+        # Link halaman mempertahankan filter tanggal dan ukuran halaman
+        page_args = {'page_size': page_size}
+        if start_date and end_date:
+            page_args.update(start_date=start_date, end_date=end_date)
+        prev_url = url_for('jurnal_umum', before=encode_journal_cursor(journals[0]), **page_args) if has_prev and journals else None
+        next_url = url_for('jurnal_umum', after=encode_journal_cursor(journals[-1]), **page_args) if has_next and journals else None
+        
+        # Hitung summary tanpa memuat seluruh riwayat jurnal
+        summary = get_journal_header_totals(start_date, end_date)
+        
+        # Summary HTML
+        summary_html = ""
+        if summary['total_transactions'] > 0:
+            summary_html = f"""
+            <div class="stats-grid">
+                <div class="stat-card">
+                    <h3>TOTAL TRANSAKSI</h3>
+                    <div class="stat-value">{summary['total_transactions']}</div>
+                    <div class="stat-note">Jumlah transaksi</div>
+                </div>
+                
+                <div class="stat-card">
+                    <h3>TOTAL NILAI</h3>
+                    <div class="stat-value">{format_currency(summary['total_amount'])}</div>
+                    <div class="stat-note">Total nilai transaksi</div>
+                </div>
+                
+                <div class="stat-card">
+                    <h3>ENTRIES HALAMAN INI</h3>
+                    <div class="stat-value">{sum(len(journal.get('journal_entries', [])) for journal in journals)}</div>
+                    <div class="stat-note">Jumlah entries di halaman ini</div>
+                </div>
+            </div>
+            """
+        
+        yield summary_html
+        
+        yield """
+        <div class="quick-actions">
+            <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 20px;">
+                <h3 style="margin: 0;">📝 Semua Transaksi Jurnal</h3>
+                <a href="/input_transaksi">
+                    <button style="background: #28a745; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer;">
+                        ➕ Input Transaksi Baru
+                    </button>
+                </a>
+            </div>
+            
+            <div style="max-height: 800px; overflow-y: auto;">
+        """
+        
+        yield from journal_sections(journals)
+        
+        # Navigasi halaman sebelumnya/berikutnya
+        pagination_html = ""
+        if prev_url or next_url:
+            prev_link = f'<a href="{prev_url}"><button style="margin: 5px;">⬅️ Sebelumnya</button></a>' if prev_url else ""
+            next_link = f'<a href="{next_url}"><button style="margin: 5px;">Berikutnya ➡️</button></a>' if next_url else ""
+            pagination_html = f"""
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-top: 15px;">
+                <div>{prev_link}</div>
+                <div style="color: #666; font-size: 13px;">{len(journals)} transaksi per halaman ini (maks. {page_size})</div>
+                <div>{next_link}</div>
+            </div>
+            """
+        
+        yield f"""
+            </div>
+            
+            {pagination_html}
         </div>
-    </div>
-
+        """
+    
+    content_tail = """
     <style>
         /* Style tambahan untuk meningkatkan readability */
-        table tr:nth-child(even) {{
+        table tr:nth-child(even) {
             background-color: #f9f9f9;
-        }}
+        }
         
-        table tr:hover {{
+        table tr:hover {
             background-color: #f0f8ff;
-        }}
+        }
         
         /* Highlight untuk akun kredit yang menjorok */
-        .credit-account {{
+        .credit-account {
             padding-left: 30px !important;
             font-style: italic;
-        }}
+        }
     </style>
 
     <script>
-        function deleteTransaction(transactionId) {{
-            if (confirm('Apakah Anda yakin ingin menghapus transaksi ini? Tindakan ini tidak dapat dibatalkan!')) {{
+        function deleteTransaction(transactionId) {
+            if (confirm('Apakah Anda yakin ingin menghapus transaksi ini? Tindakan ini tidak dapat dibatalkan!')) {
                 // Show loading
                 const button = event.target;
                 const originalText = button.textContent;
                 button.textContent = 'Menghapus...';
                 button.disabled = true;
                 
-                fetch('/api/delete_journal_transaction', {{
+                fetch('/api/delete_journal_transaction', {
                     method: 'POST',
-                    headers: {{
+                    headers: {
                         'Content-Type': 'application/json',
-                    }},
-                    body: JSON.stringify({{
+                    },
+                    body: JSON.stringify({
                         transaction_id: transactionId
-                    }})
-                }})
+                    })
+                })
                 .then(response => response.json())
-                .then(data => {{
-                    if (data.success) {{
+                .then(data => {
+                    if (data.success) {
                         alert('Transaksi berhasil dihapus!');
                         location.reload();
-                    }} else {{
+                    } else {
                         alert('Error: ' + data.message);
                         // Reset button
                         button.textContent = originalText;
                         button.disabled = false;
-                    }}
-                }})
-                .catch(error => {{
+                    }
+                })
+                .catch(error => {
                     console.error('Error:', error);
                     alert('Terjadi kesalahan saat menghapus transaksi: ' + error.message);
                     // Reset button
                     button.textContent = originalText;
                     button.disabled = false;
-                }});
-            }}
-        }}
+                });
+            }
+        }
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return stream_dashboard_page([content_head], journal_content(), [content_tail], user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📒 10. BUKU BESAR
@@ -3561,22 +5432,13 @@ def buku_besar():
     user_id = session.get('user_id', 'Unknown')
     user_role = get_user_role()
     
-    # Buat data contoh jika belum ada
-    create_sample_ledger_data()
-    
     # Ambil parameter dari URL
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     account_filter = request.args.get('account', '')
+    carry_forward = request.args.get('carry_forward') == '1'
     
-    logger.info(f"📒 Buku Besar Grouped - Filter: start={start_date}, end={end_date}, account={account_filter}")
-    
-    # Ambil data buku besar yang sudah dikelompokkan
-    grouped_ledger_data = get_general_ledger_entries_grouped_by_account(start_date, end_date)
-    
-    # Filter berdasarkan akun tertentu jika dipilih
-    if account_filter and account_filter != '-- Semua Akun --':
-        grouped_ledger_data = [account for account in grouped_ledger_data if account['account_code'] == account_filter]
+    logger.info(f"📒 Buku Besar Grouped - Filter: start={start_date}, end={end_date}, account={account_filter}, carry_forward={carry_forward}")
     
     # Ambil daftar akun untuk dropdown filter
     all_accounts = get_chart_of_accounts()
@@ -3585,10 +5447,22 @@ def buku_besar():
         selected = 'selected' if account_filter == account['account_code'] else ''
         account_options += f'<option value="{account["account_code"]}" {selected}>{account["account_code"]} - {account["account_name"]}</option>'
     
-    # Buat HTML untuk setiap akun
-    ledger_html = ""
-    
-    if grouped_ledger_data:
+    # HTML per akun dibuat saat streaming, satu bagian akun per chunk
+    def ledger_sections(grouped_ledger_data):
+        if not grouped_ledger_data:
+            yield """
+            <div style="text-align: center; padding: 40px; color: #666;">
+                <div style="font-size: 48px; margin-bottom: 20px;">📒</div>
+                <h3>Belum Ada Data Transaksi</h3>
+                <p>Belum ada transaksi yang tercatat dalam buku besar</p>
+                <div style="margin-top: 20px;">
+                    <a href="/input_transaksi"><button style="margin: 5px;">📝 Input Transaksi Baru</button></a>
+                    <button onclick="location.reload()" style="margin: 5px;">🔄 Refresh Halaman</button>
+                </div>
+            </div>
+            """
+            return
+        
         for account_data in grouped_ledger_data:
             account_code = account_data['account_code']
             account_name = account_data['account_name']
@@ -3672,51 +5546,12 @@ def buku_besar():
             </div>
             """
             
-            ledger_html += account_table_html
-    else:
-        ledger_html = """
-        <div style="text-align: center; padding: 40px; color: #666;">
-            <div style="font-size: 48px; margin-bottom: 20px;">📒</div>
-            <h3>Belum Ada Data Transaksi</h3>
-            <p>Belum ada transaksi yang tercatat dalam buku besar</p>
-            <div style="margin-top: 20px;">
-                <a href="/input_transaksi"><button style="margin: 5px;">📝 Input Transaksi Baru</button></a>
-                <button onclick="location.reload()" style="margin: 5px;">🔄 Refresh Halaman</button>
-            </div>
-        </div>
-        """
+            yield account_table_html
     
-    # Hitung total keseluruhan
-    total_all_debit = sum(account['total_debit'] for account in grouped_ledger_data)
-    total_all_credit = sum(account['total_credit'] for account in grouped_ledger_data)
+    # Export CSV memakai filter yang sama dengan halaman
+    export_url = url_for('export_buku_besar', start_date=start_date, end_date=end_date, account=account_filter, carry_forward='1' if carry_forward else '')
     
-    summary_html = f"""
-    <div style="background: #e9ecef; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
-        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 15px; text-align: center;">
-            <div>
-                <strong>Total Akun:</strong> 
-                <span style="color: #008DD8; font-weight: bold; font-size: 16px;">{len(grouped_ledger_data)}</span>
-            </div>
-            <div>
-                <strong>Total Debit:</strong> 
-                <span style="color: #dc3545; font-weight: bold; font-size: 16px;">{format_currency(total_all_debit)}</span>
-            </div>
-            <div>
-                <strong>Total Kredit:</strong> 
-                <span style="color: #28a745; font-weight: bold; font-size: 16px;">{format_currency(total_all_credit)}</span>
-            </div>
-        </div>
-        <div style="text-align: center; margin-top: 10px; padding: 10px; background: {'#d4edda' if total_all_debit == total_all_credit else '#f8d7da'}; border-radius: 5px;">
-            <strong>Status:</strong> 
-            <span style="color: {'#28a745' if total_all_debit == total_all_credit else '#dc3545'}; font-weight: bold;">
-                {'✅ SEIMBANG' if total_all_debit == total_all_credit else '❌ TIDAK SEIMBANG'}
-            </span>
-            {f'<span style="color: #dc3545; margin-left: 10px;">(Selisih: {format_currency(abs(total_all_debit - total_all_credit))})</span>' if total_all_debit != total_all_credit else ''}
-        </div>
-    </div>
-    """ if grouped_ledger_data else ""
-
-    content = f"""
+    content_head = f"""
     <div class="welcome-section">
         <h2>📒 Buku Besar (General Ledger)</h2>
         <div class="welcome-message">
@@ -3754,152 +5589,203 @@ def buku_besar():
                     🔍 Terapkan Filter
                 </button>
                 {'<a href="/buku_besar" style="display: block; margin-top: 5px; text-align: center; font-size: 12px;">Hapus Filter</a>' if start_date or end_date or account_filter else ''}
+                <a href="{export_url}" style="display: block; margin-top: 5px; text-align: center; font-size: 12px;">⬇️ Export CSV</a>
+            </div>
+            
+            <div style="grid-column: 1 / -1;">
+                <label style="font-size: 13px;">
+                    <input type="checkbox" name="carry_forward" value="1" {'checked' if carry_forward else ''}>
+                    Saldo awal termasuk transaksi sebelum Tanggal Mulai
+                </label>
             </div>
         </form>
     </div>
 
-    {summary_html}
-
-    <div class="quick-actions">
-        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
-            <h3 style="margin: 0;">Buku Besar - Dikelompokkan per Akun</h3>
-            <div style="display: flex; gap: 10px; align-items: center;">
-                <span style="font-size: 12px; color: #666;">
-                    Menampilkan: <strong>{len(grouped_ledger_data)} akun</strong>
+    """
+    
+    # Data buku besar dibaca di dalam stream: layout dan form filter sudah terkirim sebelum query Supabase
+    def ledger_content():
+        # Buat data contoh jika belum ada
+        create_sample_ledger_data()
+        
+        # Ambil data buku besar yang sudah dikelompokkan
+        grouped_ledger_data = get_general_ledger_entries_grouped_by_account(start_date, end_date, carry_forward=carry_forward)
+        
+        # Filter berdasarkan akun tertentu jika dipilih
+        if account_filter and account_filter != '-- Semua Akun --':
+            grouped_ledger_data = [account for account in grouped_ledger_data if account['account_code'] == account_filter]
+        
+        # Hitung total keseluruhan
+        total_all_debit = sum(account['total_debit'] for account in grouped_ledger_data)
+        total_all_credit = sum(account['total_credit'] for account in grouped_ledger_data)
+        
+        summary_html = f"""
+        <div style="background: #e9ecef; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
+            <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 15px; text-align: center;">
+                <div>
+                    <strong>Total Akun:</strong> 
+                    <span style="color: #008DD8; font-weight: bold; font-size: 16px;">{len(grouped_ledger_data)}</span>
+                </div>
+                <div>
+                    <strong>Total Debit:</strong> 
+                    <span style="color: #dc3545; font-weight: bold; font-size: 16px;">{format_currency(total_all_debit)}</span>
+                </div>
+                <div>
+                    <strong>Total Kredit:</strong> 
+                    <span style="color: #28a745; font-weight: bold; font-size: 16px;">{format_currency(total_all_credit)}</span>
+                </div>
+            </div>
+            <div style="text-align: center; margin-top: 10px; padding: 10px; background: {'#d4edda' if total_all_debit == total_all_credit else '#f8d7da'}; border-radius: 5px;">
+                <strong>Status:</strong> 
+                <span style="color: {'#28a745' if total_all_debit == total_all_credit else '#dc3545'}; font-weight: bold;">
+                    {'✅ SEIMBANG' if total_all_debit == total_all_credit else '❌ TIDAK SEIMBANG'}
                 </span>
-                <a href="/input_transaksi">
-                    <button style="background: #28a745; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
-                        ➕ Input Transaksi
-                    </button>
-                </a>
-                <a href="/jurnal_umum">
-                    <button style="background: #6c757d; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
-                        📋 Lihat Jurnal
-                    </button>
-                </a>
-                <a href="/neraca_saldo_awal">
-                    <button style="background: #008DD8; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
-                        💰 Kelola Saldo Awal
-                    </button>
-                </a>
+                {f'<span style="color: #dc3545; margin-left: 10px;">(Selisih: {format_currency(abs(total_all_debit - total_all_credit))})</span>' if total_all_debit != total_all_credit else ''}
             </div>
         </div>
-        
-        <div style="max-height: 800px; overflow-y: auto; padding: 10px; background: #f8f9fa; border-radius: 8px;">
-            {ledger_html if ledger_html else '''
-            <div style="text-align: center; padding: 40px; color: #666;">
-                <div style="font-size: 48px; margin-bottom: 20px;">📒</div>
-                <h3>Tidak Ada Data yang Sesuai Filter</h3>
-                <p>Coba ubah periode atau pilih akun yang berbeda</p>
+        """ if grouped_ledger_data else ""
+        
+        yield summary_html
+        
+        yield f"""
+        <div class="quick-actions">
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
+                <h3 style="margin: 0;">Buku Besar - Dikelompokkan per Akun</h3>
+                <div style="display: flex; gap: 10px; align-items: center;">
+                    <span style="font-size: 12px; color: #666;">
+                        Menampilkan: <strong>{len(grouped_ledger_data)} akun</strong>
+                    </span>
+                    <a href="/input_transaksi">
+                        <button style="background: #28a745; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
+                            ➕ Input Transaksi
+                        </button>
+                    </a>
+                    <a href="/jurnal_umum">
+                        <button style="background: #6c757d; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
+                            📋 Lihat Jurnal
+                        </button>
+                    </a>
+                    <a href="/neraca_saldo_awal">
+                        <button style="background: #008DD8; color: white; border: none; padding: 8px 15px; border-radius: 5px; cursor: pointer; font-size: 12px;">
+                            💰 Kelola Saldo Awal
+                        </button>
+                    </a>
+                </div>
             </div>
-            '''}
+            
+            <div style="max-height: 800px; overflow-y: auto; padding: 10px; background: #f8f9fa; border-radius: 8px;">
+        """
+        
+        yield from ledger_sections(grouped_ledger_data)
+    
+    content_tail = """
         </div>
     </div>
 
     <style>
-        .account-section {{
+        .account-section {
             transition: transform 0.2s ease, box-shadow 0.2s ease;
             margin-bottom: 25px;
-        }}
+        }
         
-        .account-section:hover {{
+        .account-section:hover {
             transform: translateY(-2px);
             box-shadow: 0 4px 15px rgba(0,0,0,0.15);
-        }}
+        }
         
-        table {{
+        table {
             width: 100%;
             border-collapse: collapse;
-        }}
+        }
         
-        table tr:nth-child(even) {{
+        table tr:nth-child(even) {
             background-color: #f9f9f9;
-        }}
+        }
         
-        table tr:hover {{
+        table tr:hover {
             background-color: #f0f8ff;
-        }}
+        }
         
-        .account-header {{
+        .account-header {
             border-bottom: 2px solid #008DD8;
-        }}
+        }
         
         /* Style khusus untuk baris saldo awal */
-        .opening-balance-row {{
+        .opening-balance-row {
             background-color: #e7f3ff !important;
             border-left: 4px solid #008DD8 !important;
-        }}
+        }
         
-        .opening-balance-row td {{
+        .opening-balance-row td {
             font-weight: bold !important;
-        }}
+        }
         
-        @media (max-width: 768px) {{
-            .quick-actions > div > form {{
+        @media (max-width: 768px) {
+            .quick-actions > div > form {
                 grid-template-columns: 1fr;
-            }}
+            }
             
-            .account-header > div {{
+            .account-header > div {
                 flex-direction: column;
                 text-align: center;
-            }}
+            }
             
-            table {{
+            table {
                 font-size: 11px;
-            }}
+            }
             
             table th,
-            table td {{
+            table td {
                 padding: 5px;
-            }}
+            }
             
             table th:nth-child(1),
-            table td:nth-child(1) {{
+            table td:nth-child(1) {
                 width: 80px;
-            }}
+            }
             
             table th:nth-child(3),
             table th:nth-child(4),
             table th:nth-child(5),
             table td:nth-child(3),
             table td:nth-child(4),
-            table td:nth-child(5) {{
+            table td:nth-child(5) {
                 width: 100px;
-            }}
-        }}
+            }
+        }
     </style>
 
     <script>
         // Auto-submit form ketika filter diubah
-        document.addEventListener('DOMContentLoaded', function() {{
+        document.addEventListener('DOMContentLoaded', function() {
             const filterInputs = document.querySelectorAll('#filterForm input, #filterForm select');
-            filterInputs.forEach(input => {{
-                input.addEventListener('change', function() {{
+            filterInputs.forEach(input => {
+                input.addEventListener('change', function() {
                     document.getElementById('filterForm').submit();
-                }});
-            }});
-        }});
+                });
+            });
+        });
 
         // Smooth scroll untuk navigasi antar akun
-        function scrollToAccount(accountCode) {{
+        function scrollToAccount(accountCode) {
             const element = document.getElementById('account-' + accountCode);
-            if (element) {{
-                element.scrollIntoView({{
+            if (element) {
+                element.scrollIntoView({
                     behavior: 'smooth',
                     block: 'start'
-                }});
+                });
                 
                 // Highlight sementara
                 element.style.backgroundColor = '#fff3cd';
-                setTimeout(() => {{
+                setTimeout(() => {
                     element.style.backgroundColor = '';
-                }}, 2000);
-            }}
-        }}
+                }, 2000);
+            }
+        }
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return stream_dashboard_page([content_head], ledger_content(), [content_tail], user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔹 FUNGSI BUKU BESAR (GENERAL LEDGER)
@@ -3912,24 +5798,26 @@ def get_general_ledger_entries(account_code=None, start_date=None, end_date=None
         
         # METHOD 1: Query manual dengan dua query terpisah (lebih reliable)
         # Pertama, ambil semua general_journals
-        journals_query = supabase.table("general_journals").select("*")
-        
-        # Filter tanggal jika ada
-        if start_date and end_date and start_date != "" and end_date != "":
-            journals_query = journals_query.gte('transaction_date', start_date).lte('transaction_date', end_date)
+        def build_journals_query():
+            journals_query = supabase.table("general_journals").select("*")
+            
+            # Filter tanggal jika ada
+            if start_date and end_date and start_date != "" and end_date != "":
+                journals_query = journals_query.gte('transaction_date', start_date).lte('transaction_date', end_date)
+            return order_by(journals_query, "transaction_date", "id")
         
-        journals_result = journals_query.order("transaction_date").execute()
-        journals = journals_result.data if journals_result.data else []
+        journals = list(fetch_all_rows(build_journals_query))
         
         # Kedua, ambil semua journal_entries
-        entries_query = supabase.table("journal_entries").select("*")
-        
-        # Filter account code jika ada
-        if account_code and account_code != "":
-            entries_query = entries_query.eq("account_code", account_code)
+        def build_entries_query():
+            entries_query = supabase.table("journal_entries").select("*")
+            
+            # Filter account code jika ada
+            if account_code and account_code != "":
+                entries_query = entries_query.eq("account_code", account_code)
+            return order_by(entries_query, "created_at", "id")
         
-        entries_result = entries_query.order("created_at").execute()
-        all_entries = entries_result.data if entries_result.data else []
+        all_entries = list(fetch_all_rows(build_entries_query))
         
         logger.info(f"✅ Found {len(journals)} journals and {len(all_entries)} entries")
         
@@ -4006,6 +5894,8 @@ def get_general_ledger_entries(account_code=None, start_date=None, end_date=None
         logger.info(f"📊 Processed {len(processed_entries)} entries for display")
         return processed_entries
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error getting general ledger entries: {e}")
         logger.error(traceback.format_exc())
@@ -4023,9 +5913,164 @@ def create_sample_ledger_data():
             return True
         
     except Exception as e:
-        logger.error(f"❌ Error creating sample ledger data: {e}")
+        logger.error(f"❌ Error creating sample ledger data: {e}")
+        logger.error(traceback.format_exc())
+        return False
+
+# ============================================================
+# 📤 EXPORT CSV BUKU BESAR & JURNAL UMUM
+# ============================================================
+# Baris CSV ditulis langsung ke response sambil membaca jurnal per halaman, jadi memori
+# hanya sebesar satu halaman jurnal + saldo berjalan per akun.
+
+def csv_line(values):
+    """Format satu baris CSV"""
+    buffer = StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+def stream_csv_export(name, header, rows):
+    """Response CSV streaming; jumlah baris per detik dicatat di log setelah selesai
+    
+    Error sebelum baris pertama terbaca menghasilkan response 500. Error setelah streaming dimulai
+    (status 200 sudah terkirim) ditulis sebagai baris penanda EXPORT_ERROR lalu koneksi diputus,
+    sehingga file terpotong tidak terlihat seperti export yang lengkap.
+    """
+    rows = iter(rows)
+    try:
+        first_rows = [next(rows)]
+    except StopIteration:
+        first_rows = []
+    except Exception as e:
+        logger.error(f"❌ Export {name} failed before streaming: {e}")
         logger.error(traceback.format_exc())
-        return False
+        return jsonify({"success": False, "message": f"Export {name} gagal: {e}"}), 500
+    
+    def generate():
+        started = time.time()
+        count = 0
+        # BOM agar Excel membaca UTF-8 dengan benar
+        yield "\ufeff" + csv_line(header)
+        try:
+            for row in first_rows:
+                count += 1
+                yield csv_line(row)
+            for row in rows:
+                count += 1
+                yield csv_line(row)
+        except Exception as e:
+            logger.error(f"❌ Export {name} aborted after {count} rows: {e}")
+            logger.error(traceback.format_exc())
+            yield csv_line(["EXPORT_ERROR", f"Export terhenti setelah {count} baris, data tidak lengkap: {e}"])
+            raise
+        elapsed = max(time.time() - started, 0.001)
+        logger.info(f"📤 Export {name}: {count} rows in {elapsed:.2f}s ({count / elapsed:.0f} rows/s)")
+    
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def export_date_range():
+    """Ambil start_date/end_date dari query string; filter hanya dipakai jika keduanya diisi"""
+    start_date = request.args.get('start_date') or None
+    end_date = request.args.get('end_date') or None
+    if not (start_date and end_date):
+        return None, None
+    return start_date, end_date
+
+@app.route("/export/jurnal_umum")
+@admin_required
+def export_jurnal_umum():
+    """Export jurnal umum ke CSV (?start_date=&end_date=)"""
+    start_date, end_date = export_date_range()
+    
+    def rows():
+        for journal in iter_journals_with_details(start_date, end_date):
+            for entry in journal.get('journal_entries', []):
+                yield [
+                    journal['transaction_date'],
+                    journal['transaction_number'],
+                    journal['description'],
+                    entry['account_code'],
+                    get_account_name(entry['account_code']),
+                    entry['amount'] if entry['position'] == 'debit' else 0,
+                    entry['amount'] if entry['position'] == 'kredit' else 0,
+                    entry.get('note') or '',
+                    journal['created_by']
+                ]
+    
+    header = ["Tanggal", "No Transaksi", "Keterangan", "Kode Akun", "Nama Akun", "Debit", "Kredit", "Catatan", "Dibuat Oleh"]
+    return stream_csv_export("jurnal_umum", header, rows())
+
+@app.route("/export/buku_besar")
+@admin_required
+def export_buku_besar():
+    """Export buku besar ke CSV urut tanggal dengan saldo berjalan per akun (?start_date=&end_date=&account=&carry_forward=1)"""
+    start_date, end_date = export_date_range()
+    account_filter = request.args.get('account', '')
+    if account_filter == '-- Semua Akun --':
+        account_filter = ''
+    carry_forward = request.args.get('carry_forward') == '1'
+    
+    accounts = {account['account_code']: account for account in get_chart_of_accounts()}
+    opening_balances = {balance['account_code']: balance for balance in get_opening_balances_with_account_info()}
+    prior_totals = get_ledger_totals_before(start_date) if carry_forward and start_date else {}
+    
+    def is_debit_normal(account_code):
+        account = accounts.get(account_code)
+        return bool(account) and account['account_type'] in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']
+    
+    def balance_change(account_code, debit, credit):
+        return debit - credit if is_debit_normal(account_code) else credit - debit
+    
+    def rows():
+        # Saldo berjalan per akun: satu angka per akun, bukan seluruh baris
+        running_balances = {}
+        
+        # Baris saldo awal (neraca saldo awal + mutasi sebelum start_date jika carry_forward)
+        for account_code in sorted(set(opening_balances) | set(prior_totals)):
+            if account_filter and account_code != account_filter:
+                continue
+            balance = opening_balances.get(account_code)
+            opening_debit = balance['amount'] if balance and balance['position'] == 'debit' else 0
+            opening_credit = balance['amount'] if balance and balance['position'] == 'kredit' else 0
+            prior_debit, prior_credit = prior_totals.get(account_code, (0, 0))
+            running_balances[account_code] = balance_change(account_code, opening_debit + prior_debit, opening_credit + prior_credit)
+            yield [
+                'SALDO AWAL',
+                '',
+                f'SALDO AWAL PER {start_date}' if account_code in prior_totals else 'NERACA SALDO AWAL',
+                account_code,
+                get_account_name(account_code),
+                opening_debit + prior_debit,
+                opening_credit + prior_credit,
+                running_balances[account_code]
+            ]
+        
+        for journal in iter_journals_with_details(start_date, end_date):
+            for entry in journal.get('journal_entries', []):
+                account_code = entry['account_code']
+                if account_filter and account_code != account_filter:
+                    continue
+                debit = entry['amount'] if entry['position'] == 'debit' else 0
+                credit = entry['amount'] if entry['position'] == 'kredit' else 0
+                running_balances[account_code] = running_balances.get(account_code, 0) + balance_change(account_code, debit, credit)
+                yield [
+                    journal['transaction_date'],
+                    journal['transaction_number'],
+                    journal['description'],
+                    account_code,
+                    get_account_name(account_code),
+                    debit,
+                    credit,
+                    running_balances[account_code]
+                ]
+    
+    header = ["Tanggal", "No Transaksi", "Keterangan", "Kode Akun", "Nama Akun", "Debit", "Kredit", "Saldo"]
+    return stream_csv_export("buku_besar", header, rows())
 
 # ============================================================
 # 🧪 11. NERACA SALDO SEBELUM PENYESUAIAN (NSSP)
@@ -4033,6 +6078,7 @@ def create_sample_ledger_data():
 
 @app.route("/nssp")
 @admin_required
+@ledger_conditional
 def nssp():
     """Halaman Neraca Saldo Sebelum Penyesuaian - DIPERBAIKI TOTAL"""
     user_email = session.get('user_email')
@@ -4374,12 +6420,14 @@ def nssp():
     </style>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔹 FUNGSI NERACA SALDO SEBELUM PENYESUAIAN (NSSP)
 # ============================================================
 
+@request_memoized
+@period_cached
 def calculate_trial_balance(period=None):
     """Hitung Neraca Saldo Sebelum Penyesuaian - DIPERBAIKI untuk ambil dari buku besar"""
     try:
@@ -4406,68 +6454,23 @@ def calculate_trial_balance(period=None):
         
         logger.info(f"📅 Date range for trial balance: {start_date} to {end_date}")
         
-        # Ambil data buku besar yang sudah dikelompokkan per akun
-        ledger_data = get_general_ledger_entries_grouped_by_account(start_date, end_date)
-        
-        if not ledger_data:
-            logger.info(f"ℹ️ No ledger data found for period {period}")
-            # Return semua akun dengan saldo 0
-            accounts = get_chart_of_accounts()
-            trial_balance_data = []
-            for account in accounts:
-                trial_balance_data.append({
-                    'account_code': account['account_code'],
-                    'account_name': account['account_name'],
-                    'account_type': account['account_type'],
-                    'debit': 0,
-                    'credit': 0,
-                    'balance': 0
-                })
-            return trial_balance_data
+        trial_balance_data = None
         
-        # Format data untuk NSSP dari buku besar
-        trial_balance_data = []
+        # Jalur utama: agregasi di server lewat fungsi SQL trial_balance_totals
+        if trial_balance_rpc_enabled():
+            try:
+                account_totals = get_account_totals_rpc(start_date, end_date)
+                trial_balance_data = build_trial_balance_from_totals(account_totals)
+            except Exception as e:
+                disable_trial_balance_rpc(e)
         
-        for account_data in ledger_data:
-            account_code = account_data['account_code']
-            account_name = account_data['account_name']
-            account_type = account_data['account_type']
-            
-            # Ambil total debit dan kredit dari buku besar
-            total_debit = account_data['total_debit']
-            total_credit = account_data['total_credit']
-            final_balance = account_data['final_balance']
-            
-            # Untuk NSSP, kita tampilkan total debit dan kredit terpisah
-            # dan saldo akhir berdasarkan tipe akun
-            if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']:
-                # Akun debit normal: saldo positif = debit, negatif = kredit
-                if final_balance >= 0:
-                    debit_display = abs(final_balance)
-                    credit_display = 0
-                else:
-                    debit_display = 0
-                    credit_display = abs(final_balance)
+        # Jalur Python dari buku besar: fallback dan referensi untuk verifikasi
+        if trial_balance_data is None or TRIAL_BALANCE_VERIFY:
+            reference_data = calculate_trial_balance_from_ledger(start_date, end_date)
+            if trial_balance_data is None:
+                trial_balance_data = reference_data
             else:
-                # Akun kredit normal: saldo positif = kredit, negatif = debit
-                if final_balance >= 0:
-                    debit_display = 0
-                    credit_display = abs(final_balance)
-                else:
-                    debit_display = abs(final_balance)
-                    credit_display = 0
-            
-            trial_balance_data.append({
-                'account_code': account_code,
-                'account_name': account_name,
-                'account_type': account_type,
-                'debit': debit_display,
-                'credit': credit_display,
-                'balance': final_balance
-            })
-        
-        # Urutkan berdasarkan kode akun
-        trial_balance_data.sort(key=lambda x: x['account_code'])
+                verify_trial_balance(period, trial_balance_data, reference_data)
         
         # Log summary
         total_debit = sum(item['debit'] for item in trial_balance_data)
@@ -4480,11 +6483,149 @@ def calculate_trial_balance(period=None):
         
         return trial_balance_data
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating trial balance from ledger: {e}")
         logger.error(traceback.format_exc())
         return []
     
+def calculate_trial_balance_from_ledger(start_date, end_date):
+    """Hitung neraca saldo dari buku besar di Python (fallback dan referensi untuk jalur RPC)"""
+    # Ambil data buku besar yang sudah dikelompokkan per akun
+    ledger_data = get_general_ledger_entries_grouped_by_account(start_date, end_date)
+    
+    if not ledger_data:
+        logger.info(f"ℹ️ No ledger data found for {start_date} to {end_date}")
+        return zero_trial_balance()
+    
+    # Format data untuk NSSP dari buku besar
+    trial_balance_data = [
+        trial_balance_row(account_data['account_code'], account_data['account_name'],
+                          account_data['account_type'], account_data['final_balance'])
+        for account_data in ledger_data
+    ]
+    
+    # Urutkan berdasarkan kode akun
+    trial_balance_data.sort(key=lambda x: x['account_code'])
+    return trial_balance_data
+
+def zero_trial_balance():
+    """Neraca saldo dengan semua akun bersaldo 0"""
+    return [
+        trial_balance_row(account['account_code'], account['account_name'], account['account_type'], 0)
+        for account in get_chart_of_accounts()
+    ]
+
+def trial_balance_row(account_code, account_name, account_type, final_balance):
+    """Satu baris NSSP: saldo akhir ditampilkan di kolom debit/kredit sesuai saldo normal akun"""
+    if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']:
+        # Akun debit normal: saldo positif = debit, negatif = kredit
+        debit_display = abs(final_balance) if final_balance >= 0 else 0
+        credit_display = 0 if final_balance >= 0 else abs(final_balance)
+    else:
+        # Akun kredit normal: saldo positif = kredit, negatif = debit
+        debit_display = 0 if final_balance >= 0 else abs(final_balance)
+        credit_display = abs(final_balance) if final_balance >= 0 else 0
+    
+    return {
+        'account_code': account_code,
+        'account_name': account_name,
+        'account_type': account_type,
+        'debit': debit_display,
+        'credit': credit_display,
+        'balance': final_balance
+    }
+
+# ============================================================
+# 🔹 AGREGASI NERACA SALDO DI SERVER (SUPABASE RPC)
+# ============================================================
+# Fungsi SQL trial_balance_totals: lihat supabase/migrations. Jika belum terpasang atau gagal,
+# calculate_trial_balance kembali ke jalur Python dan mencoba RPC lagi setelah TRIAL_BALANCE_RPC_RETRY detik.
+TRIAL_BALANCE_RPC = os.environ.get("TRIAL_BALANCE_RPC", "1") == "1"
+TRIAL_BALANCE_VERIFY = os.environ.get("TRIAL_BALANCE_VERIFY") == "1"
+TRIAL_BALANCE_RPC_RETRY = int(os.environ.get("TRIAL_BALANCE_RPC_RETRY", 600))
+_trial_balance_rpc_retry_at = 0.0
+
+def trial_balance_rpc_enabled():
+    """Cek apakah jalur RPC trial_balance_totals boleh dipakai saat ini"""
+    return TRIAL_BALANCE_RPC and time.monotonic() >= _trial_balance_rpc_retry_at
+
+def disable_trial_balance_rpc(error):
+    """Nonaktifkan sementara jalur RPC setelah gagal"""
+    global _trial_balance_rpc_retry_at
+    _trial_balance_rpc_retry_at = time.monotonic() + TRIAL_BALANCE_RPC_RETRY
+    logger.warning(f"⚠️ trial_balance_totals RPC failed, using Python aggregation for {TRIAL_BALANCE_RPC_RETRY}s: {error}")
+
+def get_account_totals_rpc(start_date=None, end_date=None):
+    """Total debit dan kredit jurnal umum per akun dari server: {account_code: (debit, credit)}"""
+    result = supabase.rpc("trial_balance_totals", {"p_start_date": start_date, "p_end_date": end_date}).execute()
+    return {
+        row['account_code']: (row.get('total_debit') or 0, row.get('total_credit') or 0)
+        for row in result.data or []
+    }
+
+def build_trial_balance_from_totals(account_totals):
+    """Susun NSSP dari total per akun + neraca saldo awal, dengan aturan yang sama seperti buku besar"""
+    accounts = get_chart_of_accounts()
+    opening_by_code = {}
+    for balance in get_opening_balances_with_account_info():
+        opening_by_code.setdefault(balance['account_code'], balance)
+    
+    trial_balance_data = []
+    for account in accounts:
+        account_code = account['account_code']
+        account_type = account['account_type']
+        opening_balance = opening_by_code.get(account_code)
+        
+        # Buku besar hanya memuat akun yang punya saldo awal atau transaksi
+        if not opening_balance and account_code not in account_totals:
+            continue
+        
+        is_debit_normal = account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']
+        initial_balance = 0
+        if opening_balance:
+            normal_position = 'debit' if is_debit_normal else 'kredit'
+            initial_balance = opening_balance['amount'] if opening_balance['position'] == normal_position else -opening_balance['amount']
+        
+        total_debit, total_credit = account_totals.get(account_code, (0, 0))
+        if is_debit_normal:
+            final_balance = initial_balance + total_debit - total_credit
+        else:
+            final_balance = initial_balance + total_credit - total_debit
+        
+        trial_balance_data.append(trial_balance_row(account_code, account['account_name'], account_type, final_balance))
+    
+    # Akun yang tidak ada di Chart of Account diperlakukan sebagai 'Unknown' (saldo normal kredit)
+    known_codes = {account['account_code'] for account in accounts}
+    for account_code, (total_debit, total_credit) in account_totals.items():
+        if account_code not in known_codes:
+            trial_balance_data.append(trial_balance_row(account_code, get_account_name(account_code), 'Unknown', total_credit - total_debit))
+    
+    if not trial_balance_data:
+        return zero_trial_balance()
+    
+    trial_balance_data.sort(key=lambda x: x['account_code'])
+    return trial_balance_data
+
+def verify_trial_balance(period, trial_balance_data, reference_data):
+    """Bandingkan hasil RPC dengan jalur Python dan log setiap selisih"""
+    reference_by_code = {item['account_code']: item for item in reference_data}
+    mismatches = 0
+    for item in trial_balance_data:
+        reference = reference_by_code.pop(item['account_code'], None)
+        if not reference or abs(item['debit'] - reference['debit']) >= 0.01 or abs(item['credit'] - reference['credit']) >= 0.01:
+            mismatches += 1
+            logger.warning(f"⚠️ Trial balance mismatch {period} {item['account_code']}: rpc={item} python={reference}")
+    for account_code, reference in reference_by_code.items():
+        mismatches += 1
+        logger.warning(f"⚠️ Trial balance mismatch {period} {account_code}: rpc=None python={reference}")
+    
+    if mismatches:
+        logger.warning(f"⚠️ Trial balance verification {period}: {mismatches} mismatches")
+    else:
+        logger.info(f"✅ Trial balance verification {period}: RPC matches Python aggregation")
+
 def get_trial_balance_summary(trial_balance_data):
     """Hitung summary dari neraca saldo"""
     try:
@@ -4529,6 +6670,104 @@ def create_sample_transactions_for_period(period):
         logger.error(traceback.format_exc())
         return False
 
+# ============================================================
+# 🔹 NERACA SALDO RENTANG TANGGAL & TAHUN FISKAL
+# ============================================================
+# Total debit/kredit per akun per bulan disimpan di cache saldo (kind "account_totals") dan
+# ikut dihapus oleh invalidate_period_cache. Rentang tanggal dijumlahkan dari bulan penuh yang
+# sudah teragregasi; hanya bulan terpotong di awal/akhir rentang yang dibaca dari entries mentah.
+FISCAL_YEAR_START_MONTH = int(os.environ.get("FISCAL_YEAR_START_MONTH", 1))
+
+def fiscal_year_range(fiscal_year):
+    """Tanggal awal dan akhir tahun fiskal (tahun fiskal diberi nama sesuai tahun mulainya)"""
+    start_period = f"{fiscal_year}-{FISCAL_YEAR_START_MONTH:02d}"
+    end_year, end_month = (fiscal_year, 12) if FISCAL_YEAR_START_MONTH == 1 else (fiscal_year + 1, FISCAL_YEAR_START_MONTH - 1)
+    return period_date_range(start_period)[0], period_date_range(f"{end_year}-{end_month:02d}")[1]
+
+def split_date_range_by_month(start_date, end_date):
+    """Pisahkan rentang tanggal menjadi bulan penuh (YYYY-MM) dan potongan bulan di tepi [(start, end)]"""
+    full_periods, partial_ranges = [], []
+    for period in periods_between(period_of(start_date), period_of(end_date)):
+        month_start, month_end = period_date_range(period)
+        range_start, range_end = max(month_start, start_date), min(month_end, end_date)
+        if (range_start, range_end) == (month_start, month_end):
+            full_periods.append(period)
+        else:
+            partial_ranges.append((range_start, range_end))
+    return full_periods, partial_ranges
+
+def get_raw_account_totals(start_date, end_date):
+    """Total debit/kredit per akun langsung dari entries (RPC jika tersedia): {account_code: (debit, credit)}"""
+    if trial_balance_rpc_enabled():
+        try:
+            return get_account_totals_rpc(start_date, end_date)
+        except Exception as e:
+            disable_trial_balance_rpc(e)
+    
+    return ledger_account_totals(build_ledger_columns(iter_journals_with_details(start_date, end_date)))
+
+def get_monthly_account_totals(periods):
+    """Total debit/kredit per akun untuk bulan-bulan penuh: {period: {account_code: (debit, credit)}}
+    
+    Bulan yang sudah ada di cache saldo tidak dibaca ulang. Bulan yang belum ada dihitung lewat RPC
+    per bulan, atau satu kali scan jurnal untuk semuanya jika RPC tidak tersedia.
+    """
+    monthly_totals = {}
+    missing = []
+    versions = {period: period_cache_version(period) for period in periods}
+    for period in periods:
+        cached = read_period_cache("account_totals", period, versions[period])
+        if cached is None:
+            missing.append(period)
+        else:
+            monthly_totals[period] = {code: tuple(totals) for code, totals in cached.items()}
+    
+    if missing and trial_balance_rpc_enabled():
+        for period in list(missing):
+            try:
+                monthly_totals[period] = get_account_totals_rpc(*period_date_range(period))
+            except Exception as e:
+                disable_trial_balance_rpc(e)
+                break
+            write_period_cache("account_totals", period, monthly_totals[period], versions[period])
+            missing.remove(period)
+    
+    if missing:
+        # Error scan diteruskan ke pemanggil: total sebagian/kosong tidak boleh masuk cache
+        journals = iter_journals_with_details(period_date_range(missing[0])[0], period_date_range(missing[-1])[1])
+        totals_by_period = ledger_totals_by_period(build_ledger_columns(journals))
+        for period in missing:
+            monthly_totals[period] = totals_by_period.get(period, {})
+            write_period_cache("account_totals", period, monthly_totals[period], versions[period])
+    return monthly_totals
+
+def get_account_totals_between(start_date, end_date):
+    """Total debit/kredit per akun untuk rentang tanggal sembarang"""
+    full_periods, partial_ranges = split_date_range_by_month(start_date, end_date)
+    
+    sources = list(get_monthly_account_totals(full_periods).values())
+    sources += [get_raw_account_totals(range_start, range_end) for range_start, range_end in partial_ranges]
+    
+    combined = {}
+    for account_totals in sources:
+        for account_code, (debit, credit) in account_totals.items():
+            total_debit, total_credit = combined.get(account_code, (0, 0))
+            combined[account_code] = (total_debit + debit, total_credit + credit)
+    
+    logger.info(f"📅 Account totals {start_date} to {end_date}: {len(full_periods)} aggregated months, {len(partial_ranges)} partial ranges")
+    return combined
+
+@request_memoized
+def calculate_trial_balance_range(start_date, end_date):
+    """Neraca saldo (saldo awal + mutasi) untuk rentang tanggal sembarang: kuartal, YTD, atau tahun fiskal"""
+    try:
+        logger.info(f"🔄 Calculating trial balance for range: {start_date} to {end_date}")
+        return build_trial_balance_from_totals(get_account_totals_between(start_date, end_date))
+    except Exception as e:
+        logger.error(f"❌ Error calculating trial balance for range: {e}")
+        logger.error(traceback.format_exc())
+        return []
+
 # ============================================================
 # 📝 12. JURNAL PENYESUAIAN
 # ============================================================
@@ -5166,7 +7405,7 @@ def jurnal_penyesuaian():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📊 FUNGSI JURNAL PENYESUAIAN
@@ -5176,8 +7415,7 @@ def get_adjusting_journals(period=None):
     """Ambil data jurnal penyesuaian untuk periode tertentu DENGAN ENTRIES"""
     try:
         # Pertama, ambil header jurnal penyesuaian
-        query = supabase.table("adjusting_journals").select("*")
-        
+        start_date = end_date = None
         if period:
             # Parse periode menjadi rentang tanggal
             year, month = map(int, period.split('-'))
@@ -5188,16 +7426,21 @@ def get_adjusting_journals(period=None):
                 import calendar
                 last_day = calendar.monthrange(year, month)[1]
                 end_date = f"{year}-{month:02d}-{last_day:02d}"
-            
-            query = query.gte('adjustment_date', start_date).lte('adjustment_date', end_date)
         
-        journals_result = query.order("adjustment_date").execute()
-        journals = journals_result.data if journals_result.data else []
+        def build_query():
+            query = supabase.table("adjusting_journals").select("*")
+            if start_date:
+                query = query.gte('adjustment_date', start_date).lte('adjustment_date', end_date)
+            return order_by(query, "adjustment_date", "id")
+        
+        journals = list(fetch_all_rows(build_query))
+        
+        # Ambil entries semua journal sekaligus (batch)
+        entries_by_journal = get_adjusting_entries_by_journal_ids([journal['id'] for journal in journals])
         
-        # Untuk setiap journal, ambil entries-nya
         journals_with_entries = []
         for journal in journals:
-            entries = get_adjusting_journal_entries(journal['id'])
+            entries = entries_by_journal.get(journal['id'], [])
             journal_data = {
                 **journal,
                 'entries': entries,
@@ -5218,28 +7461,50 @@ def get_adjusting_journal_entries(adjusting_journal_id):
     try:
         result = supabase.table("adjusting_journal_entries").select("*, chart_of_accounts(account_name, account_type)").eq("adjusting_journal_id", adjusting_journal_id).execute()
         
-        entries = []
-        if result.data:
-            for entry in result.data:
-                account_info = entry.get('chart_of_accounts', {})
-                entry_data = {
-                    'id': entry['id'],
-                    'account_code': entry['account_code'],
-                    'account_name': account_info.get('account_name', 'Unknown Account'),
-                    'account_type': account_info.get('account_type', 'Unknown'),
-                    'position': entry['position'],
-                    'amount': entry['amount'],
-                    'note': entry.get('note', ''),
-                    'created_at': entry.get('created_at', '')
-                }
-                entries.append(entry_data)
-        
-        return entries
+        return [format_adjusting_entry(entry) for entry in result.data or []]
     except Exception as e:
         logger.error(f"❌ Error getting adjusting journal entries: {e}")
         logger.error(traceback.format_exc())
         return []
 
+def format_adjusting_entry(entry):
+    """Format satu baris adjusting_journal_entries yang di-join dengan chart_of_accounts"""
+    account_info = entry.get('chart_of_accounts') or {}
+    if isinstance(account_info, list):
+        account_info = account_info[0] if account_info else {}
+    
+    return {
+        'id': entry['id'],
+        'adjusting_journal_id': entry.get('adjusting_journal_id'),
+        'account_code': entry['account_code'],
+        'account_name': account_info.get('account_name', 'Unknown Account'),
+        'account_type': account_info.get('account_type', 'Unknown'),
+        'position': entry['position'],
+        'amount': entry['amount'],
+        'note': entry.get('note', ''),
+        'created_at': entry.get('created_at', '')
+    }
+
+def get_adjusting_entries_by_journal_ids(adjusting_journal_ids):
+    """Ambil entries banyak jurnal penyesuaian sekaligus (dengan info akun), dikelompokkan per adjusting_journal_id"""
+    entries_by_journal = {}
+    adjusting_journal_ids = list(dict.fromkeys(adjusting_journal_ids))
+    
+    for i in range(0, len(adjusting_journal_ids), JOURNAL_ENTRY_BATCH_SIZE):
+        chunk = adjusting_journal_ids[i:i + JOURNAL_ENTRY_BATCH_SIZE]
+        entries = fetch_all_rows(
+            lambda: supabase.table("adjusting_journal_entries")
+                .select("*, chart_of_accounts(account_name, account_type)")
+                .in_("adjusting_journal_id", chunk)
+                .order("id")
+        )
+        
+        for journal_id, entries in group_by(entries, 'adjusting_journal_id', format_adjusting_entry).items():
+            entries_by_journal.setdefault(journal_id, []).extend(entries)
+    
+    logger.info(f"📦 Batched adjusting entries: {len(adjusting_journal_ids)} adjusting journals")
+    return entries_by_journal
+
 def save_adjusting_journal(adjustment_data):
     """Simpan jurnal penyesuaian baru"""
     try:
@@ -5254,17 +7519,10 @@ def save_adjusting_journal(adjustment_data):
             "created_at": datetime.utcnow().isoformat()
         }
         
-        journal_result = supabase.table("adjusting_journals").insert(journal_data).execute()
-        journal_id = journal_result.data[0]['id'] if journal_result.data else None
-        
-        if not journal_id:
-            return {"success": False, "message": "Gagal menyimpan header jurnal penyesuaian"}
-        
-        # Simpan entries
+        # Simpan entries bersama header (atomik lewat RPC post_adjusting_journal jika tersedia)
         entries_data = []
         for entry in adjustment_data['entries']:
             entry_data = {
-                "adjusting_journal_id": journal_id,
                 "account_code": entry['account_code'],
                 "position": entry['position'],
                 "amount": entry['amount'],
@@ -5273,9 +7531,13 @@ def save_adjusting_journal(adjustment_data):
             }
             entries_data.append(entry_data)
         
-        entries_result = supabase.table("adjusting_journal_entries").insert(entries_data).execute()
+        saved_journal = insert_journal_with_entries(
+            "post_adjusting_journal", "adjusting_journals", "adjusting_journal_entries", "adjusting_journal_id",
+            journal_data, entries_data
+        )
         
-        if entries_result.data:
+        if saved_journal:
+            invalidate_period_cache([period_of(journal_data['adjustment_date']), journal_data['period']])
             logger.info(f"✅ Adjusting journal saved: {journal_data['adjustment_number']}")
             return {
                 "success": True, 
@@ -5283,9 +7545,7 @@ def save_adjusting_journal(adjustment_data):
                 "adjustment_number": journal_data['adjustment_number']
             }
         else:
-            # Rollback jika gagal simpan entries
-            supabase.table("adjusting_journals").delete().eq("id", journal_id).execute()
-            return {"success": False, "message": "Gagal menyimpan entries jurnal penyesuaian"}
+            return {"success": False, "message": "Gagal menyimpan jurnal penyesuaian"}
             
     except Exception as e:
         logger.error(f"❌ Error saving adjusting journal: {e}")
@@ -5294,6 +7554,12 @@ def save_adjusting_journal(adjustment_data):
 def delete_adjusting_journal(adjusting_journal_id):
     """Hapus jurnal penyesuaian"""
     try:
+        # Catat periode jurnal penyesuaian untuk invalidasi cache
+        journal_result = supabase.table("adjusting_journals").select("adjustment_date, period").eq("id", adjusting_journal_id).execute()
+        affected_periods = []
+        for journal in journal_result.data or []:
+            affected_periods += [period_of(journal.get('adjustment_date')), journal.get('period')]
+        
         # Hapus entries terlebih dahulu
         delete_entries = supabase.table("adjusting_journal_entries").delete().eq("adjusting_journal_id", adjusting_journal_id).execute()
         
@@ -5301,6 +7567,7 @@ def delete_adjusting_journal(adjusting_journal_id):
         delete_journal = supabase.table("adjusting_journals").delete().eq("id", adjusting_journal_id).execute()
         
         if delete_journal.data:
+            invalidate_period_cache(affected_periods)
             logger.info(f"✅ Adjusting journal {adjusting_journal_id} deleted")
             return {"success": True, "message": "Jurnal penyesuaian berhasil dihapus"}
         else:
@@ -5349,14 +7616,16 @@ def get_adjusting_journal_summary(period=None):
         logger.error(f"❌ Error getting adjusting journal summary: {e}")
         return {'total_adjustments': 0, 'total_amount': 0, 'account_summary': []}
 
-def get_adjusting_journals_with_entries(period=None):
-    """Ambil data jurnal penyesuaian dengan entries - VERSI DIPERBAIKI"""
+@request_memoized
+def get_adjusting_journals_with_entries(period=None, start_date=None, end_date=None):
+    """Ambil data jurnal penyesuaian dengan entries - VERSI DIPERBAIKI
+    
+    start_date/end_date dipakai jika period tidak diisi (rentang beberapa periode sekaligus)
+    """
     try:
-        logger.info(f"🔍 Fetching adjusting journals with entries for period: {period}")
+        logger.info(f"🔍 Fetching adjusting journals with entries for period: {period or f'{start_date} to {end_date}'}")
         
         # Query untuk adjusting_journals
-        query = supabase.table("adjusting_journals").select("*")
-        
         if period:
             # Parse periode menjadi rentang tanggal
             year, month = map(int, period.split('-'))
@@ -5367,24 +7636,23 @@ def get_adjusting_journals_with_entries(period=None):
                 import calendar
                 last_day = calendar.monthrange(year, month)[1]
                 end_date = f"{year}-{month:02d}-{last_day:02d}"
-            
-            query = query.gte('adjustment_date', start_date).lte('adjustment_date', end_date)
         
-        journals_result = query.order("adjustment_date", desc=True).execute()
-        journals = journals_result.data if journals_result.data else []
+        def build_query():
+            query = supabase.table("adjusting_journals").select("*")
+            if start_date and end_date:
+                query = query.gte('adjustment_date', start_date).lte('adjustment_date', end_date)
+            return order_by(query, "adjustment_date", "id", desc=True)
+        
+        journals = list(fetch_all_rows(build_query))
         
         logger.info(f"📊 Found {len(journals)} adjusting journals")
         
-        # Untuk setiap journal, ambil entries-nya
+        # Ambil entries semua journal sekaligus (batch) beserta info akun
+        entries_by_journal = get_adjusting_entries_by_journal_ids([journal['id'] for journal in journals])
+        
         journals_with_entries = []
         for journal in journals:
-            # Ambil entries untuk journal ini
-            entries_result = supabase.table("adjusting_journal_entries")\
-                .select("*")\
-                .eq("adjusting_journal_id", journal['id'])\
-                .execute()
-            
-            journal_entries = entries_result.data if entries_result.data else []
+            journal_entries = entries_by_journal.get(journal['id'], [])
             
             # Format data journal dengan entries
             journal_data = {
@@ -5446,6 +7714,8 @@ def get_adjusting_journal_entries_with_account_info(adjusting_journal_id):
 # 🗃️ 13. NERACA SALDO SETELAH PENYESUAIAN
 # ============================================================
 
+@request_memoized
+@period_cached
 def get_adjusted_trial_balance(period=None):
     """Hitung Neraca Saldo Setelah Penyesuaian - PERBAIKAN TANGGAL"""
     try:
@@ -5467,11 +7737,11 @@ def get_adjusted_trial_balance(period=None):
             last_day = calendar.monthrange(year, month)[1]
             end_date = f"{year}-{month:02d}-{last_day:02d}"
         
-        # 1. Ambil neraca saldo SEBELUM penyesuaian
-        trial_balance_before = calculate_trial_balance(period)
-        
-        # 2. Ambil jurnal penyesuaian untuk periode yang sama
-        adjusting_journals = get_adjusting_journals_with_entries(period)
+        # 1-2. Neraca saldo SEBELUM penyesuaian dan jurnal penyesuaian periode yang sama (paralel)
+        trial_balance_before, adjusting_journals = fetch_parallel(
+            (calculate_trial_balance, period),
+            (get_adjusting_journals_with_entries, period)
+        )
         
         # 3. Buat mapping untuk akun-akun
         account_map = {}
@@ -5561,6 +7831,8 @@ def get_adjusted_trial_balance(period=None):
         
         return adjusted_trial_balance
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating ADJUSTED trial balance: {e}")
         logger.error(traceback.format_exc())
@@ -5931,12 +8203,14 @@ def neraca_saldo_setelah_penyesuaian():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📋 14. NERACA LAJUR
 # ============================================================
 
+@request_memoized
+@period_cached
 def get_worksheet_data(period=None):
     """Ambil data untuk neraca lajur - menggabungkan data sebelum dan setelah penyesuaian"""
     try:
@@ -5946,11 +8220,11 @@ def get_worksheet_data(period=None):
         
         logger.info(f"🔄 Calculating worksheet data for period: {period}")
         
-        # 1. Ambil neraca saldo SEBELUM penyesuaian
-        trial_balance_before = calculate_trial_balance(period)
-        
-        # 2. Ambil jurnal penyesuaian untuk periode yang sama
-        adjusting_journals = get_adjusting_journals_with_entries(period)
+        # 1-2. Neraca saldo SEBELUM penyesuaian dan jurnal penyesuaian periode yang sama (paralel)
+        trial_balance_before, adjusting_journals = fetch_parallel(
+            (calculate_trial_balance, period),
+            (get_adjusting_journals_with_entries, period)
+        )
         
         # 3. Hitung neraca saldo SETELAH penyesuaian
         adjusted_trial_balance = get_adjusted_trial_balance(period)
@@ -6025,23 +8299,22 @@ def get_worksheet_data(period=None):
             })
         
         # 5. Isi data penyesuaian dari jurnal penyesuaian
+        worksheet_by_account = index_by(worksheet_data, 'account_code')
         for journal in adjusting_journals:
             for entry in journal.get('entries', []):
-                account_code = entry['account_code']
-                amount = entry['amount']
-                
                 # Cari akun dalam worksheet data
-                for item in worksheet_data:
-                    if item['account_code'] == account_code:
-                        if entry['position'] == 'debit':
-                            item['penyesuaian_debit'] += amount
-                        else:
-                            item['penyesuaian_credit'] += amount
-                        break
+                item = worksheet_by_account.get(entry['account_code'])
+                if item is not None:
+                    if entry['position'] == 'debit':
+                        item['penyesuaian_debit'] += entry['amount']
+                    else:
+                        item['penyesuaian_credit'] += entry['amount']
         
         logger.info(f"✅ Worksheet data calculated: {len(worksheet_data)} accounts")
         return worksheet_data
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating worksheet data: {e}")
         logger.error(traceback.format_exc())
@@ -6050,18 +8323,13 @@ def get_worksheet_data(period=None):
 def get_worksheet_totals(worksheet_data):
     """Hitung total untuk setiap kolom dalam neraca lajur"""
     try:
-        totals = {
-            'neraca_saldo_debit': sum(item['neraca_saldo_debit'] for item in worksheet_data),
-            'neraca_saldo_credit': sum(item['neraca_saldo_credit'] for item in worksheet_data),
-            'penyesuaian_debit': sum(item['penyesuaian_debit'] for item in worksheet_data),
-            'penyesuaian_credit': sum(item['penyesuaian_credit'] for item in worksheet_data),
-            'nssp_debit': sum(item['nssp_debit'] for item in worksheet_data),
-            'nssp_credit': sum(item['nssp_credit'] for item in worksheet_data),
-            'laba_rugi_debit': sum(item['laba_rugi_debit'] for item in worksheet_data),
-            'laba_rugi_credit': sum(item['laba_rugi_credit'] for item in worksheet_data),
-            'neraca_debit': sum(item['neraca_debit'] for item in worksheet_data),
-            'neraca_credit': sum(item['neraca_credit'] for item in worksheet_data)
-        }
+        totals = column_totals(worksheet_data, [
+            'neraca_saldo_debit', 'neraca_saldo_credit',
+            'penyesuaian_debit', 'penyesuaian_credit',
+            'nssp_debit', 'nssp_credit',
+            'laba_rugi_debit', 'laba_rugi_credit',
+            'neraca_debit', 'neraca_credit'
+        ])
         
         # Hitung laba/rugi
         laba_rugi = totals['laba_rugi_credit'] - totals['laba_rugi_debit']
@@ -6156,12 +8424,14 @@ def validate_worksheet_allocation(worksheet_data):
     corrected_data = []
     
     for item in worksheet_data:
+        # Baris neraca lajur dipakai bersama lewat memo request; koreksi dilakukan pada salinan
+        item = dict(item)
         account_name = item['account_name']
         account_type = item['account_type']
         account_code = item['account_code']
         
         # Tentukan alokasi yang benar
-        correct_allocation = correct_worksheet_allocation(account_type, account_name)
+        correct_allocation = get_account_classification(account_code, account_name, account_type)['section']
         
         # Jika akun seharusnya di laba rugi tapi saat ini di neraca, koreksi
         if correct_allocation == 'LABA_RUGI':
@@ -6194,6 +8464,7 @@ def validate_worksheet_allocation(worksheet_data):
 
 @app.route("/neraca_lajur")
 @admin_required
+@ledger_conditional
 def neraca_lajur():
     """Halaman Neraca Lajur (Worksheet) dengan format sesuai gambar"""
     user_email = session.get('user_email')
@@ -6547,7 +8818,7 @@ def neraca_lajur():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📈 15. LAPORAN LABA RUGI
@@ -6725,6 +8996,7 @@ def laporan_laba_rugi():
         <div class="welcome-message">
             Laporan yang menunjukkan kinerja keuangan perusahaan dalam suatu periode. 
             Menampilkan pendapatan, beban, dan laba/rugi bersih.
+            <br><a href="/laporan_komparatif?report=income_statement&end_period={period}">📊 Bandingkan per bulan (komparatif)</a>
         </div>
     </div>
 
@@ -6796,7 +9068,7 @@ def laporan_laba_rugi():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 📊 16. LAPORAN PERUBAHAN MODAL
@@ -7037,13 +9309,14 @@ def laporan_perubahan_modal():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 💰 17. LAPORAN POSISI KEUANGAN
 # ============================================================
 @app.route("/laporan_posisi_keuangan")
 @admin_required
+@ledger_conditional
 def laporan_posisi_keuangan():
     """Halaman Laporan Posisi Keuangan (Neraca)"""
     user_email = session.get('user_email')
@@ -7300,6 +9573,7 @@ def laporan_posisi_keuangan():
             Laporan yang menunjukkan posisi keuangan perusahaan pada tanggal tertentu. 
             Menampilkan aktiva, kewajiban, dan modal perusahaan.
             {"<br><strong>📝 Termasuk akumulasi penyusutan pada aktiva tetap</strong>" if balance_data.get('akumulasi_penyusutan') else ""}
+            <br><a href="/laporan_komparatif?report=balance_sheet&end_period={period}">📊 Bandingkan per bulan (komparatif)</a>
         </div>
     </div>
 
@@ -7359,7 +9633,7 @@ def laporan_posisi_keuangan():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 💸 18. LAPORAN ARUS KAS
@@ -7631,12 +9905,13 @@ def laporan_arus_kas():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔹  FUNGSI LAPORAN KEUANGAN
 # ============================================================
 
+@request_memoized
 def get_income_statement_data(period=None):
     """Ambil data untuk Laporan Laba Rugi dari neraca lajur - VERSI DIPERBAIKI UNTUK JURNAL PENUTUP"""
     try:
@@ -7682,13 +9957,12 @@ def get_income_statement_data(period=None):
                 account_type = item['account_type']
                 laba_rugi_debit = item['laba_rugi_debit']
                 laba_rugi_credit = item['laba_rugi_credit']
+                classification = get_account_classification(account_code, account_name, account_type)
                 
                 # ✅ DETEKSI LEBIH AKURAT UNTUK JURNAL PENUTUP
                 
                 # PENDAPATAN (di credit - harus di DEBIT di jurnal penutup)
-                if (account_type == 'Pendapatan' or 
-                    'penjualan' in account_name.lower() or 
-                    'pendapatan' in account_name.lower()) and laba_rugi_credit > 0:
+                if classification['is_revenue'] and laba_rugi_credit > 0:
                     income_accounts.append({
                         'account_code': account_code,
                         'account_name': account_name,
@@ -7697,10 +9971,7 @@ def get_income_statement_data(period=None):
                     logger.info(f"💰 Pendapatan untuk Jurnal Penutup: {account_name} - {format_currency(laba_rugi_credit)}")
                 
                 # HPP (di debit - harus di DEBIT di jurnal penutup)
-                elif (account_type == 'Harga Pokok Penjualan' or 
-                      'hpp' in account_name.lower() or 
-                      'harga pokok' in account_name.lower() or
-                      account_code.startswith('5-1')) and laba_rugi_debit > 0:
+                elif classification['is_cogs'] and laba_rugi_debit > 0:
                     hpp_accounts.append({
                         'account_code': account_code,
                         'account_name': account_name,
@@ -7708,20 +9979,14 @@ def get_income_statement_data(period=None):
                     })
                     logger.info(f"📦 HPP untuk Jurnal Penutup: {account_name} - {format_currency(laba_rugi_debit)}")
                 
-                # BEBAN (di debit - harus di DEBIT di jurnal penutup)
-                elif (account_type == 'Beban' or 
-                      'beban' in account_name.lower() or
-                      'biaya' in account_name.lower() or
-                      account_code.startswith('5-') or 
-                      account_code.startswith('6-')) and laba_rugi_debit > 0:
-                    # Exclude HPP yang sudah ditangani
-                    if not ('hpp' in account_name.lower() or 'harga pokok' in account_name.lower()):
-                        expense_accounts.append({
-                            'account_code': account_code,
-                            'account_name': account_name,
-                            'amount': laba_rugi_debit
-                        })
-                        logger.info(f"💸 Beban untuk Jurnal Penutup: {account_name} - {format_currency(laba_rugi_debit)}")
+                # BEBAN (di debit - harus di DEBIT di jurnal penutup), HPP sudah dikecualikan di klasifikasi
+                elif classification['is_expense'] and laba_rugi_debit > 0:
+                    expense_accounts.append({
+                        'account_code': account_code,
+                        'account_name': account_name,
+                        'amount': laba_rugi_debit
+                    })
+                    logger.info(f"💸 Beban untuk Jurnal Penutup: {account_name} - {format_currency(laba_rugi_debit)}")
         
         # Jika tidak ada data, coba ambil dari neraca saldo setelah penyesuaian
         if not income_accounts and not hpp_accounts and not expense_accounts:
@@ -7730,10 +9995,10 @@ def get_income_statement_data(period=None):
             
             for item in nssp_data:
                 account_name = item['account_name']
-                account_type = item['account_type']
+                classification = classification_of(item)
                 
                 # Pendapatan dari NSSP
-                if (account_type == 'Pendapatan' or 'penjualan' in account_name.lower()) and item['credit_after'] > 0:
+                if classification['is_revenue_basic'] and item['credit_after'] > 0:
                     income_accounts.append({
                         'account_code': item['account_code'],
                         'account_name': account_name,
@@ -7741,7 +10006,7 @@ def get_income_statement_data(period=None):
                     })
                 
                 # HPP dari NSSP
-                elif (account_type == 'Harga Pokok Penjualan' or 'hpp' in account_name.lower()) and item['debit_after'] > 0:
+                elif classification['is_cogs_basic'] and item['debit_after'] > 0:
                     hpp_accounts.append({
                         'account_code': item['account_code'],
                         'account_name': account_name,
@@ -7749,7 +10014,7 @@ def get_income_statement_data(period=None):
                     })
                 
                 # Beban dari NSSP
-                elif (account_type == 'Beban' or 'beban' in account_name.lower()) and item['debit_after'] > 0:
+                elif classification['is_expense_basic'] and item['debit_after'] > 0:
                     expense_accounts.append({
                         'account_code': item['account_code'],
                         'account_name': account_name,
@@ -7796,6 +10061,8 @@ def get_income_statement_data(period=None):
             'is_profit': laba_rugi_bersih >= 0
         }
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating income statement for JURNAL PENUTUP: {e}")
         logger.error(traceback.format_exc())
@@ -7813,6 +10080,7 @@ def get_income_statement_data(period=None):
             'is_profit': True
         }
 
+@request_memoized
 def get_balance_sheet_data(period=None):
     """Ambil data untuk Laporan Posisi Keuangan - DIPERBAIKI UNTUK AKUMULASI PENYUSUTAN"""
     try:
@@ -7859,11 +10127,8 @@ def get_balance_sheet_data(period=None):
             credit_amount = item['credit_after']
             
             # ✅ PERBAIKAN: Untuk akumulasi penyusutan, gunakan saldo kredit meskipun kecil
-            is_accumulated_depreciation = (
-                'akumulasi penyusutan' in account_name.lower() or 
-                'accumulated depreciation' in account_name.lower() or
-                'penyusutan' in account_name.lower() and 'akumulasi' in account_name.lower()
-            )
+            classification = get_account_classification(account_code, account_name, account_type)
+            is_accumulated_depreciation = classification['is_contra_asset']
             
             if is_accumulated_depreciation:
                 # ✅ TAMPILKAN MESKIPUN SALDO KECIL - akumulasi penyusutan penting untuk ditampilkan
@@ -7878,7 +10143,7 @@ def get_balance_sheet_data(period=None):
                 continue  # Skip ke akun berikutnya
             
             # Untuk akun lain, tentukan jumlah berdasarkan tipe akun
-            if account_type in ['Aktiva Lancar', 'Aktiva Tetap', 'Beban']:
+            if classification['normal_side'] == 'debit':
                 # Akun debit normal - gunakan debit amount
                 amount = debit_amount
             else:
@@ -7909,8 +10174,7 @@ def get_balance_sheet_data(period=None):
         if not akumulasi_penyusutan:
             logger.info("🔍 No accumulated depreciation found in auto-detection, searching manually...")
             for item in adjusted_trial_balance:
-                account_name = item['account_name'].lower()
-                if any(keyword in account_name for keyword in ['akumulasi', 'penyusutan', 'depreciation']):
+                if classification_of(item)['is_depreciation_related']:
                     amount = item['credit_after']
                     if amount > 0:
                         akumulasi_penyusutan.append({
@@ -7971,6 +10235,8 @@ def get_balance_sheet_data(period=None):
             'is_balanced': abs(total_aktiva - total_kewajiban_modal) < 0.01
         }
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating balance sheet: {e}")
         logger.error(traceback.format_exc())
@@ -7989,6 +10255,7 @@ def get_balance_sheet_data(period=None):
             'is_balanced': True
         }
 
+@request_memoized
 def get_equity_statement_data(period=None):
     """Ambil data untuk Laporan Perubahan Modal - VERSI DIPERBAIKI DENGAN NAMA AKUN"""
     try:
@@ -8030,9 +10297,7 @@ def get_equity_statement_data(period=None):
             account_type = item['account_type']
             
             # Cari akun modal (Modal Saham, Modal Disetor, dll)
-            if (account_type == 'Modal' or 
-                'Modal' in account_name or 
-                'modal' in account_name.lower()):
+            if get_account_classification(item['account_code'], account_name, account_type)['is_equity']:
                 
                 # Untuk akun modal, saldo normalnya di kredit
                 if item['neraca_credit'] > 0:
@@ -8048,9 +10313,7 @@ def get_equity_statement_data(period=None):
             logger.info("🔍 Modal not found in worksheet, trying trial balance...")
             trial_balance = calculate_trial_balance(period)
             for item in trial_balance:
-                if (item['account_type'] == 'Modal' or 
-                    'Modal' in item['account_name'] or 
-                    'modal' in item['account_name'].lower()):
+                if classification_of(item)['is_equity']:
                     
                     # Akun modal biasanya di kredit
                     if item['credit'] > 0:
@@ -8071,7 +10334,7 @@ def get_equity_statement_data(period=None):
         
         # Cari akun prive jika ada
         for item in worksheet_data:
-            if 'prive' in item['account_name'].lower() or 'prive' in item['account_code'].lower():
+            if classification_of(item)['is_prive']:
                 prive = abs(item['neraca_debit'] - item['neraca_credit'])
                 prive_account_name = item['account_name']
                 break
@@ -8099,6 +10362,8 @@ def get_equity_statement_data(period=None):
             'modal_akhir': modal_akhir
         }
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating equity statement: {e}")
         logger.error(traceback.format_exc())
@@ -8115,6 +10380,7 @@ def get_equity_statement_data(period=None):
             'modal_akhir': 0
         }
 
+@request_memoized
 def get_cash_flow_data(period=None):
     """Ambil data untuk Laporan Arus Kas - VERSI DIPERBAIKI"""
     try:
@@ -8134,12 +10400,16 @@ def get_cash_flow_data(period=None):
             last_day = calendar.monthrange(year, month)[1]
             end_date = f"{year}-{month:02d}-{last_day:02d}"
         
+        # Neraca saldo awal dan total arus kas per kategori tidak saling bergantung: diambil paralel
+        opening_balances, cash_flow_totals = fetch_parallel(
+            (get_opening_balances_with_account_info,),
+            (get_cash_flow_totals, start_date, end_date)
+        )
+        
         # 1. ✅ PERBAIKAN: Ambil saldo kas awal dari NERACA SALDO AWAL, bukan setelah penyesuaian
         kas_awal = 0
-        opening_balances = get_opening_balances_with_account_info()
         for balance in opening_balances:
-            account_name = balance['account_name'].lower()
-            if 'kas' in account_name and balance['account_type'] == 'Aktiva Lancar':
+            if classification_of(balance)['is_cash']:
                 if balance['position'] == 'debit':
                     kas_awal = balance['amount']
                 else:
@@ -8151,65 +10421,15 @@ def get_cash_flow_data(period=None):
         if kas_awal == 0:
             trial_balance = calculate_trial_balance(period)
             for item in trial_balance:
-                if 'kas' in item['account_name'].lower() and item['account_type'] == 'Aktiva Lancar':
+                if classification_of(item)['is_cash']:
                     kas_awal = item['debit']  # Gunakan saldo sebelum penyesuaian
                     logger.info(f"💰 Kas awal dari trial balance: {item['account_name']} = {format_currency(kas_awal)}")
                     break
         
-        # 2. ✅ PERBAIKAN: Analisis transaksi yang lebih akurat untuk arus kas operasi
-        penerimaan_pelanggan = 0
-        pembayaran_pemasok = 0
-        pembayaran_beban_operasional = 0
-        
-        # Ambil semua transaksi jurnal untuk periode ini
-        journals = get_journal_entries_with_details(start_date, end_date)
-        
-        for journal in journals:
-            description = journal.get('description', '').lower()
-            entries = journal.get('journal_entries', [])
-            
-            # ✅ PERBAIKAN: Analisis yang lebih komprehensif untuk penerimaan dari pelanggan
-            is_penerimaan = any(keyword in description for keyword in [
-                'penjualan', 'jual', 'sales', 'pendapatan', 'pelunasan', 'piutang',
-                'penerimaan', 'terima', 'diterima', 'pembayaran pelanggan'
-            ])
-            
-            if is_penerimaan:
-                for entry in entries:
-                    account_name = get_account_name(entry['account_code']).lower()
-                    # Penerimaan kas (kas bertambah di debit)
-                    if ('kas' in account_name or 'kas' in entry.get('account_code', '').lower()) and entry['position'] == 'debit':
-                        penerimaan_pelanggan += entry['amount']
-                        logger.info(f"💰 Cash receipt: {format_currency(entry['amount'])} - {description}")
-            
-            # ✅ PERBAIKAN: Analisis yang lebih komprehensif untuk pembayaran ke pemasok
-            is_pembayaran_pemasok = any(keyword in description for keyword in [
-                'pembelian', 'beli', 'bahan', 'pemasok', 'persediaan', 'perlengkapan', 
-                'pelunasan', 'utang', 'pembayaran', 'bayar', 'dibayar', 'pemasok',
-                'bibit', 'pakan', 'perlengkapan', 'peralatan'
-            ])
-            
-            if is_pembayaran_pemasok:
-                for entry in entries:
-                    account_name = get_account_name(entry['account_code']).lower()
-                    # Pengeluaran kas untuk pemasok (kas berkurang di kredit)
-                    if ('kas' in account_name or 'kas' in entry.get('account_code', '').lower()) and entry['position'] == 'kredit':
-                        pembayaran_pemasok += entry['amount']
-                        logger.info(f"💸 Payment to supplier: {format_currency(entry['amount'])} - {description}")
-            
-            # ✅ PERBAIKAN: Analisis untuk pembayaran beban operasional
-            is_beban_operasional = any(keyword in description for keyword in [
-                'beban', 'gaji', 'listrik', 'air', 'obat', 'perawatan', 'operasional',
-                'biaya', 'pengeluaran', 'administrasi', 'transport', 'pemeliharaan'
-            ])
-            
-            if is_beban_operasional:
-                for entry in entries:
-                    account_name = get_account_name(entry['account_code']).lower()
-                    # Pengeluaran kas untuk beban (kas berkurang di kredit)
-                    if ('kas' in account_name or 'kas' in entry.get('account_code', '').lower()) and entry['position'] == 'kredit':
-                        pembayaran_beban_operasional += entry['amount']
-                        logger.info(f"💸 Expense payment: {format_currency(entry['amount'])} - {description}")
+        # 2. Arus kas operasi: jumlah per kategori arus kas yang tersimpan di jurnal
+        penerimaan_pelanggan = cash_flow_totals[CASH_FLOW_RECEIPT]
+        pembayaran_pemasok = cash_flow_totals[CASH_FLOW_SUPPLIER]
+        pembayaran_beban_operasional = cash_flow_totals[CASH_FLOW_EXPENSE]
 
         # 3. Hitung arus kas bersih dari operasi
         arus_kas_operasi = penerimaan_pelanggan - pembayaran_pemasok - pembayaran_beban_operasional
@@ -8240,6 +10460,8 @@ def get_cash_flow_data(period=None):
             'end_date': end_date
         }
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating IMPROVED cash flow statement: {e}")
         logger.error(traceback.format_exc())
@@ -8256,6 +10478,216 @@ def get_cash_flow_data(period=None):
             'end_date': ''
         }
 
+# ============================================================
+# 📊 LAPORAN KOMPARATIF MULTI-PERIODE
+# ============================================================
+# Jurnal umum dan jurnal penyesuaian untuk seluruh rentang dibaca sekali, dikelompokkan per
+# bulan dalam satu kali scan, lalu NSSP tiap bulan dimasukkan ke memo request. Laporan per
+# bulan tetap memakai get_income_statement_data / get_balance_sheet_data yang sama.
+COMPARATIVE_MAX_PERIODS = int(os.environ.get("COMPARATIVE_MAX_PERIODS", 24))
+
+def prime_period_range(periods):
+    """Hitung NSSP dan ambil jurnal penyesuaian untuk semua periode dengan satu kali baca per tabel"""
+    start_date = period_date_range(periods[0])[0]
+    end_date = period_date_range(periods[-1])[1]
+    
+    # Satu scan jurnal umum: total debit/kredit per akun per bulan
+    totals_by_period = ledger_totals_by_period(build_ledger_columns(iter_journals_with_details(start_date, end_date)))
+    
+    # Satu query jurnal penyesuaian untuk seluruh rentang, dikelompokkan per bulan
+    adjusting_journals = get_adjusting_journals_with_entries(start_date=start_date, end_date=end_date)
+    adjustments_by_period = group_by(adjusting_journals, lambda journal: period_of(journal['adjustment_date']))
+    
+    for period in periods:
+        prime_request_memo(calculate_trial_balance, (period,), build_trial_balance_from_totals(totals_by_period.get(period, {})))
+        prime_request_memo(get_adjusting_journals_with_entries, (period,), adjustments_by_period.get(period, []))
+    
+    logger.info(f"📊 Primed {len(periods)} periods from {start_date} to {end_date} in one pass")
+
+def build_comparative_sections(statements, section_titles, summary_titles, total_of):
+    """Susun kolom per periode: baris per akun untuk tiap bagian + baris ringkasan
+    
+    total_of(amounts) menentukan kolom total (jumlah untuk laba rugi, posisi akhir untuk neraca).
+    """
+    sections = []
+    for key, title in section_titles:
+        rows = {}
+        for index, statement in enumerate(statements):
+            for item in statement.get(key, []):
+                row = rows.setdefault(item['account_code'], {
+                    'account_code': item['account_code'],
+                    'account_name': item['account_name'],
+                    'amounts': [0] * len(statements)
+                })
+                row['amounts'][index] += item['amount']
+        
+        section_rows = sorted(rows.values(), key=lambda row: row['account_code'])
+        for row in section_rows:
+            row['total'] = total_of(row['amounts'])
+        sections.append({'key': key, 'title': title, 'rows': section_rows})
+    
+    summary = []
+    for key, title in summary_titles:
+        amounts = [statement.get(key, 0) for statement in statements]
+        summary.append({'key': key, 'title': title, 'amounts': amounts, 'total': total_of(amounts)})
+    
+    return sections, summary
+
+def get_comparative_income_statement(start_period, end_period):
+    """Laba rugi per bulan untuk rentang periode + kolom total (YTD)"""
+    periods = periods_between(start_period, end_period)
+    prime_period_range(periods)
+    statements = [get_income_statement_data(period) for period in periods]
+    
+    sections, summary = build_comparative_sections(
+        statements,
+        [('income_accounts', 'PENDAPATAN'), ('hpp_accounts', 'HARGA POKOK PENJUALAN'), ('expense_accounts', 'BEBAN OPERASIONAL')],
+        [('total_pendapatan', 'Total Pendapatan'), ('total_hpp', 'Total HPP'), ('laba_kotor', 'Laba Kotor'),
+         ('total_beban', 'Total Beban'), ('laba_rugi_bersih', 'Laba (Rugi) Bersih')],
+        sum
+    )
+    return {'report': 'income_statement', 'periods': periods, 'total_label': 'YTD', 'sections': sections, 'summary': summary}
+
+def get_comparative_balance_sheet(start_period, end_period):
+    """Posisi keuangan per bulan untuk rentang periode; kolom total = posisi periode terakhir"""
+    periods = periods_between(start_period, end_period)
+    prime_period_range(periods)
+    statements = [get_balance_sheet_data(period) for period in periods]
+    
+    sections, summary = build_comparative_sections(
+        statements,
+        [('aktiva_lancar', 'AKTIVA LANCAR'), ('aktiva_tetap', 'AKTIVA TETAP'), ('akumulasi_penyusutan', 'AKUMULASI PENYUSUTAN'),
+         ('kewajiban', 'KEWAJIBAN'), ('modal', 'MODAL')],
+        [('total_aktiva', 'Total Aktiva'), ('total_kewajiban', 'Total Kewajiban'), ('total_modal', 'Total Modal'),
+         ('total_kewajiban_modal', 'Total Kewajiban & Modal')],
+        lambda amounts: amounts[-1]
+    )
+    return {'report': 'balance_sheet', 'periods': periods, 'total_label': 'Akhir', 'sections': sections, 'summary': summary}
+
+COMPARATIVE_REPORTS = {
+    "income_statement": ("Laporan Laba Rugi Komparatif", get_comparative_income_statement),
+    "balance_sheet": ("Laporan Posisi Keuangan Komparatif", get_comparative_balance_sheet),
+}
+
+def validate_period_range(start_period, end_period):
+    """Cek rentang periode komparatif; kembalikan pesan error atau None"""
+    try:
+        datetime.strptime(start_period, '%Y-%m')
+        datetime.strptime(end_period, '%Y-%m')
+    except (TypeError, ValueError):
+        return "Format periode harus YYYY-MM"
+    if start_period > end_period:
+        return "Periode awal harus sebelum periode akhir"
+    if len(periods_between(start_period, end_period)) > COMPARATIVE_MAX_PERIODS:
+        return f"Maksimal {COMPARATIVE_MAX_PERIODS} periode per laporan komparatif"
+    return None
+
+@app.route("/laporan_komparatif")
+@admin_required
+def laporan_komparatif():
+    """Halaman laporan komparatif per bulan (laba rugi / posisi keuangan) untuk rentang periode"""
+    user_email = session.get('user_email')
+    user_name = session.get('user_name', 'Admin')
+    user_id = session.get('user_id', 'Unknown')
+    user_role = get_user_role()
+    
+    report = request.args.get('report', 'income_statement')
+    if report not in COMPARATIVE_REPORTS:
+        report = 'income_statement'
+    end_period = request.args.get('end_period') or current_period()
+    start_period = request.args.get('start_period') or f"{end_period[:4]}-01"
+    
+    title, source = COMPARATIVE_REPORTS[report]
+    error = validate_period_range(start_period, end_period)
+    if not error:
+        try:
+            data = source(start_period, end_period)
+        except Exception as e:
+            # Data terpotong tidak ditampilkan sebagai laporan: tampilkan pesan error
+            logger.error(f"❌ Error building comparative report {report}: {e}")
+            logger.error(traceback.format_exc())
+            error = "Gagal membaca data jurnal, silakan coba lagi"
+    
+    report_options = "".join(
+        f'<option value="{key}" {"selected" if key == report else ""}>{label}</option>'
+        for key, (label, _) in COMPARATIVE_REPORTS.items()
+    )
+    
+    if error:
+        table_html = f"<div class='message error'>❌ {error}</div>"
+    else:
+        header_cells = "".join(f'<th style="padding: 10px; border: 1px solid #007bff; text-align: right;">{period}</th>' for period in data['periods'])
+        
+        def amount_cells(amounts, total, style=""):
+            cells = "".join(f'<td style="padding: 8px; border: 1px solid #dee2e6; text-align: right; {style}">{format_currency(amount)}</td>' for amount in amounts)
+            return cells + f'<td style="padding: 8px; border: 1px solid #dee2e6; text-align: right; font-weight: bold; background: #f8f9fa; {style}">{format_currency(total)}</td>'
+        
+        body_html = ""
+        column_count = len(data['periods']) + 2
+        for section in data['sections']:
+            body_html += f'<tr style="background: #e9ecef;"><td colspan="{column_count}" style="padding: 10px; font-weight: bold; color: #008DD8;">{section["title"]}</td></tr>'
+            for row in section['rows']:
+                body_html += f'<tr><td style="padding: 8px; border: 1px solid #dee2e6; padding-left: 20px;">{row["account_code"]} - {row["account_name"]}</td>{amount_cells(row["amounts"], row["total"])}</tr>'
+            if not section['rows']:
+                body_html += f'<tr><td colspan="{column_count}" style="padding: 8px; border: 1px solid #dee2e6; padding-left: 20px; color: #999;">Tidak ada akun</td></tr>'
+        for row in data['summary']:
+            body_html += f'<tr style="background: #f1f8ff; font-weight: bold;"><td style="padding: 10px; border: 1px solid #dee2e6;">{row["title"]}</td>{amount_cells(row["amounts"], row["total"], "font-weight: bold;")}</tr>'
+        
+        table_html = f"""
+        <div style="overflow-x: auto;">
+            <table style="width: 100%; border-collapse: collapse; font-size: 13px; white-space: nowrap;">
+                <thead>
+                    <tr style="background: #008DD8; color: white;">
+                        <th style="padding: 10px; border: 1px solid #007bff; text-align: left;">Akun</th>
+                        {header_cells}
+                        <th style="padding: 10px; border: 1px solid #007bff; text-align: right;">{data['total_label']}</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {body_html}
+                </tbody>
+            </table>
+        </div>
+        """
+    
+    content = f"""
+    <div class="welcome-section">
+        <h2>📊 {title}</h2>
+        <div class="welcome-message">
+            Bandingkan laporan per bulan dalam satu tabel. Kolom terakhir berisi total (YTD) untuk laba rugi
+            dan posisi periode terakhir untuk neraca.
+        </div>
+    </div>
+    
+    <div class="quick-actions">
+        <form method="GET" style="display: grid; grid-template-columns: 2fr 1fr 1fr auto; gap: 15px; align-items: end;">
+            <div>
+                <label style="display: block; margin-bottom: 5px; font-weight: 600;">Laporan</label>
+                <select name="report" style="width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">{report_options}</select>
+            </div>
+            <div>
+                <label style="display: block; margin-bottom: 5px; font-weight: 600;">Dari Periode</label>
+                <input type="month" name="start_period" value="{start_period}" style="width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
+            </div>
+            <div>
+                <label style="display: block; margin-bottom: 5px; font-weight: 600;">Sampai Periode</label>
+                <input type="month" name="end_period" value="{end_period}" style="width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
+            </div>
+            <div>
+                <button type="submit" style="background: #008DD8; color: white; border: none; padding: 10px 20px; border-radius: 5px; cursor: pointer;">
+                    🔍 Tampilkan
+                </button>
+            </div>
+        </form>
+    </div>
+    
+    <div class="quick-actions">
+        {table_html}
+    </div>
+    """
+    
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+
 # ============================================================
 # 💸 19. JURNAL PENUTUP
 # ============================================================
@@ -8569,7 +11001,7 @@ def jurnal_penutup():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 🔄 FUNGSI JURNAL PENUTUP
@@ -8698,10 +11130,13 @@ def get_closing_journal_data(period):
         logger.info(f"✅ Closing journal data calculated: {len(closing_entries)} entries")
         return result
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating closing journal data: {e}")
         return {'entries': [], 'total_debit': 0, 'total_credit': 0, 'is_balanced': False}
 
+@request_memoized
 def get_modal_from_cash_flow(period):
     """Ambil nilai Modal Usaha secara otomatis dari Laporan Arus Kas"""
     try:
@@ -8734,11 +11169,14 @@ def get_modal_from_cash_flow(period):
         logger.info(f"💰 Modal dihitung dari Kas Akhir: {format_currency(modal_calculated)}")
         return modal_calculated
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error getting modal from cash flow: {e}")
         logger.error(traceback.format_exc())
         return 0
 
+@request_memoized
 def get_post_closing_trial_balance(period=None):
     """Hitung Neraca Saldo Setelah Penutup - DIPERBAIKI UNTUK AKUMULASI PENYUSUTAN DAN MODAL"""
     try:
@@ -8771,11 +11209,7 @@ def get_post_closing_trial_balance(period=None):
             if item.get('is_balance_sheet') and (item['neraca_debit'] > 0 or item['neraca_credit'] > 0):
                 
                 # ✅ PERBAIKAN: Jika ini akun Modal Usaha, gunakan nilai dari Laporan Arus Kas
-                is_modal_account = (
-                    item['account_code'] == '3-3100' or 
-                    'modal' in item['account_name'].lower() or
-                    'modal usaha' in item['account_name'].lower()
-                )
+                is_modal_account = item['account_code'] == '3-3100' or classification_of(item)['mentions_modal']
                 
                 if is_modal_account and modal_dari_arus_kas > 0:
                     post_closing_data.append({
@@ -8801,8 +11235,7 @@ def get_post_closing_trial_balance(period=None):
         # Cari akun akumulasi penyusutan di adjusted trial balance
         depreciation_accounts = []
         for item in adjusted_trial_balance:
-            account_name = item['account_name'].lower()
-            if any(keyword in account_name for keyword in ['akumulasi', 'penyusutan', 'depreciation']):
+            if classification_of(item)['is_depreciation_related']:
                 # ✅ PERBAIKAN: Untuk akumulasi penyusutan, saldo normalnya di kredit - JANGAN DIUBAH
                 if item['credit_after'] > 0:
                     depreciation_accounts.append({
@@ -8815,11 +11248,13 @@ def get_post_closing_trial_balance(period=None):
                     logger.info(f"✅ Found accumulated depreciation: {item['account_name']} = {format_currency(item['credit_after'])} (Kredit)")
         
         # Tambahkan akumulasi penyusutan jika belum ada di post_closing_data
+        post_closing_codes = set(index_by(post_closing_data, 'account_code'))
         for dep_account in depreciation_accounts:
             # Cek apakah sudah ada di post_closing_data
-            existing = any(item['account_code'] == dep_account['account_code'] for item in post_closing_data)
+            existing = dep_account['account_code'] in post_closing_codes
             if not existing and (dep_account['debit'] > 0 or dep_account['credit'] > 0):
                 post_closing_data.append(dep_account)
+                post_closing_codes.add(dep_account['account_code'])
                 logger.info(f"✅ Added depreciation account to post-closing: {dep_account['account_name']} = {format_currency(dep_account['credit'])} (Kredit)")
         
         # Jika tidak menemukan akun modal, tambahkan manually
@@ -8840,10 +11275,7 @@ def get_post_closing_trial_balance(period=None):
             account_type = item['account_type']
             
             # ✅ PERBAIKAN PENTING: JANGAN ubah akun akumulasi penyusutan
-            is_accumulated_depreciation = (
-                'akumulasi' in account_name.lower() and 
-                'penyusutan' in account_name.lower()
-            )
+            is_accumulated_depreciation = classification_of(item)['is_accumulated_depreciation']
             
             if is_accumulated_depreciation:
                 # Biarkan akun akumulasi penyusutan tetap di kredit - JANGAN DIUBAH
@@ -8874,12 +11306,12 @@ def get_post_closing_trial_balance(period=None):
         total_credit = sum(item['credit'] for item in post_closing_data)
         
         # Cari akun modal untuk logging
-        modal_accounts = [item for item in post_closing_data if 'modal' in item['account_name'].lower()]
+        modal_accounts = [item for item in post_closing_data if classification_of(item)['mentions_modal']]
         for modal in modal_accounts:
             logger.info(f"💰 Modal Usaha akhir: {modal['account_name']} = {format_currency(modal['credit'])}")
         
         # Cari akun akumulasi penyusutan untuk logging
-        dep_accounts = [item for item in post_closing_data if 'akumulasi' in item['account_name'].lower() and 'penyusutan' in item['account_name'].lower()]
+        dep_accounts = [item for item in post_closing_data if classification_of(item)['is_accumulated_depreciation']]
         for dep in dep_accounts:
             logger.info(f"🏗️ Akumulasi Penyusutan: {dep['account_name']} = {format_currency(dep['credit'])} (Kredit)")
         
@@ -8890,6 +11322,8 @@ def get_post_closing_trial_balance(period=None):
         
         return post_closing_data
         
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating POST-CLOSING trial balance: {e}")
         logger.error(traceback.format_exc())
@@ -8905,14 +11339,14 @@ def get_post_closing_summary(post_closing_data):
         # Cari nilai modal usaha
         modal_usaha = 0
         for item in post_closing_data:
-            if 'modal' in item['account_name'].lower() and 'usaha' in item['account_name'].lower():
+            if classification_of(item)['is_modal_usaha']:
                 modal_usaha = item['credit']  # Modal selalu di kredit
                 break
         
         # Cari akumulasi penyusutan
         akumulasi_penyusutan = []
         for item in post_closing_data:
-            if 'akumulasi' in item['account_name'].lower() and 'penyusutan' in item['account_name'].lower():
+            if classification_of(item)['is_accumulated_depreciation']:
                 akumulasi_penyusutan.append({
                     'account_name': item['account_name'],
                     'amount': item['credit']  # Akumulasi penyusutan selalu di kredit
@@ -8928,6 +11362,8 @@ def get_post_closing_summary(post_closing_data):
             'modal_usaha': modal_usaha,
             'akumulasi_penyusutan': akumulasi_penyusutan
         }
+    except TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"❌ Error calculating post-closing summary: {e}")
         return {
@@ -9257,7 +11693,7 @@ def neraca_saldo_setelah_penutup():
     </script>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id=user_id, user_role=user_role)
 
 # ============================================================
 # 👑 16. ADMIN PANEL
@@ -9268,8 +11704,9 @@ def neraca_saldo_setelah_penutup():
 def admin_users():
     """Halaman super admin untuk mengelola user"""
     try:
-        users = supabase.table("users").select("*").order("created_at", desc=True).execute()
-        users_data = users.data if users else []
+        users_data = list(fetch_all_rows(
+            lambda: order_by(supabase.table("users").select("*"), "created_at", "id", desc=True)
+        ))
     except Exception as e:
         logger.error(f"❌ Error fetching users: {e}")
         users_data = []
@@ -9332,7 +11769,7 @@ def admin_users():
     </div>
     """
     
-    return render_template_string(dashboard_html, content=content, user_email=user_email, user_name=user_name, user_id="Super Admin", user_role=user_role)
+    return render_template(dashboard_template, content=content, user_email=user_email, user_name=user_name, user_id="Super Admin", user_role=user_role)
 
 # ============================================================
 # 🔹 ADMIN UPDATE ROLE
@@ -9353,6 +11790,7 @@ def update_user_role():
         if user_data.data:
             user_email = user_data.data[0]['email']
             user_name = user_data.data[0]['name']
+            invalidate_user_role(user_email)
             
             email_body = f"""
             Halo {user_name},
@@ -9369,13 +11807,21 @@ def update_user_role():
             🌿 Tim Lelestari 🍃
             """
             
-            send_email(user_email, f"🌿 Update Akses Lelestari - Role {new_role.title()}", email_body)
+            queue_email(user_email, f"🌿 Update Akses Lelestari - Role {new_role.title()}", email_body)
     
     except Exception as e:
         logger.error(f"❌ Error update role: {e}")
     
     return redirect('/admin/users')
 
+@app.route("/admin/email_status")
+@super_admin_required
+def admin_email_status():
+    """Status pengiriman email terbaru dari antrian email (worker ini)"""
+    with _email_status_lock:
+        statuses = [dict(status) for status in reversed(email_delivery_status.values())]
+    return jsonify({"queued": _email_queue.qsize(), "deliveries": statuses})
+
 # ============================================================
 # 🔹 API ROUTES
 # ============================================================
@@ -9387,45 +11833,36 @@ def api_save_transaction():
     data = request.get_json()
     
     try:
-        transaction_date = data.get('transaction_date')
-        description = data.get('description')
-        total_amount = data.get('total_amount')
-        entries = data.get('entries', [])
-        
-        if not transaction_date or not description or not entries:
-            return jsonify({"success": False, "message": "Data transaksi tidak lengkap"})
-        
-        # Validasi balance
-        total_debit = sum([entry['amount'] for entry in entries if entry['position'] == 'debit'])
-        total_credit = sum([entry['amount'] for entry in entries if entry['position'] == 'kredit'])
+        journal, error = validate_journal_payload(data)
+        if error:
+            return jsonify({"success": False, "message": error})
         
-        if total_debit != total_credit:
-            return jsonify({"success": False, "message": "Total debit dan kredit tidak balance"})
+        transaction_date = journal['transaction_date']
+        description = journal['description']
+        total_amount = journal['total_amount']
+        entries = journal['entries']
         
         # Generate transaction number
         transaction_number = generate_invoice("JNL")
         
-        # Simpan header transaksi
+        # Kategori arus kas ditentukan sekali di sini, laporan arus kas tinggal menjumlahkan
+        cash_flow_category, cash_delta = classify_cash_flow(description, entries)
+        
+        # Header dan entries disimpan bersama (atomik lewat RPC post_journal jika tersedia)
         transaction_data = {
             "transaction_number": transaction_number,
             "transaction_date": transaction_date,
             "description": description,
             "total_amount": total_amount,
+            "cash_flow_category": cash_flow_category,
+            "cash_delta": cash_delta,
             "created_by": session.get('user_name', 'Admin'),
             "created_at": datetime.utcnow().isoformat()
         }
         
-        transaction_result = supabase.table("general_journals").insert(transaction_data).execute()
-        transaction_id = transaction_result.data[0]['id'] if transaction_result.data else None
-        
-        if not transaction_id:
-            return jsonify({"success": False, "message": "Gagal menyimpan header transaksi"})
-        
-        # Simpan detail entries
         journal_entries = []
         for entry in entries:
             journal_entry = {
-                "journal_id": transaction_id,
                 "account_code": entry['account_code'],
                 "position": entry['position'],
                 "amount": entry['amount'],
@@ -9434,10 +11871,14 @@ def api_save_transaction():
             }
             journal_entries.append(journal_entry)
         
-        # Simpan semua entries sekaligus
-        entries_result = supabase.table("journal_entries").insert(journal_entries).execute()
+        saved_journal = insert_journal_with_entries(
+            "post_journal", "general_journals", "journal_entries", "journal_id",
+            transaction_data, journal_entries
+        )
         
-        if entries_result.data:
+        if saved_journal:
+            invalidate_period_cache([period_of(transaction_date)])
+            apply_ledger_snapshot_delta(saved_journal['id'], transaction_date, journal_entries)
             logger.info(f"✅ Transaction saved: {transaction_number} with {len(entries)} entries")
             return jsonify({
                 "success": True, 
@@ -9445,14 +11886,52 @@ def api_save_transaction():
                 "transaction_number": transaction_number
             })
         else:
-            # Rollback: hapus header transaksi jika gagal simpan entries
-            supabase.table("general_journals").delete().eq("id", transaction_id).execute()
-            return jsonify({"success": False, "message": "Gagal menyimpan detail transaksi"})
+            return jsonify({"success": False, "message": "Gagal menyimpan transaksi"})
 
     except Exception as e:
         logger.error(f"❌ Error saving transaction: {e}")
         return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
 
+@app.route("/api/import_transactions", methods=["POST"])
+@admin_required
+def api_import_transactions():
+    """API import banyak transaksi jurnal sekaligus dari JSON array atau file CSV"""
+    try:
+        if 'file' in request.files:
+            journals = parse_journal_import_csv(request.files['file'].read().decode('utf-8'))
+        elif request.mimetype == 'text/csv':
+            journals = parse_journal_import_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            journals = data.get('journals') if isinstance(data, dict) else data
+        
+        if not isinstance(journals, list) or not journals:
+            return jsonify({"success": False, "message": "Data import kosong atau formatnya tidak dikenal"})
+        
+        if len(journals) > IMPORT_MAX_JOURNALS:
+            return jsonify({"success": False, "message": f"Maksimal {IMPORT_MAX_JOURNALS} transaksi per import"})
+        
+        results, orphaned_ids = import_journal_transactions(journals, session.get('user_name', 'Admin'))
+        imported = sum(1 for result in results if result['success'])
+        
+        response = {
+            "success": imported == len(results),
+            "message": f"{imported} dari {len(results)} transaksi berhasil diimport",
+            "imported": imported,
+            "failed": len(results) - imported,
+            "results": results
+        }
+        if orphaned_ids:
+            # Header dari batch gagal yang masih tersimpan tanpa entries lengkap, perlu dihapus manual
+            response["orphaned_journal_ids"] = orphaned_ids
+            response["message"] += f"; {len(orphaned_ids)} header transaksi gagal di-rollback"
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"❌ Error importing transactions: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
+
 @app.route("/api/delete_journal_transaction", methods=["POST"])
 @admin_required
 def api_delete_journal_transaction():
@@ -9592,6 +12071,137 @@ def api_delete_opening_balance():
         logger.error(f"❌ Error in api_delete_opening_balance: {e}")
         return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
 
+@app.route("/api/trial_balance_range")
+@admin_required
+def api_trial_balance_range():
+    """API neraca saldo untuk rentang tanggal (?start_date=&end_date=) atau tahun fiskal (?fiscal_year=YYYY)"""
+    try:
+        fiscal_year = request.args.get('fiscal_year')
+        if fiscal_year:
+            if not fiscal_year.isdigit():
+                return jsonify({"success": False, "message": "Tahun fiskal harus berupa angka"})
+            start_date, end_date = fiscal_year_range(int(fiscal_year))
+        else:
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            try:
+                datetime.strptime(start_date or '', '%Y-%m-%d')
+                datetime.strptime(end_date or '', '%Y-%m-%d')
+            except ValueError:
+                return jsonify({"success": False, "message": "start_date dan end_date harus berformat YYYY-MM-DD"})
+            if start_date > end_date:
+                return jsonify({"success": False, "message": "start_date harus sebelum end_date"})
+        
+        data = calculate_trial_balance_range(start_date, end_date)
+        
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        if fields:
+            data, unknown_fields = select_report_fields(data, fields)
+            if unknown_fields:
+                return jsonify({"success": False, "message": f"Field tidak dikenal: {', '.join(unknown_fields)}"})
+        
+        return jsonify({"success": True, "report": "trial_balance", "start_date": start_date, "end_date": end_date, "data": data})
+        
+    except Exception as e:
+        logger.error(f"❌ Error in api_trial_balance_range: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
+
+# Laporan yang bisa dibaca lewat /api/reports/<name>
+REPORT_API_SOURCES = {
+    "trial_balance": calculate_trial_balance,
+    "adjusted_trial_balance": get_adjusted_trial_balance,
+    "worksheet": get_worksheet_data,
+    "income_statement": get_income_statement_data,
+    "balance_sheet": get_balance_sheet_data,
+    "equity_statement": get_equity_statement_data,
+    "cash_flow": get_cash_flow_data,
+    "post_closing_trial_balance": get_post_closing_trial_balance,
+}
+
+def select_report_fields(data, fields):
+    """Ambil hanya field yang diminta dari data laporan
+    
+    Laporan berupa list difilter per baris; laporan berupa dict difilter per key,
+    dan "parent.child" memilih field di dalam list/dict bersarang (mis. income_accounts.account_code).
+    Mengembalikan (data, unknown_fields).
+    """
+    if isinstance(data, list):
+        selected, unknown = [], set()
+        for row in data:
+            row_data, row_unknown = select_report_fields(row, fields)
+            selected.append(row_data)
+            unknown.update(row_unknown)
+        return selected, sorted(unknown)
+    
+    if not isinstance(data, dict):
+        return data, []
+    
+    nested_fields = {}
+    for field in fields:
+        key, _, child = field.partition(".")
+        nested_fields.setdefault(key, [])
+        if child:
+            nested_fields[key].append(child)
+    
+    selected, unknown = {}, []
+    for key, children in nested_fields.items():
+        if key not in data:
+            unknown.append(key)
+        elif children:
+            selected[key], child_unknown = select_report_fields(data[key], children)
+            unknown.extend(f"{key}.{child}" for child in child_unknown)
+        else:
+            selected[key] = data[key]
+    return selected, unknown
+
+@app.route("/api/reports/<name>")
+@admin_required
+def api_report(name):
+    """API read-only untuk data laporan keuangan dalam bentuk JSON (?period=YYYY-MM&fields=a,b.c)"""
+    source = REPORT_API_SOURCES.get(name)
+    if not source:
+        return jsonify({"success": False, "message": f"Laporan '{name}' tidak dikenal", "available_reports": sorted(REPORT_API_SOURCES)})
+    
+    # Mode komparatif: ?start_period=&end_period= untuk laporan yang mendukung kolom per bulan
+    start_period = request.args.get('start_period')
+    end_period = request.args.get('end_period')
+    if start_period or end_period:
+        if name not in COMPARATIVE_REPORTS:
+            return jsonify({"success": False, "message": f"Laporan '{name}' tidak mendukung mode komparatif"})
+        error = validate_period_range(start_period, end_period)
+        if error:
+            return jsonify({"success": False, "message": error})
+        try:
+            data = COMPARATIVE_REPORTS[name][1](start_period, end_period)
+            return jsonify({"success": True, "report": name, "start_period": start_period, "end_period": end_period, "data": data})
+        except Exception as e:
+            logger.error(f"❌ Error in comparative api_report {name}: {e}")
+            logger.error(traceback.format_exc())
+            return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
+    
+    period = request.args.get('period') or current_period()
+    try:
+        datetime.strptime(period, '%Y-%m')
+    except ValueError:
+        return jsonify({"success": False, "message": "Format periode harus YYYY-MM"})
+    
+    try:
+        data = source(period)
+        
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        if fields:
+            data, unknown_fields = select_report_fields(data, fields)
+            if unknown_fields:
+                return jsonify({"success": False, "message": f"Field tidak dikenal: {', '.join(unknown_fields)}"})
+        
+        return jsonify({"success": True, "report": name, "period": period, "data": data})
+        
+    except Exception as e:
+        logger.error(f"❌ Error in api_report {name}: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"success": False, "message": f"Terjadi kesalahan sistem: {str(e)}"})
+
 # ============================================================
 # 🔹 INISIALISASI SISTEM
 # ============================================================
@@ -0,0 +1,26 @@
+-- Total debit dan kredit jurnal umum per akun untuk rentang tanggal.
+-- Dipanggil dari coba.py lewat supabase.rpc("trial_balance_totals", ...).
+create or replace function public.trial_balance_totals(
+    p_start_date date default null,
+    p_end_date date default null
+)
+returns table (account_code text, total_debit numeric, total_credit numeric)
+language sql
+stable
+as $$
+    select
+        je.account_code::text,
+        coalesce(sum(je.amount) filter (where je.position = 'debit'), 0)::numeric as total_debit,
+        coalesce(sum(je.amount) filter (where je.position = 'kredit'), 0)::numeric as total_credit
+    from public.journal_entries je
+    join public.general_journals gj on gj.id = je.journal_id
+    where (p_start_date is null or gj.transaction_date >= p_start_date)
+      and (p_end_date is null or gj.transaction_date <= p_end_date)
+    group by je.account_code
+$$;
+
+create index if not exists general_journals_transaction_date_idx
+    on public.general_journals (transaction_date);
+
+create index if not exists journal_entries_journal_id_idx
+    on public.journal_entries (journal_id);
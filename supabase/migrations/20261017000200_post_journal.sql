@@ -0,0 +1,79 @@
+-- Posting jurnal umum dan jurnal penyesuaian secara atomik: header + entries dalam satu transaksi.
+-- Dipanggil dari coba.py lewat supabase.rpc("post_journal" / "post_adjusting_journal",
+-- {"p_header": {...}, "p_entries": [...]}). Mengembalikan baris header yang tersimpan.
+
+create or replace function public.check_journal_entries(p_entries jsonb)
+returns void
+language plpgsql
+immutable
+as $$
+declare
+    v_debit numeric;
+    v_credit numeric;
+begin
+    if p_entries is null or jsonb_typeof(p_entries) <> 'array' or jsonb_array_length(p_entries) = 0 then
+        raise exception 'Entries jurnal kosong';
+    end if;
+
+    if exists (
+        select 1 from jsonb_array_elements(p_entries) e
+        where e->>'position' not in ('debit', 'kredit') or (e->>'amount')::numeric <= 0
+    ) then
+        raise exception 'Posisi harus debit/kredit dan nominal harus lebih dari 0';
+    end if;
+
+    select
+        coalesce(sum((e->>'amount')::numeric) filter (where e->>'position' = 'debit'), 0),
+        coalesce(sum((e->>'amount')::numeric) filter (where e->>'position' = 'kredit'), 0)
+    into v_debit, v_credit
+    from jsonb_array_elements(p_entries) e;
+
+    if round(v_debit, 2) <> round(v_credit, 2) then
+        raise exception 'Total debit (%) dan kredit (%) tidak balance', v_debit, v_credit;
+    end if;
+end;
+$$;
+
+create or replace function public.post_journal(p_header jsonb, p_entries jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_journal public.general_journals;
+begin
+    perform public.check_journal_entries(p_entries);
+
+    insert into public.general_journals (transaction_number, transaction_date, description, total_amount, created_by, created_at)
+    select h.transaction_number, h.transaction_date, h.description, h.total_amount, h.created_by, h.created_at
+    from jsonb_populate_record(null::public.general_journals, p_header) h
+    returning * into v_journal;
+
+    insert into public.journal_entries (journal_id, account_code, position, amount, note, created_at)
+    select v_journal.id, e.account_code, e.position, e.amount, e.note, e.created_at
+    from jsonb_populate_recordset(null::public.journal_entries, p_entries) e;
+
+    return to_jsonb(v_journal);
+end;
+$$;
+
+create or replace function public.post_adjusting_journal(p_header jsonb, p_entries jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_journal public.adjusting_journals;
+begin
+    perform public.check_journal_entries(p_entries);
+
+    insert into public.adjusting_journals (adjustment_number, adjustment_date, description, total_amount, period, created_by, created_at)
+    select h.adjustment_number, h.adjustment_date, h.description, h.total_amount, h.period, h.created_by, h.created_at
+    from jsonb_populate_record(null::public.adjusting_journals, p_header) h
+    returning * into v_journal;
+
+    insert into public.adjusting_journal_entries (adjusting_journal_id, account_code, position, amount, note, created_at)
+    select v_journal.id, e.account_code, e.position, e.amount, e.note, e.created_at
+    from jsonb_populate_recordset(null::public.adjusting_journal_entries, p_entries) e;
+
+    return to_jsonb(v_journal);
+end;
+$$;
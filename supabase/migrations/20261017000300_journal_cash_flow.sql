@@ -0,0 +1,34 @@
+-- Kategori arus kas dan perubahan kas per jurnal umum, diisi saat jurnal disimpan (coba.py
+-- classify_cash_flow). Baris lama diisi dengan `flask backfill-cash-flow`; selama belum terisi,
+-- laporan arus kas mengklasifikasikannya saat dibaca.
+
+alter table public.general_journals
+    add column if not exists cash_flow_category text,
+    add column if not exists cash_delta numeric;
+
+create index if not exists general_journals_date_cash_flow_idx
+    on public.general_journals (transaction_date, cash_flow_category);
+
+create or replace function public.post_journal(p_header jsonb, p_entries jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_journal public.general_journals;
+begin
+    perform public.check_journal_entries(p_entries);
+
+    insert into public.general_journals (transaction_number, transaction_date, description, total_amount,
+                                         cash_flow_category, cash_delta, created_by, created_at)
+    select h.transaction_number, h.transaction_date, h.description, h.total_amount,
+           h.cash_flow_category, h.cash_delta, h.created_by, h.created_at
+    from jsonb_populate_record(null::public.general_journals, p_header) h
+    returning * into v_journal;
+
+    insert into public.journal_entries (journal_id, account_code, position, amount, note, created_at)
+    select v_journal.id, e.account_code, e.position, e.amount, e.note, e.created_at
+    from jsonb_populate_recordset(null::public.journal_entries, p_entries) e;
+
+    return to_jsonb(v_journal);
+end;
+$$;
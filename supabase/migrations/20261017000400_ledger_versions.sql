@@ -0,0 +1,29 @@
+-- Versi ledger per periode (YYYY-MM, '*' = semua periode), dipakai bersama oleh semua instance
+-- aplikasi untuk invalidasi cache saldo dan ETag laporan (coba.py bump_ledger_version /
+-- get_ledger_versions). updated_at disimpan sebagai epoch detik seperti cache SQLite lokal.
+
+create sequence if not exists public.ledger_version_seq;
+
+create table if not exists public.ledger_versions (
+    period text primary key,
+    version bigint not null,
+    updated_at double precision not null default extract(epoch from now())
+);
+
+-- Satu nomor versi baru untuk semua periode yang terdampak satu penulisan
+create or replace function public.bump_ledger_version(p_periods text[])
+returns bigint
+language plpgsql
+as $$
+declare
+    v_version bigint := nextval('public.ledger_version_seq');
+begin
+    insert into public.ledger_versions (period, version, updated_at)
+    select distinct p, v_version, extract(epoch from clock_timestamp())
+    from unnest(p_periods) as p
+    on conflict (period) do update
+        set version = excluded.version,
+            updated_at = excluded.updated_at;
+    return v_version;
+end;
+$$;
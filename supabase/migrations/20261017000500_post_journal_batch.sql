@@ -0,0 +1,23 @@
+-- Posting satu batch jurnal umum hasil import dalam satu transaksi: jika satu jurnal gagal, seluruh batch batal.
+-- Dipanggil dari coba.py lewat supabase.rpc("post_journal_batch",
+-- {"p_journals": [{"header": {...}, "entries": [...]}, ...]}). Mengembalikan array baris header yang tersimpan.
+
+create or replace function public.post_journal_batch(p_journals jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_journal jsonb;
+    v_saved jsonb := '[]'::jsonb;
+begin
+    if p_journals is null or jsonb_typeof(p_journals) <> 'array' or jsonb_array_length(p_journals) = 0 then
+        raise exception 'Batch jurnal kosong';
+    end if;
+
+    for v_journal in select value from jsonb_array_elements(p_journals) loop
+        v_saved := v_saved || jsonb_build_array(public.post_journal(v_journal->'header', v_journal->'entries'));
+    end loop;
+
+    return v_saved;
+end;
+$$;
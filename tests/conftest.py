@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# coba.py membuat client Supabase saat import; test memakai FakeSupabase, koneksi tidak dibuka
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test.local.key")
+os.environ["BALANCE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="lelestari-test-"), "balances.sqlite3")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import coba
+from fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """FakeSupabase kosong yang dipasang sebagai coba.supabase"""
+    db = FakeSupabase()
+    monkeypatch.setattr(coba, "supabase", db)
+    coba.invalidate_chart_of_accounts_cache()
+    coba.invalidate_period_cache()
+    coba.invalidate_ledger_versions_cache()
+    # Jalur RPC/tabel opsional yang dinonaktifkan sebelumnya (termasuk oleh invalidasi di atas) dicoba lagi
+    monkeypatch.setattr(coba, "_shared_ledger_versions_retry_at", 0.0)
+    monkeypatch.setattr(coba, "_trial_balance_rpc_retry_at", 0.0)
+    monkeypatch.setattr(coba, "_posting_rpc_retry_at", 0.0)
+    yield db
+    coba.invalidate_chart_of_accounts_cache()
+
+
+@pytest.fixture
+def admin_client(fake_db):
+    """Test client Flask yang sudah login sebagai super admin"""
+    fake_db.tables['users'] = [{'id': 1, 'email': 'admin@test.local', 'name': 'Admin', 'role': 'super_admin'}]
+    coba.invalidate_user_role('admin@test.local')
+    client = coba.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['user_email'] = 'admin@test.local'
+        session['user_name'] = 'Admin'
+        session['user_id'] = 1
+        session['user_role'] = 'super_admin'
+    yield client
+    coba.invalidate_user_role('admin@test.local')
@@ -0,0 +1,217 @@
+"""Client Supabase palsu di memori untuk test: meniru query builder postgrest-py 0.11 yang dipakai coba.py.
+
+Perilaku server yang ditiru:
+- max_rows: batas baris per respons seperti `max-rows` PostgREST (None = tanpa batas)
+- .range(start, end): akhir eksklusif seperti postgrest-py 0.11 (Range: start-(end-1))
+- .order(): nilai dipakai apa adanya sebagai satu parameter `order=kolom[.desc],...`
+- rpc yang tidak terdaftar gagal dengan kode PGRST202
+- fail_on: nama tabel atau (tabel, operasi) yang query-nya gagal seperti APIError
+"""
+import itertools
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeAPIError(Exception):
+    """Meniru postgrest APIError: argumen pertama dict berisi code/message"""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.code = error.get('code')
+        self.message = error.get('message')
+
+
+def _split_top_level(expr):
+    parts, depth, current = [], 0, ''
+    for char in expr:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _parse_predicate(expr):
+    if expr.startswith('and('):
+        predicates = [_parse_predicate(part) for part in _split_top_level(expr[4:-1])]
+        return lambda row: all(predicate(row) for predicate in predicates)
+    column, op, raw = expr.split('.', 2)
+    compare = {
+        'eq': lambda a, b: a == b, 'gt': lambda a, b: a > b, 'lt': lambda a, b: a < b,
+        'gte': lambda a, b: a >= b, 'lte': lambda a, b: a <= b,
+    }[op]
+
+    def predicate(row):
+        value = row.get(column)
+        if value is None:
+            return False
+        return compare(value, raw if isinstance(value, str) else type(value)(raw))
+    return predicate
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.order_params = []
+        self.limit_value = None
+        self.range_value = None
+        self.op = 'select'
+        self.payload = None
+        self.count = None
+
+    def select(self, columns='*', count=None):
+        self.count = count
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None):
+        self.op, self.payload = 'upsert', payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    def _filter(self, predicate):
+        self.filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column, value):
+        return self._filter(lambda row: row.get(column) is None if value == 'null' else row.get(column) == value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) <= value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def or_(self, expr):
+        predicates = [_parse_predicate(part) for part in _split_top_level(expr)]
+        return self._filter(lambda row: any(predicate(row) for predicate in predicates))
+
+    def order(self, column, desc=False):
+        self.order_params.append(f"{column}{'.desc' if desc else ''}")
+        return self
+
+    def limit(self, size):
+        self.limit_value = size
+        return self
+
+    def range(self, start, end):
+        self.range_value = (start, end)
+        return self
+
+    def _sorted(self, rows):
+        # PostgREST memakai satu parameter order; di sini yang terakhir menang
+        if not self.order_params:
+            return rows
+        for clause in reversed(self.order_params[-1].split(',')):
+            column, _, direction = clause.partition('.')
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction == 'desc')
+        return rows
+
+    def execute(self):
+        self.db.calls.append((self.table, self.op))
+        if self.table in self.db.fail_on or (self.table, self.op) in self.db.fail_on:
+            raise FakeAPIError({'code': '500', 'message': f'{self.table} {self.op} gagal'})
+        rows = self.db.tables.setdefault(self.table, [])
+
+        if self.op in ('insert', 'upsert'):
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for item in items:
+                item = dict(item)
+                existing = next((row for row in rows if 'id' in item and row.get('id') == item['id']), None)
+                if existing is not None and self.op == 'upsert':
+                    existing.update(item)
+                else:
+                    item.setdefault('id', next(self.db.ids))
+                    rows.append(item)
+                inserted.append(dict(item))
+            return FakeResponse(inserted)
+
+        selected = [row for row in rows if all(predicate(row) for predicate in self.filters)]
+        if self.op == 'delete':
+            for row in selected:
+                rows.remove(row)
+            return FakeResponse([dict(row) for row in selected])
+        if self.op == 'update':
+            for row in selected:
+                row.update(self.payload)
+            return FakeResponse([dict(row) for row in selected])
+
+        selected = self._sorted(selected)
+        total = len(selected)
+        if self.range_value:
+            start, end = self.range_value
+            selected = selected[start:end]
+        if self.limit_value is not None:
+            selected = selected[:self.limit_value]
+        if self.db.max_rows is not None:
+            selected = selected[:self.db.max_rows]
+        return FakeResponse([dict(row) for row in selected], total if self.count else None)
+
+
+class FakeRPC:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.db.calls.append(('rpc', self.name))
+        handler = self.db.rpcs.get(self.name)
+        if handler is None:
+            raise FakeAPIError({'code': 'PGRST202', 'message': f'Could not find the function public.{self.name}'})
+        return FakeResponse(handler(self.db, **self.params))
+
+
+class FakeSupabase:
+    def __init__(self, max_rows=None):
+        self.tables = {}
+        self.ids = itertools.count(1)
+        self.calls = []
+        self.rpcs = {}
+        self.fail_on = set()
+        self.max_rows = max_rows
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeRPC(self, name, params)
@@ -0,0 +1,200 @@
+"""Pengganti SQLite untuk fungsi posting di supabase/migrations: check_journal_entries, post_journal,
+post_adjusting_journal, dan post_journal_batch.
+
+Tiap fungsi plpgsql ditulis ulang sebagai SQL SQLite dengan urutan statement yang sama, dijalankan dalam
+satu transaksi seperti pemanggilan fungsi Postgres lewat RPC:
+- jsonb_array_elements(p) -> json_each(p), e->>'kolom' -> json_extract(e.value, '$.kolom')
+- jsonb_populate_record(set) -> json_extract per kolom (kolom yang tidak ada menjadi NULL)
+- `raise exception` -> FakeAPIError kode P0001; pelanggaran constraint -> kode SQLSTATE yang sesuai
+Error apa pun membatalkan seluruh transaksi, jadi header tidak pernah tersimpan tanpa entries.
+
+Kolom insert dicek terhadap definisi terakhir di file migrasi oleh test, agar pengganti ini tidak
+tertinggal saat migrasi berubah.
+"""
+import glob
+import json
+import os
+import re
+import sqlite3
+
+from fake_supabase import FakeAPIError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "supabase", "migrations")
+
+SCHEMA = """
+    CREATE TABLE general_journals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_number TEXT NOT NULL UNIQUE,
+        transaction_date TEXT NOT NULL,
+        description TEXT,
+        total_amount NUMERIC,
+        cash_flow_category TEXT,
+        cash_delta NUMERIC,
+        created_by TEXT,
+        created_at TEXT
+    );
+    CREATE TABLE journal_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        journal_id INTEGER NOT NULL REFERENCES general_journals (id),
+        account_code TEXT NOT NULL,
+        position TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        note TEXT,
+        created_at TEXT
+    );
+    CREATE TABLE adjusting_journals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        adjustment_number TEXT NOT NULL UNIQUE,
+        adjustment_date TEXT NOT NULL,
+        description TEXT,
+        total_amount NUMERIC,
+        period TEXT,
+        created_by TEXT,
+        created_at TEXT
+    );
+    CREATE TABLE adjusting_journal_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        adjusting_journal_id INTEGER NOT NULL REFERENCES adjusting_journals (id),
+        account_code TEXT NOT NULL,
+        position TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        note TEXT,
+        created_at TEXT
+    );
+"""
+
+# check_journal_entries(p_entries)
+ENTRIES_NOT_ARRAY = """
+    SELECT :entries IS NULL OR json_type(:entries) <> 'array' OR json_array_length(:entries) = 0
+"""
+INVALID_ENTRY_EXISTS = """
+    SELECT EXISTS (
+        SELECT 1 FROM json_each(:entries) e
+        WHERE json_extract(e.value, '$.position') NOT IN ('debit', 'kredit')
+           OR CAST(json_extract(e.value, '$.amount') AS NUMERIC) <= 0
+    )
+"""
+ENTRY_TOTALS = """
+    SELECT
+        COALESCE(SUM(CAST(json_extract(e.value, '$.amount') AS NUMERIC)) FILTER (WHERE json_extract(e.value, '$.position') = 'debit'), 0),
+        COALESCE(SUM(CAST(json_extract(e.value, '$.amount') AS NUMERIC)) FILTER (WHERE json_extract(e.value, '$.position') = 'kredit'), 0)
+    FROM json_each(:entries) e
+"""
+
+# post_journal / post_adjusting_journal: (tabel header, kolom header, tabel entries, foreign key, kolom entries)
+POSTING_FUNCTIONS = {
+    'post_journal': (
+        'general_journals',
+        ('transaction_number', 'transaction_date', 'description', 'total_amount',
+         'cash_flow_category', 'cash_delta', 'created_by', 'created_at'),
+        'journal_entries', 'journal_id',
+        ('account_code', 'position', 'amount', 'note', 'created_at'),
+    ),
+    'post_adjusting_journal': (
+        'adjusting_journals',
+        ('adjustment_number', 'adjustment_date', 'description', 'total_amount', 'period', 'created_by', 'created_at'),
+        'adjusting_journal_entries', 'adjusting_journal_id',
+        ('account_code', 'position', 'amount', 'note', 'created_at'),
+    ),
+}
+
+# Kode SQLSTATE Postgres untuk pelanggaran constraint yang setara
+CONSTRAINT_CODES = (('NOT NULL', '23502'), ('UNIQUE', '23505'), ('FOREIGN KEY', '23503'))
+
+
+def insert_header_sql(table, columns):
+    values = ", ".join(f"json_extract(:header, '$.{column}')" for column in columns)
+    return f"INSERT INTO {table} ({', '.join(columns)}) SELECT {values} RETURNING *"
+
+
+def insert_entries_sql(table, foreign_key, columns):
+    values = ", ".join(f"json_extract(e.value, '$.{column}')" for column in columns)
+    return f"INSERT INTO {table} ({foreign_key}, {', '.join(columns)}) SELECT :journal_id, {values} FROM json_each(:entries) e"
+
+
+def migration_insert_columns(function_name):
+    """Kolom tiap `insert into public.<tabel> (...)` di definisi terakhir sebuah fungsi pada file migrasi"""
+    body = None
+    pattern = re.compile(
+        rf"create or replace function public\.{function_name}\(.*?\$\$(.*?)\$\$", re.DOTALL | re.IGNORECASE
+    )
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        with open(path, encoding="utf-8") as handle:
+            for match in pattern.finditer(handle.read()):
+                body = match.group(1)
+    if body is None:
+        return None
+    return {
+        table: tuple(column.strip() for column in columns.split(","))
+        for table, columns in re.findall(r"insert into public\.(\w+)\s*\(([^)]*)\)", body, re.IGNORECASE)
+    }
+
+
+class SqlitePosting:
+    """Database SQLite di memori dengan fungsi posting yang bisa dipasang sebagai rpc FakeSupabase"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def rows(self, table):
+        return [dict(row) for row in self.conn.execute(f"SELECT * FROM {table} ORDER BY id")]
+
+    def check_journal_entries(self, entries):
+        params = {'entries': entries}
+        if self.conn.execute(ENTRIES_NOT_ARRAY, params).fetchone()[0]:
+            raise FakeAPIError({'code': 'P0001', 'message': 'Entries jurnal kosong'})
+        if self.conn.execute(INVALID_ENTRY_EXISTS, params).fetchone()[0]:
+            raise FakeAPIError({'code': 'P0001', 'message': 'Posisi harus debit/kredit dan nominal harus lebih dari 0'})
+        debit, credit = self.conn.execute(ENTRY_TOTALS, params).fetchone()
+        if round(debit, 2) != round(credit, 2):
+            raise FakeAPIError({'code': 'P0001', 'message': f'Total debit ({debit}) dan kredit ({credit}) tidak balance'})
+
+    def post(self, function_name, p_header, p_entries):
+        """Isi fungsi posting tanpa kontrol transaksi (dipakai call dan call_batch)"""
+        header_table, header_columns, entries_table, foreign_key, entry_columns = POSTING_FUNCTIONS[function_name]
+        header, entries = json.dumps(p_header), json.dumps(p_entries)
+        self.check_journal_entries(entries)
+        journal = dict(self.conn.execute(insert_header_sql(header_table, header_columns), {'header': header}).fetchone())
+        self.conn.execute(
+            insert_entries_sql(entries_table, foreign_key, entry_columns),
+            {'journal_id': journal['id'], 'entries': entries}
+        )
+        return journal
+
+    def transaction(self, body):
+        """Jalankan body() dalam satu transaksi; error membatalkan semua insert"""
+        self.conn.execute("BEGIN")
+        try:
+            result = body()
+        except sqlite3.IntegrityError as e:
+            self.conn.execute("ROLLBACK")
+            code = next((code for constraint, code in CONSTRAINT_CODES if constraint in str(e)), '23000')
+            raise FakeAPIError({'code': code, 'message': str(e)})
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return result
+
+    def call(self, function_name, p_header, p_entries):
+        """Satu pemanggilan post_journal / post_adjusting_journal"""
+        return self.transaction(lambda: self.post(function_name, p_header, p_entries))
+
+    def call_batch(self, p_journals):
+        """post_journal_batch: post_journal untuk tiap jurnal dalam satu transaksi"""
+        if not isinstance(p_journals, list) or not p_journals:
+            raise FakeAPIError({'code': 'P0001', 'message': 'Batch jurnal kosong'})
+        return self.transaction(lambda: [
+            self.post('post_journal', journal.get('header'), journal.get('entries')) for journal in p_journals
+        ])
+
+    def install(self, db):
+        """Daftarkan fungsi posting sebagai rpc di FakeSupabase"""
+        for function_name in POSTING_FUNCTIONS:
+            db.rpcs[function_name] = (
+                lambda _db, p_header, p_entries, function_name=function_name: self.call(function_name, p_header, p_entries)
+            )
+        db.rpcs['post_journal_batch'] = lambda _db, p_journals: self.call_batch(p_journals)
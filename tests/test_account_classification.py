@@ -0,0 +1,110 @@
+import pytest
+
+import coba
+
+PERIOD = "2026-09"
+CHART = [
+    ('1-1100', 'Kas', 'Aktiva Lancar'),
+    ('1-1300', 'Persediaan Lele', 'Aktiva Lancar'),
+    ('1-2100', 'Peralatan', 'Aktiva Tetap'),
+    ('1-2200', 'Akumulasi Penyusutan Peralatan', 'Aktiva Tetap'),
+    ('2-1100', 'Utang Usaha', 'Kewajiban'),
+    ('3-1100', 'Modal Usaha', 'Modal'),
+    ('3-1200', 'Prive Pemilik', 'Modal'),
+    ('4-1100', 'Penjualan Lele', 'Pendapatan'),
+    ('5-1100', 'Harga Pokok Penjualan', 'Harga Pokok Penjualan'),
+    ('6-1100', 'Beban Gaji', 'Beban'),
+    ('6-1200', 'Beban Penyusutan Peralatan', 'Beban'),
+]
+OPENING_BALANCES = [
+    ('1-1100', 'debit', 20000), ('1-1300', 'debit', 5000), ('1-2100', 'debit', 12000),
+    ('1-2200', 'kredit', 2000), ('2-1100', 'kredit', 5000), ('3-1100', 'kredit', 30000),
+]
+JOURNALS = [
+    ("2026-09-02", "1-1100", "4-1100", 9000),
+    ("2026-09-02", "5-1100", "1-1300", 3000),
+    ("2026-09-10", "6-1100", "1-1100", 1500),
+    ("2026-09-15", "3-1200", "1-1100", 500),
+    ("2026-09-20", "2-1100", "1-1100", 1000),
+    # Akun di luar COA: klasifikasi dari kombinasi sintetis, bukan dari index
+    ("2026-09-25", "9-9999", "1-1100", 200),
+]
+ADJUSTMENTS = [("6-1200", "1-2200", 400)]
+
+
+@pytest.fixture
+def ledger_db(fake_db):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': code, 'account_name': name, 'account_type': account_type} for code, name, account_type in CHART
+    ]
+    fake_db.tables['opening_balances'] = [
+        {'id': i, 'account_code': code, 'position': position, 'amount': amount}
+        for i, (code, position, amount) in enumerate(OPENING_BALANCES, 1)
+    ]
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    for journal_id, (date, debit_code, credit_code, amount) in enumerate(JOURNALS, 1):
+        fake_db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date,
+            'description': 'x', 'total_amount': amount,
+        })
+        fake_db.tables['journal_entries'].extend([
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ])
+    fake_db.tables['adjusting_journals'] = []
+    fake_db.tables['adjusting_journal_entries'] = []
+    for journal_id, (debit_code, credit_code, amount) in enumerate(ADJUSTMENTS, 1):
+        fake_db.tables['adjusting_journals'].append({
+            'id': journal_id, 'adjustment_number': f"ADJ-{journal_id}", 'adjustment_date': "2026-09-30",
+            'description': 'Penyusutan', 'total_amount': amount, 'period': PERIOD,
+        })
+        fake_db.tables['adjusting_journal_entries'].extend([
+            {'id': journal_id * 10, 'adjusting_journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'adjusting_journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ])
+    return fake_db
+
+
+def build_reports():
+    coba.invalidate_period_cache()
+    with coba.app.test_request_context("/"):
+        return {
+            'income_statement': coba.get_income_statement_data(PERIOD),
+            'balance_sheet': coba.get_balance_sheet_data(PERIOD),
+            'post_closing': coba.get_post_closing_trial_balance(PERIOD),
+        }
+
+
+def test_index_reports_match_direct_classification(ledger_db, monkeypatch):
+    indexed = build_reports()
+
+    # Sebelum index: setiap baris laporan diklasifikasikan langsung dari kode, nama, dan tipe
+    def classify_directly(account_code, account_name=None, account_type=None):
+        if account_name is None:
+            account = coba.get_chart_of_accounts_cache()['by_code'].get(account_code)
+            account_name = account['account_name'] if account else account_code
+            account_type = account['account_type'] if account else None
+        return coba.classify_account(account_code, account_name, account_type)
+
+    monkeypatch.setattr(coba, "get_account_classification", classify_directly)
+    assert build_reports() == indexed
+
+    income = indexed['income_statement']
+    assert income['total_pendapatan'] == 9000
+    assert income['total_hpp'] == 3000
+    balance_codes = {item['account_code'] for item in indexed['post_closing']}
+    assert {'1-2200', '3-1100'} <= balance_codes
+    depreciation = next(item for item in indexed['post_closing'] if item['account_code'] == '1-2200')
+    assert (depreciation['debit'], depreciation['credit']) == (0, 2400)
+
+
+def test_lookups_outside_the_chart_do_not_grow_the_index(ledger_db):
+    index = coba.get_account_classification_index()
+    size = len(index['by_key'])
+
+    synthetic = coba.get_account_classification('3-9999', 'Prive Tambahan', 'Modal')
+    assert synthetic['is_prive'] and synthetic['is_equity']
+    assert coba.get_account_classification('1-2200')['is_contra_asset']
+    assert coba.get_account_classification('5-1100')['is_cogs']
+    assert len(coba.get_account_classification_index()['by_key']) == size == len(CHART)
@@ -0,0 +1,155 @@
+import pytest
+
+import coba
+
+
+def add_journal(db, journal_id, date, debit_code, credit_code, amount):
+    db.tables.setdefault('general_journals', []).append(
+        {'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date, 'description': 'x', 'total_amount': amount}
+    )
+    db.tables.setdefault('journal_entries', []).extend([
+        {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+        {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+    ])
+
+
+def test_monthly_totals_scan_is_cached(fake_db):
+    add_journal(fake_db, 1, "2026-08-05", "1-1100", "4-1100", 1000)
+    add_journal(fake_db, 2, "2026-09-05", "1-1100", "4-1100", 500)
+    totals = coba.get_monthly_account_totals(["2026-08", "2026-09"])
+    assert totals["2026-08"] == {"1-1100": (1000, 0), "4-1100": (0, 1000)}
+    assert coba.read_period_cache("account_totals", "2026-09") == {"1-1100": [500, 0], "4-1100": [0, 500]}
+
+
+def test_monthly_totals_scan_error_propagates_and_is_not_cached(fake_db):
+    add_journal(fake_db, 1, "2026-08-05", "1-1100", "4-1100", 1000)
+    fake_db.fail_on.add('journal_entries')
+    with pytest.raises(Exception):
+        coba.get_monthly_account_totals(["2026-08"])
+    assert coba.read_period_cache("account_totals", "2026-08") is None
+
+    # Setelah Supabase pulih, total dihitung ulang dengan benar
+    fake_db.fail_on.clear()
+    assert coba.get_monthly_account_totals(["2026-08"])["2026-08"] == {"1-1100": (1000, 0), "4-1100": (0, 1000)}
+
+
+RANGE_CHART = [
+    {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar'},
+    {'account_code': '3-1100', 'account_name': 'Modal', 'account_type': 'Modal'},
+    {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan'},
+    {'account_code': '6-1100', 'account_name': 'Beban Listrik', 'account_type': 'Beban'},
+]
+# Jurnal di tepi rentang: hari sebelum/sesudah tidak boleh ikut, hari pertama/terakhir harus ikut
+RANGE_JOURNALS = [
+    ("2026-06-30", "1-1100", "4-1100", 1),
+    ("2026-07-01", "1-1100", "4-1100", 10),
+    ("2026-07-14", "1-1100", "4-1100", 100),
+    ("2026-07-15", "1-1100", "4-1100", 1000),
+    ("2026-07-31", "6-1100", "1-1100", 20),
+    ("2026-08-01", "1-1100", "4-1100", 2000),
+    ("2026-08-31", "6-1100", "1-1100", 30),
+    ("2026-09-10", "1-1100", "4-1100", 3000),
+    ("2026-09-11", "1-1100", "4-1100", 40000),
+    ("2026-12-31", "6-1100", "1-1100", 50),
+    ("2027-01-01", "1-1100", "4-1100", 600),
+    ("2027-06-30", "6-1100", "1-1100", 70),
+    ("2027-07-01", "1-1100", "4-1100", 800000),
+]
+
+
+@pytest.fixture
+def range_db(fake_db):
+    fake_db.tables['chart_of_accounts'] = [dict(account) for account in RANGE_CHART]
+    fake_db.tables['opening_balances'] = [
+        {'id': 1, 'account_code': '1-1100', 'position': 'debit', 'amount': 5000},
+        {'id': 2, 'account_code': '3-1100', 'position': 'kredit', 'amount': 5000},
+    ]
+    for journal_id, (date, debit_code, credit_code, amount) in enumerate(RANGE_JOURNALS, 1):
+        add_journal(fake_db, journal_id, date, debit_code, credit_code, amount)
+    return fake_db
+
+
+def expected_totals(db, start_date, end_date):
+    dates = {journal['id']: journal['transaction_date'] for journal in db.tables['general_journals']}
+    totals = {}
+    for entry in db.tables['journal_entries']:
+        if start_date <= dates[entry['journal_id']] <= end_date:
+            debit, credit = totals.get(entry['account_code'], (0, 0))
+            if entry['position'] == 'debit':
+                totals[entry['account_code']] = (debit + entry['amount'], credit)
+            else:
+                totals[entry['account_code']] = (debit, credit + entry['amount'])
+    return totals
+
+
+def calculate_range(start_date, end_date):
+    with coba.app.test_request_context("/"):
+        return coba.calculate_trial_balance_range(start_date, end_date)
+
+
+def test_mid_month_range_splits_into_full_and_partial_months():
+    assert coba.split_date_range_by_month("2026-07-15", "2026-09-10") == (
+        ["2026-08"], [("2026-07-15", "2026-07-31"), ("2026-09-01", "2026-09-10")]
+    )
+    assert coba.split_date_range_by_month("2026-07-01", "2026-08-31") == (["2026-07", "2026-08"], [])
+    assert coba.split_date_range_by_month("2026-07-05", "2026-07-20") == ([], [("2026-07-05", "2026-07-20")])
+
+
+def test_mid_month_range_sums_full_and_partial_months(range_db):
+    totals = coba.get_account_totals_between("2026-07-15", "2026-09-10")
+    assert totals == expected_totals(range_db, "2026-07-15", "2026-09-10")
+    assert totals['4-1100'] == (0, 1000 + 2000 + 3000)
+    assert totals['6-1100'] == (20 + 30, 0)
+    # Bulan penuh di tengah masuk cache; potongan bulan di tepi tidak
+    assert coba.read_period_cache("account_totals", "2026-08") is not None
+    assert coba.read_period_cache("account_totals", "2026-07") is None
+
+    # Rentang kedua memakai bulan Agustus dari cache dan tetap benar
+    assert coba.get_account_totals_between("2026-07-14", "2026-09-11") == expected_totals(range_db, "2026-07-14", "2026-09-11")
+
+
+def test_range_trial_balance_matches_direct_ledger(range_db):
+    rows = calculate_range("2026-07-15", "2026-09-10")
+    assert rows == coba.calculate_trial_balance_from_ledger("2026-07-15", "2026-09-10")
+    by_code = {row['account_code']: row for row in rows}
+    assert by_code['1-1100']['debit'] == 5000 + 1000 - 20 + 2000 - 30 + 3000
+    assert sum(row['debit'] for row in rows) == sum(row['credit'] for row in rows)
+
+
+@pytest.mark.parametrize("start_month, fiscal_range", [
+    (1, ("2026-01-01", "2026-12-31")),
+    (7, ("2026-07-01", "2027-06-30")),
+    (10, ("2026-10-01", "2027-09-30")),
+])
+def test_fiscal_year_range_follows_start_month(monkeypatch, start_month, fiscal_range):
+    monkeypatch.setattr(coba, "FISCAL_YEAR_START_MONTH", start_month)
+    assert coba.fiscal_year_range(2026) == fiscal_range
+
+
+def test_api_fiscal_year_not_starting_in_january(admin_client, range_db, monkeypatch):
+    monkeypatch.setattr(coba, "FISCAL_YEAR_START_MONTH", 7)
+    body = admin_client.get("/api/trial_balance_range?fiscal_year=2026").get_json()
+    assert body['success'] is True
+    assert (body['start_date'], body['end_date']) == ("2026-07-01", "2027-06-30")
+
+    by_code = {row['account_code']: row for row in body['data']}
+    # 2026-06-30 dan 2027-07-01 di luar tahun fiskal 2026/2027
+    assert by_code['4-1100']['credit'] == 10 + 100 + 1000 + 2000 + 3000 + 40000 + 600
+    assert by_code['6-1100']['debit'] == 20 + 30 + 50 + 70
+    assert body['data'] == calculate_range("2026-07-01", "2027-06-30")
+
+
+def test_api_mid_month_range(admin_client, range_db):
+    body = admin_client.get("/api/trial_balance_range?start_date=2026-07-15&end_date=2026-09-10&fields=account_code,credit").get_json()
+    assert body['success'] is True
+    credits = {row['account_code']: row['credit'] for row in body['data']}
+    assert credits['4-1100'] == 1000 + 2000 + 3000
+
+
+@pytest.mark.parametrize("query", [
+    "start_date=2026-09-10&end_date=2026-07-15",
+    "start_date=2026-07&end_date=2026-09-10",
+    "fiscal_year=dua-ribu",
+])
+def test_api_rejects_invalid_range(admin_client, range_db, query):
+    assert admin_client.get(f"/api/trial_balance_range?{query}").get_json()['success'] is False
@@ -0,0 +1,30 @@
+import coba
+
+
+def test_backfill_classifies_in_one_upsert_per_batch(fake_db):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar', 'category': 'Current Assets'},
+        {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan', 'category': 'Revenue'},
+    ]
+    fake_db.tables['general_journals'] = [
+        {'id': i, 'transaction_number': f"JNL-{i}", 'transaction_date': '2026-09-01', 'description': 'penjualan tunai',
+         'total_amount': 100, 'cash_flow_category': None, 'cash_delta': None}
+        for i in range(1, 6)
+    ]
+    fake_db.tables['journal_entries'] = [
+        entry
+        for i in range(1, 6)
+        for entry in (
+            {'id': i * 10, 'journal_id': i, 'account_code': '1-1100', 'position': 'debit', 'amount': 100},
+            {'id': i * 10 + 1, 'journal_id': i, 'account_code': '4-1100', 'position': 'kredit', 'amount': 100},
+        )
+    ]
+
+    result = coba.app.test_cli_runner().invoke(args=["backfill-cash-flow", "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+
+    journals = fake_db.tables['general_journals']
+    assert len(journals) == 5
+    assert all(journal['cash_flow_category'] == coba.CASH_FLOW_RECEIPT and journal['cash_delta'] == 100 for journal in journals)
+    assert fake_db.calls.count(('general_journals', 'update')) == 0
+    assert fake_db.calls.count(('general_journals', 'upsert')) == 3
@@ -0,0 +1,66 @@
+import pytest
+
+import coba
+
+CHART = [
+    {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar', 'category': 'Current Assets'},
+    {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan', 'category': 'Revenue'},
+]
+NEW_ACCOUNT = {'account_code': '6-1300', 'account_name': 'Beban Pakan', 'account_type': 'Beban', 'category': 'Operating Expense'}
+
+
+@pytest.fixture
+def chart_db(fake_db):
+    fake_db.tables['chart_of_accounts'] = [dict(account) for account in CHART]
+    # Cache dimuat sebelum perubahan, seperti di proses yang sudah berjalan
+    assert coba.get_account_by_code('6-1300') is None
+    return fake_db
+
+
+def test_added_account_is_visible_immediately(chart_db):
+    version = coba.get_chart_of_accounts_cache()['version']
+
+    assert coba.add_account_to_chart(dict(NEW_ACCOUNT))['success'] is True
+
+    assert coba.get_account_by_code('6-1300')['account_name'] == 'Beban Pakan'
+    assert coba.get_account_name('6-1300') == 'Beban Pakan'
+    assert coba.get_chart_of_accounts_cache()['version'] == version + 1
+    assert coba.get_account_classification('6-1300')['is_expense']
+
+
+def test_deleted_account_disappears_immediately(chart_db):
+    assert coba.get_account_by_code('4-1100') is not None
+
+    assert coba.delete_account_from_chart('4-1100')['success'] is True
+
+    assert coba.get_account_by_code('4-1100') is None
+    assert '4-1100' not in {account['account_code'] for account in coba.get_chart_of_accounts_cache()['accounts']}
+
+
+def test_initialized_chart_replaces_empty_cache(fake_db):
+    fake_db.tables['chart_of_accounts'] = []
+    assert coba.get_chart_of_accounts_cache()['accounts'] == []
+
+    coba.initialize_chart_of_accounts()
+
+    assert coba.get_account_by_code('1-1100')['account_name'] == 'Kas Kecil'
+    assert len(coba.get_chart_of_accounts_cache()['accounts']) == len(fake_db.tables['chart_of_accounts'])
+
+
+def test_failed_add_keeps_cache(chart_db):
+    version = coba.get_chart_of_accounts_cache()['version']
+    assert coba.add_account_to_chart(dict(CHART[0]))['success'] is False
+    chart_db.calls.clear()
+    coba.get_account_by_code('1-1100')
+    assert chart_db.calls == []
+    assert coba.get_chart_of_accounts_cache()['version'] == version
+
+
+def test_account_api_refreshes_lookup(admin_client, chart_db):
+    body = admin_client.post("/api/add_account", json=NEW_ACCOUNT).get_json()
+    assert body['success'] is True
+    assert coba.get_account_by_code('6-1300')['account_type'] == 'Beban'
+
+    body = admin_client.post("/api/delete_account", json={'account_code': '6-1300'}).get_json()
+    assert body['success'] is True
+    assert coba.get_account_by_code('6-1300') is None
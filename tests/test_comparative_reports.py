@@ -0,0 +1,132 @@
+import pytest
+
+import coba
+
+PERIODS = ["2026-07", "2026-08", "2026-09"]
+CHART = [
+    ('1-1100', 'Kas', 'Aktiva Lancar'),
+    ('1-2100', 'Peralatan', 'Aktiva Tetap'),
+    ('1-2200', 'Akumulasi Penyusutan Peralatan', 'Aktiva Tetap'),
+    ('2-1100', 'Utang Usaha', 'Kewajiban'),
+    ('3-1100', 'Modal Usaha', 'Modal'),
+    ('4-1100', 'Penjualan Lele', 'Pendapatan'),
+    ('5-1100', 'Harga Pokok Penjualan', 'Harga Pokok Penjualan'),
+    ('6-1100', 'Beban Gaji', 'Beban'),
+    ('6-1200', 'Beban Penyusutan Peralatan', 'Beban'),
+]
+OPENING_BALANCES = [('1-1100', 'debit', 20000), ('1-2100', 'debit', 6000), ('3-1100', 'kredit', 26000)]
+JOURNALS = [
+    # Di luar rentang: tidak boleh masuk kolom mana pun
+    ("2026-06-30", "1-1100", "4-1100", 777),
+    ("2026-07-01", "1-1100", "4-1100", 5000),
+    ("2026-07-15", "5-1100", "1-1100", 2000),
+    ("2026-08-05", "1-1100", "4-1100", 7000),
+    ("2026-08-20", "6-1100", "1-1100", 1500),
+    ("2026-08-31", "1-1100", "2-1100", 3000),
+    ("2026-09-30", "2-1100", "1-1100", 1000),
+    ("2026-10-01", "1-1100", "4-1100", 888),
+]
+ADJUSTMENTS = [("2026-08-31", "2026-08", 300), ("2026-09-30", "2026-09", 300)]
+READ_TABLES = {'general_journals', 'journal_entries', 'adjusting_journals', 'adjusting_journal_entries', 'opening_balances'}
+
+
+@pytest.fixture
+def ledger_db(fake_db):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': code, 'account_name': name, 'account_type': account_type} for code, name, account_type in CHART
+    ]
+    fake_db.tables['opening_balances'] = [
+        {'id': i, 'account_code': code, 'position': position, 'amount': amount}
+        for i, (code, position, amount) in enumerate(OPENING_BALANCES, 1)
+    ]
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    for journal_id, (date, debit_code, credit_code, amount) in enumerate(JOURNALS, 1):
+        fake_db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date,
+            'description': 'x', 'total_amount': amount,
+        })
+        fake_db.tables['journal_entries'].extend([
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ])
+    fake_db.tables['adjusting_journals'] = []
+    fake_db.tables['adjusting_journal_entries'] = []
+    for journal_id, (date, period, amount) in enumerate(ADJUSTMENTS, 1):
+        fake_db.tables['adjusting_journals'].append({
+            'id': journal_id, 'adjustment_number': f"ADJ-{journal_id}", 'adjustment_date': date,
+            'description': 'Penyusutan', 'total_amount': amount, 'period': period,
+        })
+        fake_db.tables['adjusting_journal_entries'].extend([
+            {'id': journal_id * 10, 'adjusting_journal_id': journal_id, 'account_code': '6-1200', 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'adjusting_journal_id': journal_id, 'account_code': '1-2200', 'position': 'kredit', 'amount': amount},
+        ])
+    # Cache COA dimuat dulu supaya hitungan query hanya berisi data jurnal
+    coba.get_chart_of_accounts_cache()
+    return fake_db
+
+
+def build(source, *args):
+    coba.invalidate_period_cache()
+    with coba.app.test_request_context("/"):
+        return source(*args)
+
+
+def table_reads(db):
+    return [table for table, op in db.calls if table != 'rpc']
+
+
+def test_range_is_read_once_per_table(ledger_db):
+    ledger_db.calls.clear()
+    build(coba.get_comparative_income_statement, PERIODS[0], PERIODS[-1])
+    reads = table_reads(ledger_db)
+    assert set(reads) == READ_TABLES
+
+    # Rentang yang lebih panjang tetap satu kali baca per tabel, bukan satu per bulan
+    ledger_db.calls.clear()
+    build(coba.get_comparative_income_statement, "2026-01", "2026-12")
+    assert sorted(table_reads(ledger_db)) == sorted(reads)
+
+
+def test_comparative_page_reads_each_table_once(admin_client, ledger_db):
+    ledger_db.calls.clear()
+    build(coba.get_comparative_balance_sheet, PERIODS[0], PERIODS[-1])
+    one_pass = table_reads(ledger_db)
+    assert set(one_pass) == READ_TABLES
+
+    coba.invalidate_period_cache()
+    ledger_db.calls.clear()
+    body = admin_client.get(f"/laporan_komparatif?report=balance_sheet&start_period={PERIODS[0]}&end_period={PERIODS[-1]}").get_data(as_text=True)
+    assert all(period in body for period in PERIODS)
+    assert sorted(table for table in table_reads(ledger_db) if table != 'users') == sorted(one_pass)
+
+
+@pytest.mark.parametrize("comparative, single", [
+    (coba.get_comparative_income_statement, coba.get_income_statement_data),
+    (coba.get_comparative_balance_sheet, coba.get_balance_sheet_data),
+])
+def test_columns_match_single_period_statements(ledger_db, comparative, single):
+    data = build(comparative, PERIODS[0], PERIODS[-1])
+    statements = [build(single, period) for period in PERIODS]
+    assert data['periods'] == PERIODS
+
+    for section in data['sections']:
+        for row in section['rows']:
+            expected = [
+                sum(item['amount'] for item in statement[section['key']] if item['account_code'] == row['account_code'])
+                for statement in statements
+            ]
+            assert row['amounts'] == expected
+        listed = {item['account_code'] for statement in statements for item in statement[section['key']]}
+        assert {row['account_code'] for row in section['rows']} == listed
+    for row in data['summary']:
+        assert row['amounts'] == [statement[row['key']] for statement in statements]
+
+
+def test_income_statement_columns_and_ytd(ledger_db):
+    data = build(coba.get_comparative_income_statement, PERIODS[0], PERIODS[-1])
+    summary = {row['key']: row for row in data['summary']}
+    assert summary['total_pendapatan']['amounts'] == [5000, 7000, 0]
+    assert summary['total_pendapatan']['total'] == 12000
+    assert summary['laba_rugi_bersih']['amounts'] == [3000, 7000 - 1500 - 300, -300]
+    assert summary['laba_rugi_bersih']['total'] == 3000 + 5200 - 300
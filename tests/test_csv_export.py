@@ -0,0 +1,57 @@
+import pytest
+
+import coba
+
+
+def add_journals(db, count):
+    db.tables['general_journals'] = [
+        {'id': i, 'transaction_number': f"JNL-{i}", 'transaction_date': f"2026-09-{i:02d}", 'description': 'x',
+         'total_amount': 100, 'created_by': 'test'}
+        for i in range(1, count + 1)
+    ]
+    db.tables['journal_entries'] = [
+        {'id': i * 10, 'journal_id': i, 'account_code': '1-1100', 'position': 'debit', 'amount': 100}
+        for i in range(1, count + 1)
+    ]
+
+
+def test_export_streams_all_rows(admin_client, fake_db, monkeypatch):
+    add_journals(fake_db, 5)
+    monkeypatch.setattr(coba, "JOURNAL_READ_PAGE_SIZE", 2)
+    body = admin_client.get("/export/jurnal_umum").get_data(as_text=True)
+    lines = body.strip().splitlines()
+    assert len(lines) == 6
+    assert "EXPORT_ERROR" not in body
+
+
+def test_export_fails_with_500_before_streaming(admin_client, fake_db):
+    add_journals(fake_db, 5)
+    fake_db.fail_on.add('general_journals')
+    response = admin_client.get("/export/jurnal_umum")
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
+
+
+def test_export_error_mid_stream_writes_marker_and_aborts(admin_client, fake_db, monkeypatch):
+    add_journals(fake_db, 5)
+    monkeypatch.setattr(coba, "JOURNAL_READ_PAGE_SIZE", 2)
+    fetch_page = coba.fetch_journals_with_details
+    calls = []
+
+    def failing_second_page(*args, **kwargs):
+        calls.append(kwargs.get('after'))
+        if len(calls) > 1:
+            raise RuntimeError("koneksi Supabase terputus")
+        return fetch_page(*args, **kwargs)
+
+    monkeypatch.setattr(coba, "fetch_journals_with_details", failing_second_page)
+    response = admin_client.get("/export/jurnal_umum", buffered=False)
+    assert response.status_code == 200
+
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in response.response:
+            chunks.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+    body = "".join(chunks)
+    assert body.strip().splitlines()[-1].startswith("EXPORT_ERROR")
+    assert "JNL-2" in body and "JNL-3" not in body
@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import coba
+
+
+class StubSender:
+    """Pengirim palsu: gagal `failures` kali lalu berhasil (failures=None berarti selalu gagal)"""
+
+    def __init__(self, failures=0, gate=None):
+        self.failures = failures
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, recipient, subject, body):
+        self.calls.append((recipient, threading.current_thread().name))
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failures is None or len(self.calls) <= self.failures:
+            raise RuntimeError(f"SendGrid error {len(self.calls)}")
+        return True
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """Dispatcher dengan sleep backoff yang dicatat dan riwayat status per job"""
+    sleeps, history = [], {}
+    update_email_status = coba.update_email_status
+
+    def record_status(job_id, **fields):
+        if 'status' in fields:
+            history.setdefault(job_id, []).append(fields['status'])
+        update_email_status(job_id, **fields)
+
+    monkeypatch.setattr(coba.time, "sleep", sleeps.append)
+    monkeypatch.setattr(coba, "update_email_status", record_status)
+    monkeypatch.setattr(coba, "_email_sender", None)
+
+    def start(sender):
+        coba.start_email_dispatcher(sender=sender)
+        return sleeps, history
+    return start
+
+
+def wait_for_status(job_id, statuses=('sent', 'failed', 'dropped')):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        status = coba.get_email_status(job_id)
+        if status and status['status'] in statuses:
+            return status
+        threading.Event().wait(0.01)
+    raise AssertionError(f"Email job {job_id} tidak selesai: {coba.get_email_status(job_id)}")
+
+
+def test_retries_with_exponential_backoff_until_sent(dispatcher):
+    sender = StubSender(failures=2)
+    sleeps, history = dispatcher(sender)
+
+    job_id = coba.queue_email("user@test.local", "OTP", "123456")
+    status = wait_for_status(job_id)
+
+    assert status['status'] == 'sent'
+    assert status['attempts'] == 3
+    assert status['last_error'] is None
+    assert len(sender.calls) == 3
+    assert sleeps == [coba.EMAIL_RETRY_BACKOFF, coba.EMAIL_RETRY_BACKOFF * 2]
+    assert history[job_id] == ['queued', 'sending', 'retrying', 'sending', 'retrying', 'sending', 'sent']
+
+
+def test_always_failing_sender_ends_failed(dispatcher):
+    sender = StubSender(failures=None)
+    sleeps, history = dispatcher(sender)
+
+    job_id = coba.queue_email("user@test.local", "OTP", "123456")
+    status = wait_for_status(job_id)
+
+    attempts = coba.EMAIL_MAX_RETRIES + 1
+    assert status['status'] == 'failed'
+    assert status['attempts'] == attempts
+    assert status['last_error'] == f"SendGrid error {attempts}"
+    assert len(sender.calls) == attempts
+    # Tidak ada sleep setelah percobaan terakhir
+    assert sleeps == [coba.EMAIL_RETRY_BACKOFF * 2 ** i for i in range(coba.EMAIL_MAX_RETRIES)]
+    assert history[job_id] == ['queued'] + ['sending', 'retrying'] * attempts + ['failed']
+
+
+def test_full_queue_drops_email(monkeypatch):
+    monkeypatch.setattr(coba, "_email_queue", queue.Queue(maxsize=1))
+    monkeypatch.setattr(coba, "start_email_dispatcher", lambda sender=None: None)
+
+    first = coba.queue_email("a@test.local", "OTP", "1")
+    second = coba.queue_email("b@test.local", "OTP", "2")
+
+    assert coba.get_email_status(first)['status'] == 'queued'
+    dropped = coba.get_email_status(second)
+    assert dropped['status'] == 'dropped'
+    assert dropped['last_error'] == 'Antrian email penuh'
+    assert coba._email_queue.qsize() == 1
+
+
+def test_register_and_verify_do_not_wait_for_sender(fake_db, dispatcher):
+    gate = threading.Event()
+    sender = StubSender(gate=gate)
+    dispatcher(sender)
+    fake_db.tables['users'] = []
+    client = coba.app.test_client()
+
+    try:
+        response = client.post("/register", data={'name': 'Budi', 'email': 'budi@test.local', 'password': 'rahasia'})
+        assert response.status_code == 302
+        with client.session_transaction() as session:
+            otp, otp_job = session['register_otp'], session['register_otp_job']
+        # Pengirim masih tertahan, tetapi request sudah dijawab
+        assert coba.get_email_status(otp_job)['status'] in ('queued', 'sending')
+
+        response = client.post("/verify", data={'otp': otp})
+        assert response.status_code == 200
+        assert fake_db.tables['users'][0]['email'] == 'budi@test.local'
+    finally:
+        gate.set()
+
+    assert wait_for_status(otp_job)['status'] == 'sent'
+    coba._email_queue.join()
+    assert [recipient for recipient, _ in sender.calls] == ['budi@test.local', 'budi@test.local']
+    assert {thread for _, thread in sender.calls} == {'email-dispatcher'}
@@ -0,0 +1,129 @@
+import pytest
+
+import coba
+
+PERIOD = "2026-09"
+CHART = {
+    '1-1100': ('Kas', 'Aktiva Lancar'),
+    '1-2200': ('Akumulasi Penyusutan Peralatan', 'Aktiva Tetap'),
+    '3-1100': ('Modal Usaha', 'Modal'),
+    '4-1100': ('Penjualan Lele', 'Pendapatan'),
+    '6-1200': ('Beban Penyusutan Peralatan', 'Beban'),
+}
+ADJUSTING_ENTRY_KEYS = {
+    'id', 'adjusting_journal_id', 'account_code', 'account_name', 'account_type', 'position', 'amount', 'note', 'created_at',
+}
+
+
+def record_in_filters(db, monkeypatch, table):
+    """Catat jumlah id tiap batch in_() untuk `table` (fetch_all_rows membuat ulang query per halaman)"""
+    original_table = db.table
+    chunks = {}
+
+    def table_with_spy(name):
+        query = original_table(name)
+        if name == table:
+            in_ = query.in_
+
+            def spying_in(column, values):
+                values = list(values)
+                chunks.setdefault(tuple(values), len(values))
+                return in_(column, values)
+            query.in_ = spying_in
+        return query
+
+    monkeypatch.setattr(db, "table", table_with_spy)
+    return chunks
+
+
+@pytest.fixture
+def batch_db(fake_db):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': code, 'account_name': name, 'account_type': account_type} for code, (name, account_type) in CHART.items()
+    ]
+    fake_db.tables['opening_balances'] = [
+        {'id': 1, 'account_code': '1-1100', 'position': 'debit', 'amount': 100000},
+        {'id': 2, 'account_code': '3-1100', 'position': 'kredit', 'amount': 100000},
+    ]
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    # Entries disimpan terbalik supaya urutan per jurnal harus datang dari order("id")
+    for journal_id in range(450, 0, -1):
+        fake_db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': "2026-09-15",
+            'description': 'x', 'total_amount': journal_id,
+        })
+        fake_db.tables['journal_entries'].extend([
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': '4-1100', 'position': 'kredit', 'amount': journal_id},
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': '1-1100', 'position': 'debit', 'amount': journal_id},
+        ])
+    fake_db.tables['adjusting_journals'] = []
+    fake_db.tables['adjusting_journal_entries'] = []
+    for journal_id in range(1, 251):
+        fake_db.tables['adjusting_journals'].append({
+            'id': journal_id, 'adjustment_number': f"ADJ-{journal_id}", 'adjustment_date': "2026-09-30",
+            'description': 'Penyusutan', 'total_amount': 2, 'period': PERIOD,
+        })
+        for entry_id, code, position in ((journal_id * 10, '6-1200', 'debit'), (journal_id * 10 + 1, '1-2200', 'kredit')):
+            name, account_type = CHART[code]
+            # PostgREST mengembalikan join chart_of_accounts sebagai objek bersarang
+            fake_db.tables['adjusting_journal_entries'].append({
+                'id': entry_id, 'adjusting_journal_id': journal_id, 'account_code': code, 'position': position, 'amount': 2,
+                'chart_of_accounts': {'account_name': name, 'account_type': account_type},
+            })
+    return fake_db
+
+
+def test_journal_entries_are_fetched_in_batches(batch_db, monkeypatch):
+    batches = record_in_filters(batch_db, monkeypatch, "journal_entries")
+    journal_ids = list(range(1, 451)) + [1, 2, 3]
+
+    entries_by_journal = coba.get_journal_entries_by_journal_ids(journal_ids)
+
+    assert list(batches.values()) == [200, 200, 50]
+    assert sorted(entries_by_journal) == list(range(1, 451))
+    for journal_id, entries in entries_by_journal.items():
+        assert [entry['id'] for entry in entries] == [journal_id * 10, journal_id * 10 + 1]
+        assert {entry['journal_id'] for entry in entries} == {journal_id}
+
+
+def test_batch_size_is_configurable(batch_db, monkeypatch):
+    monkeypatch.setattr(coba, "JOURNAL_ENTRY_BATCH_SIZE", 100)
+    batches = record_in_filters(batch_db, monkeypatch, "journal_entries")
+    assert len(coba.get_journal_entries_by_journal_ids(range(1, 251))) == 250
+    assert list(batches.values()) == [100, 100, 50]
+
+
+def test_journal_details_group_every_batched_entry(batch_db):
+    journals = coba.fetch_journals_with_details("2026-09-01", "2026-09-30")
+    assert len(journals) == 450
+    assert all(len(journal['journal_entries']) == 2 for journal in journals)
+    assert all(entry['journal_id'] == journal['id'] for journal in journals for entry in journal['journal_entries'])
+    debits = [entry['amount'] for journal in journals for entry in journal['journal_entries'] if entry['position'] == 'debit']
+    assert sum(debits) == sum(range(1, 451))
+
+
+def test_adjusting_entries_are_batched_and_formatted(batch_db, monkeypatch):
+    batches = record_in_filters(batch_db, monkeypatch, "adjusting_journal_entries")
+
+    journals = coba.get_adjusting_journals_with_entries(PERIOD)
+
+    assert list(batches.values()) == [200, 50]
+    assert len(journals) == 250
+    for journal in journals:
+        entries = journal['entries']
+        assert [entry['id'] for entry in entries] == [journal['id'] * 10, journal['id'] * 10 + 1]
+        assert all(set(entry) == ADJUSTING_ENTRY_KEYS for entry in entries)
+        assert entries[0]['adjusting_journal_id'] == journal['id']
+        assert (entries[0]['account_name'], entries[0]['account_type']) == CHART['6-1200']
+        assert (entries[1]['account_name'], entries[1]['account_type']) == CHART['1-2200']
+
+
+def test_worksheet_sums_every_batched_adjustment(batch_db):
+    coba.invalidate_period_cache()
+    with coba.app.test_request_context("/"):
+        rows = {row['account_code']: row for row in coba.get_worksheet_data(PERIOD)}
+
+    assert rows['6-1200']['penyesuaian_debit'] == 250 * 2
+    assert rows['1-2200']['penyesuaian_credit'] == 250 * 2
+    assert rows['4-1100']['nssp_credit'] == sum(range(1, 451))
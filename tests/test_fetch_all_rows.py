@@ -0,0 +1,57 @@
+import coba
+
+
+def make_rows(db, count):
+    db.tables['chart_of_accounts'] = [
+        {'id': i, 'account_code': f"1-{i:04d}", 'account_name': f"Akun {i}", 'account_type': 'Aktiva Lancar'}
+        for i in range(1, count + 1)
+    ]
+
+
+def read_all(db, **kwargs):
+    return list(coba.fetch_all_rows(lambda: db.table('chart_of_accounts').select('*').order('id'), **kwargs))
+
+
+def test_reads_every_page(fake_db):
+    make_rows(fake_db, 2500)
+    rows = read_all(fake_db, page_size=1000)
+    assert [row['id'] for row in rows] == list(range(1, 2501))
+
+
+def test_server_max_rows_smaller_than_page_size(fake_db):
+    make_rows(fake_db, 2500)
+    fake_db.max_rows = 300
+    rows = read_all(fake_db, page_size=1000)
+    assert len(rows) == 2500
+    assert len({row['id'] for row in rows}) == 2500
+
+
+def test_server_max_rows_with_parallel_pages(fake_db):
+    make_rows(fake_db, 2500)
+    fake_db.max_rows = 300
+    rows = read_all(fake_db, page_size=1000, parallel_pages=3)
+    assert [row['id'] for row in rows] == list(range(1, 2501))
+
+
+def test_exact_multiple_of_page_size(fake_db):
+    make_rows(fake_db, 2000)
+    assert len(read_all(fake_db, page_size=1000)) == 2000
+
+
+def test_range_header_matches_page_size():
+    query = coba.create_client("http://localhost:54321", "test.local.key").table('chart_of_accounts').select('*')
+    captured = {}
+
+    class Stop(Exception):
+        pass
+
+    def fake_execute():
+        captured['range'] = query.headers['Range']
+        raise Stop
+
+    query.execute = fake_execute
+    try:
+        next(coba.fetch_all_rows(lambda: query, page_size=1000))
+    except Stop:
+        pass
+    assert captured['range'] == '0-999'
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+import coba
+
+
+def slow(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def test_timeout_counts_from_when_each_call_starts(monkeypatch):
+    monkeypatch.setattr(coba, "FETCH_MAX_WORKERS", 2)
+    # Panggilan ketiga antri di belakang dua yang pertama; total fan-out melebihi timeout, tiap panggilan tidak
+    results = coba.fetch_parallel((slow, 0.3, 1), (slow, 0.3, 2), (slow, 0.3, 3), timeout=0.5)
+    assert results == [1, 2, 3]
+
+
+def test_stuck_call_raises_without_waiting_for_it():
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        coba.fetch_parallel((slow, 2, 1), (slow, 0, 2), timeout=0.2)
+    assert time.monotonic() - started < 1
+
+
+def test_errors_from_calls_are_propagated():
+    def fail():
+        raise TimeoutError("dari panggilan")
+
+    with pytest.raises(TimeoutError, match="dari panggilan"):
+        coba.fetch_parallel((fail,), (slow, 0, 2), timeout=5)
+
+
+def test_report_timeout_returns_error_page(admin_client, monkeypatch):
+    monkeypatch.setattr(coba, "FETCH_TIMEOUT", 0.2)
+    monkeypatch.setattr(coba, "get_adjusting_journals_with_entries", lambda period: slow(2, []))
+    response = admin_client.get("/neraca_lajur?period=2026-09")
+    assert response.status_code == 504
+    assert coba.FETCH_TIMEOUT_MESSAGE in response.get_data(as_text=True)
+
+
+def test_api_timeout_returns_json():
+    with coba.app.test_request_context("/api/trial_balance_range"):
+        response, status = coba.handle_fetch_timeout(TimeoutError("x"))
+    assert status == 504
+    assert response.get_json() == {"success": False, "message": coba.FETCH_TIMEOUT_MESSAGE}
+
+
+def test_streamed_page_timeout_shows_message(admin_client, monkeypatch):
+    monkeypatch.setattr(coba, "FETCH_TIMEOUT", 0.2)
+    monkeypatch.setattr(coba, "get_opening_balances_with_account_info", lambda: slow(2, []))
+    fake = coba.supabase
+    fake.tables['chart_of_accounts'] = [{'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar', 'category': 'Current Assets'}]
+    body = admin_client.get("/buku_besar").get_data(as_text=True)
+    assert coba.FETCH_TIMEOUT_MESSAGE in body
+    assert body.rstrip().endswith("</html>")
@@ -0,0 +1,55 @@
+import coba
+from test_ledger_snapshot import add_journal, snapshot_db  # noqa: F401
+
+
+def trial_balance_totals(db, p_start_date=None, p_end_date=None):
+    journals = {
+        journal['id'] for journal in db.tables['general_journals']
+        if (not p_start_date or journal['transaction_date'] >= p_start_date)
+        and (not p_end_date or journal['transaction_date'] <= p_end_date)
+    }
+    totals = {}
+    for entry in db.tables['journal_entries']:
+        if entry['journal_id'] in journals:
+            debit, credit = totals.get(entry['account_code'], (0, 0))
+            if entry['position'] == 'debit':
+                debit += entry['amount']
+            else:
+                credit += entry['amount']
+            totals[entry['account_code']] = (debit, credit)
+    return [{'account_code': code, 'total_debit': debit, 'total_credit': credit} for code, (debit, credit) in totals.items()]
+
+
+def snapshot_built():
+    conn = coba.get_ledger_snapshot_db()
+    try:
+        return conn.execute("SELECT 1 FROM ledger_snapshot_meta WHERE key = 'built_at'").fetchone() is not None
+    finally:
+        conn.close()
+
+
+def test_header_totals_use_server_aggregate(snapshot_db):
+    snapshot_db.rpcs['trial_balance_totals'] = trial_balance_totals
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    add_journal(snapshot_db, 2, "2026-10-01", 40)
+    summary = coba.get_journal_header_totals("2026-09-01", "2026-09-30")
+    assert summary == {'total_transactions': 1, 'total_amount': 100}
+    assert ('journal_entries', 'select') not in snapshot_db.calls
+    assert not snapshot_built()
+
+
+def test_header_totals_never_rebuild_snapshot_without_rpc(snapshot_db):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    add_journal(snapshot_db, 2, "2026-10-01", 40)
+    summary = coba.get_journal_header_totals("2026-09-01", "2026-09-30")
+    assert summary == {'total_transactions': 1, 'total_amount': 100}
+    assert ('journal_entries', 'select') not in snapshot_db.calls
+    assert not snapshot_built()
+
+
+def test_header_totals_read_fresh_snapshot_without_rpc(snapshot_db):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    coba.rebuild_ledger_snapshot()
+    snapshot_db.calls.clear()
+    assert coba.get_ledger_debit_total() == 100
+    assert ('general_journals', 'select') not in snapshot_db.calls
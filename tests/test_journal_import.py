@@ -0,0 +1,162 @@
+import io
+
+import pytest
+
+import coba
+from sqlite_posting import SqlitePosting
+
+CHART = [
+    {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar'},
+    {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan'},
+    {'account_code': '6-1100', 'account_name': 'Beban Listrik', 'account_type': 'Beban'},
+]
+
+CSV = (
+    "\ufeffjournal_ref,transaction_date,description,account_code,position,amount,note,transaction_number\n"
+    "A,2026-09-01,Penjualan tunai,1-1100,Debit,1000,,JNL-A\n"
+    "A,2026-09-01,ignored,4-1100, KREDIT ,1000,dicatat,\n"
+    "B,2026-09-02,Bayar listrik,6-1100,debit,250,,\n"
+    "B,2026-09-02,,1-1100,kredit,250,,\n"
+)
+
+
+def journal(number, debit_code="1-1100", credit_code="4-1100", amount=1000, date="2026-09-01"):
+    return {
+        'transaction_number': number, 'transaction_date': date, 'description': f"Transaksi {number}",
+        'entries': [
+            {'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ],
+    }
+
+
+@pytest.fixture
+def import_client(admin_client, fake_db):
+    fake_db.tables['chart_of_accounts'] = [dict(account) for account in CHART]
+    coba.invalidate_chart_of_accounts_cache()
+    return admin_client
+
+
+def fail_nth_insert(db, monkeypatch, table, n):
+    """Insert ke `table` yang ke-n gagal seperti APIError"""
+    original_table = db.table
+    inserts = []
+
+    def table_with_failure(name):
+        query = original_table(name)
+        if name == table:
+            insert = query.insert
+
+            def failing_insert(payload):
+                inserts.append(payload)
+                if len(inserts) == n:
+                    db.fail_on.add((table, 'insert'))
+                return insert(payload)
+            query.insert = failing_insert
+        return query
+
+    monkeypatch.setattr(db, "table", table_with_failure)
+
+
+def test_parse_csv_groups_rows_by_journal_ref():
+    journals = coba.parse_journal_import_csv(CSV)
+    assert [journal['transaction_number'] for journal in journals] == ['JNL-A', None]
+    first, second = journals
+    assert (first['transaction_date'], first['description']) == ('2026-09-01', 'Penjualan tunai')
+    assert first['entries'] == [
+        {'account_code': '1-1100', 'position': 'debit', 'amount': '1000', 'note': ''},
+        {'account_code': '4-1100', 'position': 'kredit', 'amount': '1000', 'note': 'dicatat'},
+    ]
+    assert [entry['account_code'] for entry in second['entries']] == ['6-1100', '1-1100']
+
+
+def test_import_reports_each_row(import_client, fake_db):
+    response = import_client.post("/api/import_transactions", json={'journals': [
+        journal("JNL-1"),
+        journal("JNL-2", amount=0),
+        journal("JNL-3", credit_code="9-9999"),
+        journal("JNL-1"),
+        journal("JNL-4", date="01/09/2026"),
+        journal(None, debit_code="6-1100", credit_code="1-1100", amount=250),
+    ]}).get_json()
+
+    assert response['success'] is False
+    assert (response['imported'], response['failed']) == (2, 4)
+    results = response['results']
+    assert [result['row'] for result in results] == [1, 2, 3, 4, 5, 6]
+    assert [result['success'] for result in results] == [True, False, False, False, False, True]
+    assert "9-9999" in results[2]['message']
+    assert "duplikat" in results[3]['message']
+    assert "YYYY-MM-DD" in results[4]['message']
+    assert 'orphaned_journal_ids' not in response
+
+    saved = {header['transaction_number']: header for header in fake_db.tables['general_journals']}
+    assert set(saved) == {'JNL-1', results[5]['transaction_number']}
+    assert {entry['journal_id'] for entry in fake_db.tables['journal_entries']} == {header['id'] for header in saved.values()}
+
+
+@pytest.mark.parametrize("upload", ["file", "body"])
+def test_import_accepts_csv(import_client, fake_db, upload):
+    if upload == "file":
+        response = import_client.post("/api/import_transactions", data={'file': (io.BytesIO(CSV.encode()), "jurnal.csv")},
+                                      content_type="multipart/form-data")
+    else:
+        response = import_client.post("/api/import_transactions", data=CSV.encode(), content_type="text/csv")
+    body = response.get_json()
+    assert body['success'] is True and body['imported'] == 2
+    assert len(fake_db.tables['journal_entries']) == 4
+
+
+@pytest.mark.parametrize("payload", [{'journals': []}, {'journals': "bukan list"}, []])
+def test_empty_import_is_rejected(import_client, payload):
+    body = import_client.post("/api/import_transactions", json=payload).get_json()
+    assert body['success'] is False
+
+
+def test_import_limit(import_client, monkeypatch):
+    monkeypatch.setattr(coba, "IMPORT_MAX_JOURNALS", 2)
+    body = import_client.post("/api/import_transactions", json=[journal("A"), journal("B"), journal("C")]).get_json()
+    assert body['success'] is False and "Maksimal 2" in body['message']
+
+
+def test_failed_batch_is_rolled_back(import_client, fake_db, monkeypatch):
+    monkeypatch.setattr(coba, "IMPORT_BATCH_SIZE", 2)
+    fail_nth_insert(fake_db, monkeypatch, 'journal_entries', 2)
+
+    body = import_client.post("/api/import_transactions", json=[journal(f"JNL-{i}") for i in range(1, 6)]).get_json()
+
+    assert [result['success'] for result in body['results']] == [True, True, False, False, False]
+    assert 'orphaned_journal_ids' not in body
+    # Batch kedua gagal di entries: header-nya dihapus, batch pertama tetap tersimpan
+    assert {header['transaction_number'] for header in fake_db.tables['general_journals']} == {'JNL-1', 'JNL-2'}
+    assert len(fake_db.tables['journal_entries']) == 4
+
+
+def test_headers_left_by_failed_rollback_are_returned(import_client, fake_db, monkeypatch):
+    fail_nth_insert(fake_db, monkeypatch, 'journal_entries', 1)
+    fake_db.fail_on.add(('general_journals', 'delete'))
+
+    body = import_client.post("/api/import_transactions", json=[journal("JNL-1"), journal("JNL-2")]).get_json()
+
+    assert body['success'] is False and body['imported'] == 0
+    left_behind = sorted(header['id'] for header in fake_db.tables['general_journals'])
+    assert sorted(body['orphaned_journal_ids']) == left_behind
+    assert len(left_behind) == 2
+    assert "gagal di-rollback" in body['message']
+
+
+def test_batch_rpc_posts_each_batch_atomically(import_client, fake_db, monkeypatch):
+    monkeypatch.setattr(coba, "IMPORT_BATCH_SIZE", 2)
+    posting = SqlitePosting()
+    posting.install(fake_db)
+    # Nomor JNL-4 sudah ada di database: JNL-3 yang sudah masuk ikut dibatalkan bersama batch keduanya
+    posting.call('post_journal', {'transaction_number': 'JNL-4', 'transaction_date': '2026-08-01'}, journal("x")['entries'])
+
+    body = import_client.post("/api/import_transactions", json=[journal(f"JNL-{i}") for i in range(1, 6)]).get_json()
+
+    assert [result['success'] for result in body['results']] == [True, True, False, False, True]
+    assert fake_db.calls.count(('rpc', 'post_journal_batch')) == 3
+    assert ('general_journals', 'insert') not in fake_db.calls
+    headers = posting.rows('general_journals')
+    assert [header['transaction_number'] for header in headers] == ['JNL-4', 'JNL-1', 'JNL-2', 'JNL-5']
+    assert len(posting.rows('journal_entries')) == 8
@@ -0,0 +1,103 @@
+import base64
+import html
+import re
+
+import pytest
+
+import coba
+
+# Tanggal kembar memastikan urutan keyset memakai id sebagai pemutus
+JOURNALS = [
+    (1, "2026-09-03"), (2, "2026-09-01"), (3, "2026-09-01"), (4, "2026-09-02"), (5, "2026-09-05"),
+]
+
+
+@pytest.fixture
+def journal_client(admin_client, fake_db, monkeypatch):
+    monkeypatch.setattr(coba, "JOURNAL_PAGE_SIZE_OPTIONS", (2,))
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar', 'category': 'Current Assets'},
+        {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan', 'category': 'Revenue'},
+    ]
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    for journal_id, date in JOURNALS:
+        fake_db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date,
+            'description': 'x', 'total_amount': 100,
+        })
+        fake_db.tables['journal_entries'].extend([
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': '1-1100', 'position': 'debit', 'amount': 100},
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': '4-1100', 'position': 'kredit', 'amount': 100},
+        ])
+    return admin_client
+
+
+def cursor(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def get_page(client, url):
+    """Id jurnal di halaman (dari tombol hapus) dan link (sebelumnya, berikutnya)"""
+    body = client.get(url).get_data(as_text=True)
+    journal_ids = [int(journal_id) for journal_id in dict.fromkeys(re.findall(r"deleteTransaction\('(\d+)'\)", body))]
+    links = {
+        label: html.unescape(href)
+        for href, label in re.findall(r'<a href="([^"]+)"><button[^>]*>(⬅️ Sebelumnya|Berikutnya ➡️)', body)
+    }
+    return journal_ids, links.get('⬅️ Sebelumnya'), links.get('Berikutnya ➡️')
+
+
+def test_next_links_walk_every_journal_once(journal_client):
+    pages = []
+    url = "/jurnal_umum?page_size=2"
+    while url:
+        journal_ids, prev_url, url = get_page(journal_client, url)
+        pages.append((journal_ids, prev_url is not None))
+    assert pages == [([2, 3], False), ([4, 1], True), ([5], True)]
+
+
+def test_prev_links_walk_back_to_first_page(journal_client):
+    url = "/jurnal_umum?page_size=2"
+    for _ in range(2):
+        _, _, url = get_page(journal_client, url)
+    assert get_page(journal_client, url)[0] == [5]
+
+    pages = []
+    _, url, _ = get_page(journal_client, url)
+    while url:
+        journal_ids, url, next_url = get_page(journal_client, url)
+        pages.append((journal_ids, next_url is not None))
+    assert pages == [([4, 1], True), ([2, 3], True)]
+
+
+def test_page_links_keep_the_date_filter(journal_client):
+    journal_ids, _, next_url = get_page(journal_client, "/jurnal_umum?page_size=2&start_date=2026-09-01&end_date=2026-09-03")
+    assert journal_ids == [2, 3]
+    assert "start_date=2026-09-01" in next_url and "end_date=2026-09-03" in next_url
+    journal_ids, _, next_url = get_page(journal_client, next_url)
+    assert journal_ids == [4, 1]
+    assert next_url is None
+
+
+@pytest.mark.parametrize("raw", [
+    "2026-09-01|3,id.gt.0",
+    "2026-09-01|3)",
+    "2026-09-01|abc",
+    "2026-09-01,id.gt.0|3",
+    "2026-09-01|",
+    "bukan-cursor",
+])
+def test_cursor_with_filter_syntax_is_rejected(raw):
+    assert coba.decode_journal_cursor(cursor(raw)) is None
+
+
+def test_valid_cursor_round_trips():
+    encoded = coba.encode_journal_cursor({'id': 3, 'transaction_date': '2026-09-01'})
+    assert coba.decode_journal_cursor(encoded) == ('2026-09-01', 3)
+
+
+def test_invalid_cursor_falls_back_to_first_page(journal_client, fake_db):
+    journal_ids, prev_url, _ = get_page(journal_client, f"/jurnal_umum?page_size=2&after={cursor('2026-09-01|3,id.gt.0')}")
+    assert journal_ids == [2, 3]
+    assert prev_url is None
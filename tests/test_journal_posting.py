@@ -0,0 +1,73 @@
+import pytest
+
+import coba
+from fake_supabase import FakeAPIError, FakeResponse
+
+HEADER = {'transaction_number': 'JNL-1', 'transaction_date': '2026-09-01', 'description': 'Penjualan tunai', 'total_amount': 1000}
+ENTRIES = [
+    {'account_code': '1-1100', 'position': 'debit', 'amount': 1000},
+    {'account_code': '4-1100', 'position': 'kredit', 'amount': 1000},
+]
+
+
+def post():
+    return coba.insert_journal_with_entries("post_journal", "general_journals", "journal_entries", "journal_id", HEADER, ENTRIES)
+
+
+def post_journal(db, p_header, p_entries):
+    header = db.table("general_journals").insert(p_header).execute().data[0]
+    db.table("journal_entries").insert([{**entry, 'journal_id': header['id']} for entry in p_entries]).execute()
+    return header
+
+
+def test_rpc_posts_header_and_entries_in_one_call(fake_db):
+    fake_db.rpcs['post_journal'] = post_journal
+    saved = post()
+    assert saved['transaction_number'] == 'JNL-1'
+    assert [call for call in fake_db.calls if call[0] == 'rpc'] == [('rpc', 'post_journal')]
+    assert {entry['journal_id'] for entry in fake_db.tables['journal_entries']} == {saved['id']}
+
+
+def test_rpc_data_error_is_not_retried_through_inserts(fake_db):
+    def reject(db, p_header, p_entries):
+        raise FakeAPIError({'code': '23514', 'message': 'Total debit dan kredit tidak balance'})
+
+    fake_db.rpcs['post_journal'] = reject
+    with pytest.raises(Exception, match="tidak balance"):
+        post()
+    assert ('general_journals', 'insert') not in fake_db.calls
+
+
+def test_missing_rpc_falls_back_to_inserts(fake_db):
+    saved = post()
+    assert ('rpc', 'post_journal') in fake_db.calls
+    assert fake_db.tables['general_journals'] == [saved]
+    assert {entry['journal_id'] for entry in fake_db.tables['journal_entries']} == {saved['id']}
+
+    # RPC tidak dicoba lagi sampai POSTING_RPC_RETRY lewat
+    fake_db.calls.clear()
+    post()
+    assert ('rpc', 'post_journal') not in fake_db.calls
+
+
+def test_entry_insert_error_rolls_back_header(fake_db):
+    fake_db.fail_on.add(('journal_entries', 'insert'))
+    with pytest.raises(Exception):
+        post()
+    assert fake_db.tables['general_journals'] == []
+    assert not fake_db.tables.get('journal_entries')
+
+
+def test_entry_insert_without_rows_rolls_back_header(fake_db, monkeypatch):
+    original_table = fake_db.table
+
+    def table(name):
+        query = original_table(name)
+        if name == 'journal_entries':
+            query.insert = lambda payload: type('Empty', (), {'execute': lambda self: FakeResponse([])})()
+        return query
+
+    monkeypatch.setattr(fake_db, "table", table)
+    assert post() is None
+    assert fake_db.tables['general_journals'] == []
+
@@ -0,0 +1,43 @@
+import pytest
+
+import coba
+
+
+def payload(entries):
+    return {'transaction_date': '2026-09-01', 'description': 'Penjualan tunai', 'entries': entries}
+
+
+@pytest.mark.parametrize("entries", [[1], ["1-1100"], [None], {"account_code": "1-1100"}, "entries"])
+def test_malformed_entries_are_rejected(entries):
+    journal, error = coba.validate_journal_payload(payload(entries))
+    assert journal is None
+    assert error
+
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "-inf", float("nan"), float("inf")])
+def test_non_finite_amounts_are_rejected(amount):
+    journal, error = coba.validate_journal_payload(payload([
+        {'account_code': '1-1100', 'position': 'debit', 'amount': amount},
+        {'account_code': '4-1100', 'position': 'kredit', 'amount': amount},
+    ]))
+    assert journal is None
+    assert error == "Nominal harus berupa angka"
+
+
+def test_valid_payload_normalizes_amounts():
+    journal, error = coba.validate_journal_payload(payload([
+        {'account_code': '1-1100', 'position': 'debit', 'amount': '1500'},
+        {'account_code': '4-1100', 'position': 'kredit', 'amount': 1500.0},
+    ]))
+    assert error is None
+    assert [entry['amount'] for entry in journal['entries']] == [1500, 1500]
+
+
+def test_save_api_returns_validation_error_and_writes_nothing(admin_client, fake_db):
+    for entries in ([1], [{'account_code': '1-1100', 'position': 'debit', 'amount': 'nan'},
+                          {'account_code': '4-1100', 'position': 'kredit', 'amount': 'nan'}]):
+        response = admin_client.post("/api/save_transaction", json=payload(entries))
+        body = response.get_json()
+        assert body['success'] is False
+        assert "kesalahan sistem" not in body['message']
+    assert not fake_db.tables.get('general_journals')
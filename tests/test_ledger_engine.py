@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+
+import coba
+
+
+def random_journals(count, seed=7, decimal=False):
+    rng = random.Random(seed)
+    journals = []
+    for journal_id in range(count):
+        date = f"20{rng.randint(20, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        amount = rng.randint(1, 500) * 1000 + (0.25 if decimal else 0)
+        debit_code, credit_code = rng.sample([f"{1 + i % 6}-{i:04d}" for i in range(300)], 2)
+        journals.append({'id': journal_id, 'transaction_date': date, 'journal_entries': [
+            {'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ]})
+    return journals
+
+
+def dict_totals(journals, label_of_date):
+    result = {}
+    for journal in journals:
+        by_account = result.setdefault(label_of_date(journal['transaction_date']), {})
+        for entry in journal['journal_entries']:
+            debit, credit = by_account.get(entry['account_code'], (0, 0))
+            if entry['position'] == 'debit':
+                debit += entry['amount']
+            else:
+                credit += entry['amount']
+            by_account[entry['account_code']] = (debit, credit)
+    return result
+
+
+def test_totals_match_dict_aggregation():
+    for decimal in (False, True):
+        journals = random_journals(3000, decimal=decimal)
+        columns = coba.build_ledger_columns(journals)
+        assert coba.ledger_totals_by_date(columns) == dict_totals(journals, lambda date: date)
+        assert coba.ledger_totals_by_period(columns) == dict_totals(journals, coba.period_of)
+        assert coba.ledger_account_totals(columns) == dict_totals(journals, lambda date: None)[None]
+
+
+def test_grouped_totals_only_hold_active_pairs():
+    journals = random_journals(3000)
+    columns = coba.build_ledger_columns(journals)
+    _, group_index = np.unique(columns['date_ordinal'], return_inverse=True)
+    groups, accounts, debit, credit = coba.ledger_grouped_totals(columns, group_index)
+    pairs = {(journal['transaction_date'], entry['account_code']) for journal in journals for entry in journal['journal_entries']}
+    assert len(groups) == len(accounts) == len(debit) == len(credit) == len(pairs)
+
+
+def test_worksheet_totals_match_dict_sums():
+    rng = random.Random(11)
+    keys = ['neraca_saldo_debit', 'neraca_saldo_credit', 'penyesuaian_debit', 'penyesuaian_credit',
+            'nssp_debit', 'nssp_credit', 'laba_rugi_debit', 'laba_rugi_credit', 'neraca_debit', 'neraca_credit']
+    rows = [{key: rng.randint(0, 10_000) * 1000 for key in keys} for _ in range(200)]
+    rows[3]['nssp_debit'] = 1500.5
+
+    totals = coba.get_worksheet_totals(rows)
+    for key in keys:
+        assert totals[key] == sum(row[key] for row in rows)
+    # Kolom bilangan bulat tetap int, kolom dengan desimal menjadi float
+    assert type(totals['neraca_debit']) is int
+    assert type(totals['nssp_debit']) is float
+    laba_rugi = totals['laba_rugi_credit'] - totals['laba_rugi_debit']
+    assert totals['neraca_credit_total'] - totals['neraca_credit'] == max(laba_rugi, 0)
+
+
+def test_column_totals_of_no_rows_are_zero():
+    assert coba.column_totals([], ['debit', 'credit']) == {'debit': 0, 'credit': 0}
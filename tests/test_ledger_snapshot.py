@@ -0,0 +1,147 @@
+import pytest
+
+import coba
+
+
+@pytest.fixture
+def snapshot_db(fake_db):
+    conn = coba.get_ledger_snapshot_db()
+    with conn:
+        for table in ("ledger_daily_totals", "ledger_snapshot_meta", "ledger_snapshot_deltas", "ledger_snapshot_rebuilds"):
+            conn.execute(f"DELETE FROM {table}")
+    conn.close()
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    return fake_db
+
+
+def add_journal(db, journal_id, date, amount):
+    entries = [
+        {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': '1-1100', 'position': 'debit', 'amount': amount},
+        {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': '4-1100', 'position': 'kredit', 'amount': amount},
+    ]
+    db.tables['general_journals'].append(
+        {'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date, 'description': 'x', 'total_amount': amount}
+    )
+    db.tables['journal_entries'].extend(entries)
+    return entries
+
+
+def delete_journal(db, journal_id):
+    entries = [entry for entry in db.tables['journal_entries'] if entry['journal_id'] == journal_id]
+    db.tables['journal_entries'] = [entry for entry in db.tables['journal_entries'] if entry['journal_id'] != journal_id]
+    db.tables['general_journals'] = [journal for journal in db.tables['general_journals'] if journal['id'] != journal_id]
+    return entries
+
+
+def cash_total():
+    return coba.get_ledger_totals_before("2100-01-01").get('1-1100', (0, 0))[0]
+
+
+def run_rebuild_with(monkeypatch, before_scan=None, after_scan=None):
+    """Rebuild dengan penulisan dari worker lain sebelum scan membaca data atau setelah scan selesai membaca"""
+    original = coba.iter_journals_with_details
+
+    def scan(*args, **kwargs):
+        if before_scan:
+            before_scan()
+        yield from list(original(*args, **kwargs))
+        if after_scan:
+            after_scan()
+
+    monkeypatch.setattr(coba, "iter_journals_with_details", scan)
+    coba.rebuild_ledger_snapshot()
+    monkeypatch.setattr(coba, "iter_journals_with_details", original)
+
+
+def save(db, journal_id, amount):
+    entries = add_journal(db, journal_id, "2026-09-02", amount)
+    coba.apply_ledger_snapshot_delta(journal_id, "2026-09-02", entries)
+
+
+def delete(db, journal_id):
+    entries = delete_journal(db, journal_id)
+    coba.apply_ledger_snapshot_delta(journal_id, "2026-09-01", entries, sign=-1)
+
+
+def test_save_missed_by_scan_is_replayed(snapshot_db, monkeypatch):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    run_rebuild_with(monkeypatch, after_scan=lambda: save(snapshot_db, 2, 50))
+    assert cash_total() == 150
+
+
+def test_save_seen_by_scan_is_not_double_counted(snapshot_db, monkeypatch):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    run_rebuild_with(monkeypatch, before_scan=lambda: save(snapshot_db, 2, 50))
+    assert cash_total() == 150
+
+
+def test_delete_after_scan_read_the_journal_is_replayed(snapshot_db, monkeypatch):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    add_journal(snapshot_db, 2, "2026-09-01", 30)
+    run_rebuild_with(monkeypatch, after_scan=lambda: delete(snapshot_db, 2))
+    assert cash_total() == 100
+
+
+def test_delete_before_scan_is_not_subtracted_twice(snapshot_db, monkeypatch):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    add_journal(snapshot_db, 2, "2026-09-01", 30)
+    run_rebuild_with(monkeypatch, before_scan=lambda: delete(snapshot_db, 2))
+    assert cash_total() == 100
+
+
+def test_save_then_delete_during_scan_cancels_out(snapshot_db, monkeypatch):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+
+    def save_and_delete():
+        save(snapshot_db, 2, 50)
+        delete(snapshot_db, 2)
+
+    run_rebuild_with(monkeypatch, after_scan=save_and_delete)
+    assert cash_total() == 100
+
+
+def test_delta_log_is_pruned_after_rebuild(snapshot_db, monkeypatch):
+    run_rebuild_with(monkeypatch, after_scan=lambda: save(snapshot_db, 2, 50))
+    conn = coba.get_ledger_snapshot_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM ledger_snapshot_deltas").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM ledger_snapshot_rebuilds").fetchone()[0] == 0
+    finally:
+        conn.close()
+    # Tanpa rebuild berjalan, delta langsung diterapkan tanpa dicatat
+    save(snapshot_db, 3, 25)
+    assert cash_total() == 75
+
+
+def test_scan_error_keeps_previous_snapshot(snapshot_db):
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    coba.rebuild_ledger_snapshot()
+    snapshot_db.fail_on.add('general_journals')
+    with pytest.raises(Exception):
+        coba.rebuild_ledger_snapshot()
+    snapshot_db.fail_on.clear()
+    assert cash_total() == 100
+
+
+def test_version_bump_from_another_instance_triggers_rebuild(snapshot_db, monkeypatch):
+    from test_ledger_versions import install_version_rpc
+
+    bump = install_version_rpc(snapshot_db)
+    add_journal(snapshot_db, 1, "2026-09-01", 100)
+    assert cash_total() == 100
+
+    # Host ini menyimpan jurnal: delta diterapkan dan versinya dicatat, snapshot tidak dibangun ulang
+    entries = add_journal(snapshot_db, 2, "2026-09-02", 50)
+    coba.bump_ledger_version(["2026-09"])
+    coba.apply_ledger_snapshot_delta(2, "2026-09-02", entries)
+    scans = snapshot_db.calls.count(('general_journals', 'select'))
+    assert cash_total() == 150
+    assert snapshot_db.calls.count(('general_journals', 'select')) == scans
+
+    # Instance lain menyimpan jurnal: hanya versi bersama yang naik, snapshot dibangun ulang
+    # setelah versi di cache proses kedaluwarsa
+    add_journal(snapshot_db, 3, "2026-09-03", 25)
+    bump(snapshot_db, ["2026-09"])
+    monkeypatch.setattr(coba, "LEDGER_VERSIONS_CACHE_TTL", 0)
+    assert cash_total() == 175
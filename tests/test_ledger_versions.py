@@ -0,0 +1,92 @@
+import itertools
+
+import coba
+
+
+def install_version_rpc(db):
+    """RPC bump_ledger_version seperti di supabase/migrations, di atas tabel ledger_versions palsu"""
+    sequence = itertools.count(1)
+
+    def bump_ledger_version(db, p_periods):
+        version = next(sequence)
+        rows = db.tables.setdefault('ledger_versions', [])
+        for period in p_periods:
+            row = next((row for row in rows if row['period'] == period), None)
+            if row is None:
+                rows.append({'period': period, 'version': version, 'updated_at': 1_800_000_000.0 + version})
+            else:
+                row.update(version=version, updated_at=1_800_000_000.0 + version)
+        return version
+
+    db.rpcs['bump_ledger_version'] = bump_ledger_version
+    return bump_ledger_version
+
+
+def test_bump_from_another_instance_invalidates_local_cache(fake_db, monkeypatch):
+    bump = install_version_rpc(fake_db)
+    coba.write_period_cache("calculate_trial_balance", "2026-09", [{'account_code': '1-1100'}])
+    assert coba.read_period_cache("calculate_trial_balance", "2026-09") == [{'account_code': '1-1100'}]
+
+    # Instance lain menyimpan jurnal: hanya tabel versi di Supabase yang berubah, SQLite lokal tidak disentuh.
+    # Proses ini melihatnya setelah versi di cache proses kedaluwarsa.
+    bump(fake_db, ["2026-09"])
+    assert coba.read_period_cache("calculate_trial_balance", "2026-09") == [{'account_code': '1-1100'}]
+    monkeypatch.setattr(coba, "LEDGER_VERSIONS_CACHE_TTL", 0)
+    assert coba.read_period_cache("calculate_trial_balance", "2026-09") is None
+
+
+def test_shared_versions_are_read_once_per_ttl(fake_db):
+    install_version_rpc(fake_db)
+    coba.bump_ledger_version(["2026-09"])
+    first = coba.get_ledger_version("2026-09")
+    fake_db.calls.clear()
+    assert coba.get_ledger_version("2026-09") == first
+    assert fake_db.calls == []
+
+    # Penulisan di proses ini langsung terlihat tanpa menunggu TTL
+    coba.bump_ledger_version(["2026-09"])
+    assert coba.get_ledger_version("2026-09") != first
+
+
+def test_not_modified_report_does_not_touch_supabase(admin_client, fake_db, monkeypatch):
+    install_version_rpc(fake_db)
+    coba.bump_ledger_version(["2026-09"])
+    monkeypatch.setitem(coba.app.view_functions, "nssp", coba.admin_required(coba.ledger_conditional(lambda: "ok")))
+
+    first = admin_client.get("/nssp?period=2026-09")
+    assert first.status_code == 200
+    fake_db.calls.clear()
+    coba.invalidate_user_role('admin@test.local')
+
+    second = admin_client.get("/nssp?period=2026-09", headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert fake_db.calls == []
+
+
+def test_global_bump_invalidates_every_period(fake_db, monkeypatch):
+    bump = install_version_rpc(fake_db)
+    monkeypatch.setattr(coba, "LEDGER_VERSIONS_CACHE_TTL", 0)
+    coba.write_period_cache("calculate_trial_balance", "2026-08", [1])
+    bump(fake_db, [coba.LEDGER_VERSION_ALL])
+    assert coba.read_period_cache("calculate_trial_balance", "2026-08") is None
+
+
+def test_etag_version_follows_shared_versions(fake_db):
+    install_version_rpc(fake_db)
+    before = coba.get_ledger_version("2026-09")
+    coba.bump_ledger_version(["2026-08"])
+    after = coba.get_ledger_version("2026-09")
+    assert before != after
+    assert after[0].startswith("supabase:")
+    # Perubahan di periode setelahnya tidak memengaruhi laporan periode sebelumnya
+    coba.bump_ledger_version(["2026-10"])
+    assert coba.get_ledger_version("2026-09") == after
+
+
+def test_falls_back_to_local_versions_without_rpc(fake_db):
+    coba.write_period_cache("calculate_trial_balance", "2026-09", [1])
+    coba.invalidate_period_cache(["2026-09"])
+    version, _ = coba.get_ledger_version("2026-09")
+    assert version.startswith("local:")
+    coba.write_period_cache("calculate_trial_balance", "2026-09", [2])
+    assert coba.read_period_cache("calculate_trial_balance", "2026-09") == [2]
@@ -0,0 +1,37 @@
+from urllib.parse import unquote
+
+import coba
+
+
+def real_query(table):
+    return coba.create_client("http://localhost:54321", "test.local.key").table(table).select("*")
+
+
+def test_single_order_param_ascending():
+    query = coba.order_by(real_query("general_journals"), "transaction_date", "id")
+    assert query.params.get_list("order") == ["transaction_date,id"]
+    assert "order=transaction_date,id" in unquote(str(query.params))
+
+
+def test_single_order_param_descending():
+    query = coba.order_by(real_query("users"), "created_at", "id", desc=True)
+    assert query.params.get_list("order") == ["created_at.desc,id.desc"]
+
+
+def make_journals(db, dates):
+    db.tables['general_journals'] = [
+        {'id': i, 'transaction_number': f"JNL-{i}", 'transaction_date': date, 'description': 'x', 'total_amount': 0}
+        for i, date in enumerate(dates, start=1)
+    ]
+    db.tables['journal_entries'] = []
+
+
+def test_keyset_pages_order_by_date_then_id(fake_db):
+    make_journals(fake_db, ["2026-09-20", "2026-09-10", "2026-09-10", "2026-09-15", "2026-09-10", "2026-09-15", "2026-09-01"])
+    read_page = coba.get_journal_entries_with_details.__wrapped__
+    first = read_page(limit=3)
+    assert [journal['id'] for journal in first] == [7, 2, 3]
+    second = read_page(limit=3, after=(first[-1]['transaction_date'], first[-1]['id']))
+    assert [journal['id'] for journal in second] == [5, 4, 6]
+    previous = read_page(limit=3, before=(second[0]['transaction_date'], second[0]['id']))
+    assert [journal['id'] for journal in previous] == [7, 2, 3]
@@ -0,0 +1,129 @@
+import pytest
+
+import coba
+from fake_supabase import FakeAPIError
+from sqlite_posting import POSTING_FUNCTIONS, SqlitePosting, migration_insert_columns
+
+HEADER = {
+    'transaction_number': 'JNL-1', 'transaction_date': '2026-09-01', 'description': 'Penjualan tunai',
+    'total_amount': 1000, 'cash_flow_category': 'operasi', 'cash_delta': 1000, 'created_by': 'admin@test.local',
+}
+ADJUSTING_HEADER = {
+    'adjustment_number': 'AJP-1', 'adjustment_date': '2026-09-30', 'description': 'Penyusutan',
+    'total_amount': 250, 'period': '2026-09', 'created_by': 'admin@test.local',
+}
+ENTRIES = [
+    {'account_code': '1-1100', 'position': 'debit', 'amount': 1000},
+    {'account_code': '4-1100', 'position': 'kredit', 'amount': 1000},
+]
+ADJUSTING_ENTRIES = [
+    {'account_code': '6-1100', 'position': 'debit', 'amount': 250},
+    {'account_code': '1-2200', 'position': 'kredit', 'amount': 250},
+]
+
+
+@pytest.fixture
+def sql_db(fake_db):
+    posting = SqlitePosting()
+    posting.install(fake_db)
+    yield posting
+    posting.conn.close()
+
+
+def post(header=HEADER, entries=ENTRIES):
+    return coba.insert_journal_with_entries("post_journal", "general_journals", "journal_entries", "journal_id", header, entries)
+
+
+def post_adjusting(header=ADJUSTING_HEADER, entries=ADJUSTING_ENTRIES):
+    return coba.insert_journal_with_entries(
+        "post_adjusting_journal", "adjusting_journals", "adjusting_journal_entries", "adjusting_journal_id", header, entries
+    )
+
+
+@pytest.mark.parametrize("function_name", sorted(POSTING_FUNCTIONS))
+def test_stand_in_inserts_the_columns_of_the_latest_migration(function_name):
+    # post_journal diambil dari migrasi journal_cash_flow yang mendefinisikannya ulang
+    header_table, header_columns, entries_table, foreign_key, entry_columns = POSTING_FUNCTIONS[function_name]
+    assert migration_insert_columns(function_name) == {
+        header_table: header_columns,
+        entries_table: (foreign_key,) + entry_columns,
+    }
+
+
+def test_post_journal_saves_header_and_entries(fake_db, sql_db):
+    saved = post()
+    assert [call for call in fake_db.calls if call[0] == 'rpc'] == [('rpc', 'post_journal')]
+    assert sql_db.rows('general_journals') == [saved]
+    assert saved['cash_flow_category'] == 'operasi' and saved['cash_delta'] == 1000
+    entries = sql_db.rows('journal_entries')
+    assert [(entry['journal_id'], entry['account_code'], entry['position'], entry['amount']) for entry in entries] == [
+        (saved['id'], '1-1100', 'debit', 1000),
+        (saved['id'], '4-1100', 'kredit', 1000),
+    ]
+
+
+def test_post_adjusting_journal_saves_header_and_entries(sql_db):
+    saved = post_adjusting()
+    assert sql_db.rows('adjusting_journals') == [saved]
+    assert {entry['adjusting_journal_id'] for entry in sql_db.rows('adjusting_journal_entries')} == {saved['id']}
+
+
+def test_balance_is_compared_on_two_decimals(sql_db):
+    entries = [
+        {'account_code': '1-1100', 'position': 'debit', 'amount': 0.1},
+        {'account_code': '1-1200', 'position': 'debit', 'amount': 0.2},
+        {'account_code': '4-1100', 'position': 'kredit', 'amount': 0.3},
+    ]
+    assert post(entries=entries)['transaction_number'] == 'JNL-1'
+
+
+@pytest.mark.parametrize("entries, message", [
+    ([], "Entries jurnal kosong"),
+    ([{'account_code': '1-1100', 'position': 'debit', 'amount': 1000},
+      {'account_code': '4-1100', 'position': 'kredit', 'amount': 900}], "tidak balance"),
+    ([{'account_code': '1-1100', 'position': 'debet', 'amount': 1000},
+      {'account_code': '4-1100', 'position': 'kredit', 'amount': 1000}], "Posisi harus debit/kredit"),
+    ([{'account_code': '1-1100', 'position': 'debit', 'amount': 0},
+      {'account_code': '4-1100', 'position': 'kredit', 'amount': 0}], "nominal harus lebih dari 0"),
+])
+@pytest.mark.parametrize("poster", [post, post_adjusting])
+def test_check_journal_entries_rejects_without_writing(fake_db, sql_db, poster, entries, message):
+    with pytest.raises(FakeAPIError, match=message):
+        poster(entries=entries)
+    for table in ('general_journals', 'journal_entries', 'adjusting_journals', 'adjusting_journal_entries'):
+        assert sql_db.rows(table) == []
+    # Error data dari RPC tidak dilanjutkan ke insert tabel berurutan
+    assert ('general_journals', 'insert') not in fake_db.calls
+    assert ('adjusting_journals', 'insert') not in fake_db.calls
+
+
+def test_entry_violation_rolls_back_header(sql_db):
+    entries = [
+        {'account_code': '1-1100', 'position': 'debit', 'amount': 1000},
+        {'account_code': None, 'position': 'kredit', 'amount': 1000},
+    ]
+    with pytest.raises(FakeAPIError) as error:
+        post(entries=entries)
+    assert error.value.code == '23502'
+    assert sql_db.rows('general_journals') == []
+    assert sql_db.rows('journal_entries') == []
+
+
+def test_adjusting_entry_violation_rolls_back_header(sql_db):
+    entries = [
+        {'account_code': '6-1100', 'position': 'debit', 'amount': 250},
+        {'account_code': None, 'position': 'kredit', 'amount': 250},
+    ]
+    with pytest.raises(FakeAPIError):
+        post_adjusting(entries=entries)
+    assert sql_db.rows('adjusting_journals') == []
+    assert sql_db.rows('adjusting_journal_entries') == []
+
+
+def test_failed_post_leaves_earlier_journals_intact(sql_db):
+    first = post()
+    with pytest.raises(FakeAPIError) as error:
+        post()
+    assert error.value.code == '23505'
+    assert sql_db.rows('general_journals') == [first]
+    assert len(sql_db.rows('journal_entries')) == 2
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import coba
+
+PERIOD = "2026-09"
+CHART = [
+    ('1-1100', 'Kas', 'Aktiva Lancar'),
+    ('1-2100', 'Peralatan', 'Aktiva Tetap'),
+    ('1-2200', 'Akumulasi Penyusutan Peralatan', 'Aktiva Tetap'),
+    ('3-1100', 'Modal Usaha', 'Modal'),
+    ('4-1100', 'Penjualan Lele', 'Pendapatan'),
+    ('6-1100', 'Beban Gaji', 'Beban'),
+    ('6-1200', 'Beban Penyusutan Peralatan', 'Beban'),
+]
+OPENING_BALANCES = [('1-1100', 'debit', 10000), ('1-2100', 'debit', 5000), ('3-1100', 'kredit', 15000)]
+JOURNALS = [("2026-09-02", "1-1100", "4-1100", 4000), ("2026-09-10", "6-1100", "1-1100", 1000)]
+
+
+@pytest.fixture
+def report_client(admin_client, fake_db):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': code, 'account_name': name, 'account_type': account_type} for code, name, account_type in CHART
+    ]
+    fake_db.tables['opening_balances'] = [
+        {'id': i, 'account_code': code, 'position': position, 'amount': amount}
+        for i, (code, position, amount) in enumerate(OPENING_BALANCES, 1)
+    ]
+    fake_db.tables['general_journals'] = []
+    fake_db.tables['journal_entries'] = []
+    for journal_id, (date, debit_code, credit_code, amount) in enumerate(JOURNALS, 1):
+        fake_db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date,
+            'description': 'x', 'total_amount': amount,
+        })
+        fake_db.tables['journal_entries'].extend([
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ])
+    fake_db.tables['adjusting_journals'] = [{
+        'id': 1, 'adjustment_number': "ADJ-1", 'adjustment_date': "2026-09-30",
+        'description': 'Penyusutan', 'total_amount': 250, 'period': PERIOD,
+    }]
+    fake_db.tables['adjusting_journal_entries'] = [
+        {'id': 10, 'adjusting_journal_id': 1, 'account_code': '6-1200', 'position': 'debit', 'amount': 250},
+        {'id': 11, 'adjusting_journal_id': 1, 'account_code': '1-2200', 'position': 'kredit', 'amount': 250},
+    ]
+    return admin_client
+
+
+def get_report(client, name, **params):
+    query = "&".join(f"{key}={value}" for key, value in {'period': PERIOD, **params}.items())
+    return client.get(f"/api/reports/{name}?{query}").get_json()
+
+
+@pytest.mark.parametrize("name", sorted(coba.REPORT_API_SOURCES))
+def test_each_report_matches_its_source(report_client, name):
+    body = get_report(report_client, name)
+    assert body['success'] is True
+    assert (body['report'], body['period']) == (name, PERIOD)
+
+    coba.invalidate_period_cache()
+    with coba.app.test_request_context("/"):
+        expected = coba.REPORT_API_SOURCES[name](PERIOD)
+    assert expected
+    assert body['data'] == json.loads(coba.app.json.dumps(expected))
+
+
+def test_fields_filter_each_row_of_list_reports(report_client):
+    body = get_report(report_client, "trial_balance", fields="account_code, debit")
+    assert body['success'] is True
+    rows = {row['account_code']: row for row in body['data']}
+    assert all(set(row) == {'account_code', 'debit'} for row in body['data'])
+    assert rows['1-1100']['debit'] == 10000 + 4000 - 1000
+
+
+def test_dotted_fields_select_inside_nested_rows(report_client):
+    body = get_report(report_client, "income_statement", fields="total_pendapatan,income_accounts.account_code,expense_accounts.amount")
+    assert body['success'] is True
+    assert body['data'] == {
+        'total_pendapatan': 4000,
+        'income_accounts': [{'account_code': '4-1100'}],
+        'expense_accounts': [{'amount': 1000}, {'amount': 250}],
+    }
+
+
+def test_unknown_report_is_rejected(report_client):
+    body = report_client.get("/api/reports/bukan_laporan").get_json()
+    assert body['success'] is False
+    assert "bukan_laporan" in body['message']
+    assert body['available_reports'] == sorted(coba.REPORT_API_SOURCES)
+
+
+@pytest.mark.parametrize("name, fields, unknown", [
+    ("trial_balance", "account_code,saldo", "saldo"),
+    ("balance_sheet", "total_aktiva,tidak_ada", "tidak_ada"),
+    ("income_statement", "income_accounts.account_code,income_accounts.nominal", "income_accounts.nominal"),
+])
+def test_unknown_field_is_rejected(report_client, name, fields, unknown):
+    body = get_report(report_client, name, fields=fields)
+    assert body['success'] is False
+    assert body['message'] == f"Field tidak dikenal: {unknown}"
+    assert 'data' not in body
+
+
+def test_invalid_period_is_rejected(report_client):
+    body = report_client.get("/api/reports/trial_balance?period=09-2026").get_json()
+    assert body['success'] is False and "YYYY-MM" in body['message']
@@ -0,0 +1,97 @@
+import logging
+import threading
+
+import coba
+
+
+def counting_memoized(name):
+    calls = []
+
+    def compute(period=None):
+        calls.append(period)
+        return [{'account_code': '1-1100', 'period': period}]
+
+    compute.__name__ = name
+    return coba.request_memoized(compute), calls
+
+
+def test_memo_returns_the_same_object_once_per_request():
+    load, calls = counting_memoized("load")
+    with coba.app.test_request_context("/"):
+        first = load("2026-09")
+        assert load("2026-09") is first
+        assert load(period="2026-09") is not first
+        assert calls == ["2026-09", "2026-09"]
+        assert coba.g.report_memo_hits == 1
+
+    # Request berikutnya menghitung ulang
+    with coba.app.test_request_context("/"):
+        load("2026-09")
+    assert len(calls) == 3
+
+
+def test_memo_is_keyed_on_the_function_not_its_name():
+    first, first_calls = counting_memoized("load")
+    second, second_calls = counting_memoized("load")
+    with coba.app.test_request_context("/"):
+        assert first("2026-09") is not second("2026-09")
+    assert first_calls == second_calls == ["2026-09"]
+
+
+def test_parallel_misses_compute_once():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow(period):
+        calls.append(period)
+        started.set()
+        release.wait(5)
+        return [period]
+
+    slow_memoized = coba.request_memoized(slow)
+
+    def release_after_start():
+        started.wait(5)
+        # Beri waktu thread kedua sampai di kunci yang sama sebelum perhitungan pertama selesai
+        threading.Event().wait(0.05)
+        release.set()
+
+    with coba.app.test_request_context("/"):
+        threading.Thread(target=release_after_start).start()
+        first, second = coba.fetch_parallel((slow_memoized, "2026-09"), (slow_memoized, "2026-09"))
+        assert first is second
+        assert calls == ["2026-09"]
+        assert coba.g.report_memo_hits == 1
+
+
+def test_primed_value_is_served_by_the_memo():
+    load, calls = counting_memoized("load")
+    with coba.app.test_request_context("/"):
+        coba.prime_request_memo(load, ("2026-09",), ["primed"])
+        assert load("2026-09") == ["primed"]
+    assert calls == []
+
+
+def test_hit_count_is_logged_at_teardown(caplog):
+    load, _ = counting_memoized("load")
+    with caplog.at_level(logging.INFO, logger="coba"):
+        with coba.app.test_request_context("/laporan"):
+            load("2026-09")
+            load("2026-09")
+            load("2026-09")
+            load("2026-10")
+    assert "♻️ Report memo /laporan: 2 hits saved, 2 stages computed" in caplog.text
+
+
+def test_worksheet_validation_does_not_modify_memoized_rows():
+    rows = [{
+        'account_code': '5-1100', 'account_name': 'Harga Pokok Penjualan', 'account_type': 'Beban',
+        'nssp_debit': 700, 'nssp_credit': 0, 'is_income_statement': False, 'is_balance_sheet': True,
+        'laba_rugi_debit': 0, 'laba_rugi_credit': 0, 'neraca_debit': 700, 'neraca_credit': 0,
+    }]
+    original = [dict(row) for row in rows]
+
+    corrected = coba.validate_worksheet_allocation(rows)
+    assert rows == original
+    assert corrected[0]['is_income_statement'] and corrected[0]['laba_rugi_debit'] == 700
+    assert corrected[0]['neraca_debit'] == 0
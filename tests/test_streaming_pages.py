@@ -0,0 +1,32 @@
+import pytest
+
+import coba
+
+JOURNAL_TABLES = ('general_journals', 'journal_entries')
+
+
+@pytest.mark.parametrize("url", ["/jurnal_umum", "/buku_besar"])
+def test_layout_is_sent_before_journals_are_read(admin_client, fake_db, url):
+    fake_db.tables['chart_of_accounts'] = [
+        {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar', 'category': 'Current Assets'},
+        {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan', 'category': 'Revenue'},
+    ]
+    fake_db.tables['general_journals'] = [
+        {'id': 1, 'transaction_number': 'JNL-1', 'transaction_date': '2026-09-01', 'description': 'x', 'total_amount': 100}
+    ]
+    fake_db.tables['journal_entries'] = [
+        {'id': 10, 'journal_id': 1, 'account_code': '1-1100', 'position': 'debit', 'amount': 100},
+        {'id': 11, 'journal_id': 1, 'account_code': '4-1100', 'position': 'kredit', 'amount': 100},
+    ]
+    response = admin_client.get(url, buffered=False)
+    assert response.is_streamed
+
+    chunks = iter(response.response)
+    first_chunk = next(chunks)
+    assert first_chunk
+    assert not [call for call in fake_db.calls if call[0] in JOURNAL_TABLES]
+
+    body = (first_chunk + b"".join(chunks)).decode()
+    assert [call for call in fake_db.calls if call[0] in JOURNAL_TABLES]
+    assert "1-1100" in body
+    response.close()
@@ -0,0 +1,127 @@
+import time
+
+import coba
+
+CHART = [
+    {'account_code': '1-1100', 'account_name': 'Kas', 'account_type': 'Aktiva Lancar'},
+    {'account_code': '1-2100', 'account_name': 'Peralatan', 'account_type': 'Aktiva Tetap'},
+    {'account_code': '1-2200', 'account_name': 'Akumulasi Penyusutan Peralatan', 'account_type': 'Aktiva Tetap'},
+    {'account_code': '2-1100', 'account_name': 'Utang Usaha', 'account_type': 'Kewajiban'},
+    {'account_code': '3-1100', 'account_name': 'Modal', 'account_type': 'Modal'},
+    {'account_code': '4-1100', 'account_name': 'Penjualan', 'account_type': 'Pendapatan'},
+    {'account_code': '6-1100', 'account_name': 'Beban Listrik', 'account_type': 'Beban'},
+    {'account_code': '6-1200', 'account_name': 'Beban Gaji', 'account_type': 'Beban'},
+]
+OPENING_BALANCES = [
+    {'id': 1, 'account_code': '1-1100', 'position': 'debit', 'amount': 5000},
+    {'id': 2, 'account_code': '1-2100', 'position': 'debit', 'amount': 3000},
+    {'id': 3, 'account_code': '1-2200', 'position': 'kredit', 'amount': 500},
+    {'id': 4, 'account_code': '2-1100', 'position': 'kredit', 'amount': 1500},
+    {'id': 5, 'account_code': '3-1100', 'position': 'kredit', 'amount': 6000},
+]
+JOURNALS = [
+    # (id, tanggal, debit, kredit, nominal)
+    (1, "2026-08-20", "1-1100", "4-1100", 9999),
+    (2, "2026-09-01", "1-1100", "4-1100", 2500),
+    (3, "2026-09-10", "6-1100", "1-1100", 400),
+    (4, "2026-09-15", "2-1100", "1-1100", 2000),
+    (5, "2026-09-30", "6-1200", "2-1100", 700),
+    (6, "2026-09-30", "9-9999", "1-1100", 50),
+    (7, "2026-10-01", "1-1100", "4-1100", 8888),
+]
+
+
+def trial_balance_totals(db, p_start_date=None, p_end_date=None):
+    """trial_balance_totals dari supabase/migrations di atas tabel palsu"""
+    dates = {
+        journal['id']: journal['transaction_date'] for journal in db.tables['general_journals']
+        if (p_start_date is None or journal['transaction_date'] >= p_start_date)
+        and (p_end_date is None or journal['transaction_date'] <= p_end_date)
+    }
+    totals = {}
+    for entry in db.tables['journal_entries']:
+        if entry['journal_id'] in dates:
+            debit, credit = totals.get(entry['account_code'], (0, 0))
+            if entry['position'] == 'debit':
+                debit += entry['amount']
+            else:
+                credit += entry['amount']
+            totals[entry['account_code']] = (debit, credit)
+    return [
+        {'account_code': code, 'total_debit': debit, 'total_credit': credit}
+        for code, (debit, credit) in totals.items()
+    ]
+
+
+def seed(db):
+    db.tables['chart_of_accounts'] = [dict(account) for account in CHART]
+    db.tables['opening_balances'] = [dict(balance) for balance in OPENING_BALANCES]
+    db.tables['general_journals'] = []
+    db.tables['journal_entries'] = []
+    for journal_id, date, debit_code, credit_code, amount in JOURNALS:
+        db.tables['general_journals'].append({
+            'id': journal_id, 'transaction_number': f"JNL-{journal_id}", 'transaction_date': date,
+            'description': 'x', 'total_amount': amount,
+        })
+        db.tables['journal_entries'].extend([
+            {'id': journal_id * 10, 'journal_id': journal_id, 'account_code': debit_code, 'position': 'debit', 'amount': amount},
+            {'id': journal_id * 10 + 1, 'journal_id': journal_id, 'account_code': credit_code, 'position': 'kredit', 'amount': amount},
+        ])
+
+
+def calculate(period="2026-09"):
+    """calculate_trial_balance dalam request baru, tanpa cache saldo periode sebelumnya"""
+    coba.invalidate_period_cache([period])
+    with coba.app.test_request_context("/"):
+        return coba.calculate_trial_balance(period)
+
+
+def test_rpc_rows_match_python_ledger(fake_db):
+    seed(fake_db)
+    fake_db.rpcs['trial_balance_totals'] = trial_balance_totals
+
+    rpc_rows = coba.build_trial_balance_from_totals(coba.get_account_totals_rpc("2026-09-01", "2026-09-30"))
+    python_rows = coba.calculate_trial_balance_from_ledger("2026-09-01", "2026-09-30")
+    assert rpc_rows == python_rows
+
+    by_code = {row['account_code']: row for row in rpc_rows}
+    # Saldo awal ikut dihitung; akun kontra (saldo kredit di akun debit normal) tampil di kolom kredit
+    assert (by_code['1-1100']['debit'], by_code['1-1100']['credit']) == (5000 + 2500 - 400 - 2000 - 50, 0)
+    assert (by_code['1-2200']['debit'], by_code['1-2200']['credit']) == (0, 500)
+    assert (by_code['2-1100']['debit'], by_code['2-1100']['credit']) == (0, 1500 - 2000 + 700)
+    assert (by_code['4-1100']['debit'], by_code['4-1100']['credit']) == (0, 2500)
+    assert by_code['9-9999']['account_type'] == 'Unknown'
+    assert sum(row['debit'] for row in rpc_rows) == sum(row['credit'] for row in rpc_rows)
+
+
+def test_calculate_trial_balance_uses_rpc(fake_db):
+    seed(fake_db)
+    fake_db.rpcs['trial_balance_totals'] = trial_balance_totals
+    expected = coba.calculate_trial_balance_from_ledger("2026-09-01", "2026-09-30")
+
+    fake_db.calls.clear()
+    assert calculate() == expected
+    assert ('rpc', 'trial_balance_totals') in fake_db.calls
+    assert ('journal_entries', 'select') not in fake_db.calls
+
+
+def test_missing_rpc_falls_back_and_retries_after_window(fake_db):
+    seed(fake_db)
+    expected = coba.calculate_trial_balance_from_ledger("2026-09-01", "2026-09-30")
+
+    # Fungsi belum terpasang (PGRST202): jalur Python, RPC dinonaktifkan sementara
+    assert calculate() == expected
+    assert ('rpc', 'trial_balance_totals') in fake_db.calls
+    assert coba._trial_balance_rpc_retry_at > time.monotonic()
+
+    fake_db.rpcs['trial_balance_totals'] = trial_balance_totals
+    fake_db.calls.clear()
+    assert calculate() == expected
+    assert ('rpc', 'trial_balance_totals') not in fake_db.calls
+
+    # Setelah TRIAL_BALANCE_RPC_RETRY lewat, RPC dicoba lagi dan dipakai
+    coba._trial_balance_rpc_retry_at = time.monotonic() - 1
+    fake_db.calls.clear()
+    assert calculate() == expected
+    assert ('rpc', 'trial_balance_totals') in fake_db.calls
+    assert ('journal_entries', 'select') not in fake_db.calls
@@ -0,0 +1,21 @@
+import coba
+
+
+def test_demoted_super_admin_loses_access_despite_cached_role(admin_client, fake_db):
+    assert admin_client.get("/admin/users").status_code == 200
+
+    # Role diubah langsung di database (misalnya oleh worker lain): cache proses ini masih super_admin
+    coba.cache_user_role('admin@test.local', 'super_admin')
+    fake_db.tables['users'][0]['role'] = 'admin'
+
+    assert admin_client.get("/admin/users").status_code == 403
+
+
+def test_display_role_uses_cache(fake_db):
+    fake_db.tables['users'] = [{'id': 1, 'email': 'kasir@test.local', 'role': 'admin'}]
+    coba.invalidate_user_role('kasir@test.local')
+    assert coba.get_user_role_record('kasir@test.local') == {'id': 1, 'email': 'kasir@test.local', 'role': 'admin'}
+    queries = fake_db.calls.count(('users', 'select'))
+    coba.get_user_role_record('kasir@test.local')
+    assert fake_db.calls.count(('users', 'select')) == queries
+    coba.invalidate_user_role('kasir@test.local')